@@ -5,6 +5,38 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+
+Deployment
+----------
+The WSGI setup (``gunicorn gnanodhaya_project.wsgi``) ties up one worker
+thread per request for as long as the request waits on SQLite. Under ASGI
+the read-only student and parent pages (homework, exam timetable,
+attendance, marks, parent dashboard) can run as async views instead, with
+their database work in a bounded thread pool (students/async_views.py), so
+one worker keeps answering while some pages wait on a locked database.
+
+Install an ASGI server (it is not in requirements.txt)::
+
+    pip install "uvicorn>=0.23"
+
+and run gunicorn with uvicorn workers::
+
+    DJANGO_ASYNC_VIEWS=True \\
+    gunicorn gnanodhaya_project.asgi:application \\
+        -k uvicorn.workers.UvicornWorker --workers 2
+
+Settings read from the environment:
+
+* ``DJANGO_ASYNC_VIEWS=True`` routes those pages to the async views.
+  Without it every page is a sync view, which Django runs in its one shared
+  sync thread under ASGI - one request at a time per worker.
+* ``DJANGO_ASYNC_DB_THREADS`` (default 8) is the pool size per worker, and
+  so the most database connections a worker opens for those pages.
+
+All other pages stay sync views. The custom middleware is async-capable, so
+it runs on the event loop; Django's own middleware steps still hop briefly
+to its shared sync thread. ``manage.py bench_concurrency`` compares the two
+setups against running servers.
 """
 
 import os
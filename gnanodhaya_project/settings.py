@@ -48,12 +48,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'students.metrics.MetricsMiddleware',
+    'students.log.RequestLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'students.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'students.middleware.RoleMiddleware',
+    'students.replica.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,9 +91,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Snapshot of the primary for report pages (see students/replica.py).
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['students.replica.ReplicaRouter']
+
+# Reports use the replica while its snapshot is at most this many seconds
+# old; one older than REPLICA_REFRESH_INTERVAL is refreshed in the
+# background when a report asks for it.
+REPLICA_MAX_STALENESS = int(os.environ.get("DJANGO_REPLICA_MAX_STALENESS", "300"))
+REPLICA_REFRESH_INTERVAL = int(os.environ.get("DJANGO_REPLICA_REFRESH_INTERVAL", "60"))
+
+# Pragmas run on every new SQLite connection (students/signals.py).
+SQLITE_PRAGMAS = {}
+
+# For several workers sharing db.sqlite3: readers no longer block the
+# writer and vice versa (WAL), writers wait for the lock instead of failing
+# at once, and connections are kept between requests. journal_mode is
+# stored in the database file, so it stays WAL after switching back.
+PRODUCTION_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,           # ms
+    'synchronous': 'normal',        # WAL stays consistent; fsync at checkpoints
+    'cache_size': -32000,           # KiB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
 }
 
+# "default" or "production".
+DB_PROFILE = os.environ.get("DJANGO_DB_PROFILE", "default")
+
+if DB_PROFILE == "production":
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 600
+    SQLITE_PRAGMAS = PRODUCTION_SQLITE_PRAGMAS
+
+# Report pages read from the replica only when it is enabled: by default
+# with the production profile, whose WAL journal lets the copy run without
+# holding writers back. DJANGO_REPLICA=1 or 0 overrides that.
+REPLICA_ENABLED = os.environ.get(
+    "DJANGO_REPLICA", "1" if DB_PROFILE == "production" else "0"
+) == "1"
+# Pages copied per backup step (4 MiB with the default page size).
+REPLICA_BACKUP_PAGES = 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -156,40 +207,74 @@ SCHOOL_INFO = {
     "LOGO": "students/images/logo.png",
 }
 
+# The school year starts on the first of this month. A student moved to
+# another class-section has their attendance recounted under it from
+# then on; earlier years keep the class it was recorded under.
+TERM_START_MONTH = 6
 
-import os
 
-LOGGING = {
-    "version": 1,
-    "disable_existing_loggers": False,
+from students.log import build_logging_config
 
-    "formatters": {
-        "simple": {
-            "format": "[{levelname}] {asctime} | {name} | {message}",
-            "style": "{",
-        },
-    },
+# "sync" (text lines written on the request thread), "async" (queued JSON
+# lines in a rotating, compressed file under var/log) or "off".
+LOG_MODE = os.environ.get("DJANGO_LOG_MODE", "sync")
 
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "simple",
-        },
-        "file": {
-            "class": "logging.FileHandler",
-            "filename": os.path.join(BASE_DIR, "school.log"),
-            "formatter": "simple",
-        },
-    },
+LOGGING = build_logging_config(
+    LOG_MODE,
+    text_file=BASE_DIR / "school.log",
+    json_file=BASE_DIR / "var" / "log" / "school.jsonl",
+)
 
-    "loggers": {
-        "students": {
-            "handlers": ["console", "file"],
-            "level": "INFO",
-            "propagate": False,
-        },
-    },
-}
+# Cache: "locmem" (per worker process) or "file" (shared by every worker
+# through DJANGO_CACHE_DIR; point it at /dev/shm for a RAM-backed one).
+CACHE_BACKEND = os.environ.get("DJANGO_CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "file":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get("DJANGO_CACHE_DIR", str(BASE_DIR / 'var' / 'cache')),
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'gnanodhaya',
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Sessions are saved only when their data changed, and read through the
+# cache when it is shared by all workers (see students/sessions.py).
+SESSION_ENGINE = 'students.sessions'
+SESSION_CACHED = os.environ.get(
+    "DJANGO_SESSION_CACHED",
+    "True" if CACHE_BACKEND == "file" else "False"
+) == "True"
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Files whose mtimes tell every worker process that cached data is stale
+# (see students/stamps.py).
+VERSION_STAMP_DIR = BASE_DIR / 'var' / 'stamps'
+
+# Per-worker metrics files merged by the /metrics view (see students/metrics.py).
+METRICS_DIR = BASE_DIR / 'var' / 'metrics'
+METRICS_FLUSH_INTERVAL = 5
+# Lets a Prometheus scraper authenticate with "Authorization: Bearer <token>".
+METRICS_TOKEN = os.environ.get("DJANGO_METRICS_TOKEN", "")
+
+# Rendered payment receipts (see students/receipts.py).
+RECEIPT_DIR = BASE_DIR / 'var' / 'receipts'
+
+# Serve the read-only student/parent pages as async views (students/
+# async_views.py); meant for the ASGI deployment described in asgi.py.
+ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "False") == "True"
+# Threads (and so at most this many database connections) per worker that
+# run the async views' database work.
+ASYNC_DB_THREADS = int(os.environ.get("DJANGO_ASYNC_DB_THREADS", "8"))
@@ -1,5 +1,11 @@
-from django.contrib import admin
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.contrib import admin, messages
 from django.conf import settings
+from django.shortcuts import redirect, render
+from django.urls import path, reverse
+from django.utils import timezone
 
 # =========================
 # IMPORT MODELS
@@ -10,11 +16,15 @@ from .models import (
     TeacherProfile,
     StudentMarks,
     Attendance,
+    DailyAttendanceRollup,
     ExamTimetable,
     Homework,
     AboutImage,
     ExamFee,
+    ExamResult,
+    PaymentTransaction,
 )
+from .services import register_sections, save_attendance_register, school_register, statuses_from_post
 
 # =========================
 # ADMIN SITE BRANDING
@@ -26,10 +36,105 @@ admin.site.index_title = "Administration Panel"
 # =========================
 # SIMPLE REGISTRATIONS
 # =========================
-admin.site.register(Attendance)
 admin.site.register(TeacherProfile)
 admin.site.register(ExamFee)
 
+# =========================
+# ATTENDANCE ADMIN
+# =========================
+@admin.register(Attendance)
+class AttendanceAdmin(admin.ModelAdmin):
+    list_display = (
+        "student",
+        "date",
+        "status",
+    )
+    list_filter = (
+        "date",
+        "status",
+        "student__student_class",
+        "student__section",
+    )
+    list_select_related = ("student__user",)
+    change_list_template = "admin/students/attendance/change_list.html"
+
+    def get_urls(self):
+        custom = [
+            path(
+                "school-register/",
+                self.admin_site.admin_view(self.school_register_view),
+                name="students_attendance_school_register",
+            ),
+        ]
+        return custom + super().get_urls()
+
+    def school_register_view(self, request):
+        """
+        Mark the school for one date, a class-section per page; saving a
+        page moves on to the next class-section.
+        """
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect("admin:students_attendance_changelist")
+
+        data = request.POST if request.method == "POST" else request.GET
+        try:
+            attendance_date = datetime.strptime(data.get("date"), "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            attendance_date = timezone.localdate()
+
+        sections = register_sections()
+        current = (data.get("class", ""), data.get("section", ""))
+        if "class_section" in data:
+            # "<class>-<section>" from the picker.
+            student_class, _, section = data["class_section"].rpartition("-")
+            current = (student_class, section)
+        if current not in sections:
+            current = sections[0] if sections else None
+
+        if request.method == "POST" and current:
+            student_class, section = current
+            created, updated = save_attendance_register(
+                attendance_date,
+                statuses_from_post(request.POST),
+                students=StudentProfile.objects.filter(
+                    student_class=student_class,
+                    section=section
+                )
+            )
+            self.message_user(
+                request,
+                f"Attendance for {student_class}-{section} on {attendance_date}: "
+                f"{created} added, {updated} updated.",
+                messages.SUCCESS
+            )
+
+            position = sections.index(current) + 1
+            if position == len(sections):
+                return redirect("admin:students_attendance_changelist")
+            next_class, next_section = sections[position]
+            return redirect(
+                reverse("admin:students_attendance_school_register") + "?" + urlencode({
+                    "date": attendance_date.isoformat(),
+                    "class": next_class,
+                    "section": next_section,
+                })
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "School attendance register",
+            "attendance_date": attendance_date,
+            "sections": sections,
+            "current": current,
+            "students": school_register(attendance_date, *current) if current else [],
+        }
+        return render(
+            request,
+            "admin/students/attendance/school_register.html",
+            context
+        )
+
 # =========================
 # STUDENT PROFILE ADMIN
 # =========================
@@ -118,6 +223,72 @@ class StudentMarksAdmin(admin.ModelAdmin):
         "subject",
     )
 
+# =========================
+# EXAM RESULTS ADMIN
+# =========================
+@admin.register(ExamResult)
+class ExamResultAdmin(admin.ModelAdmin):
+    list_display = (
+        "student",
+        "exam_name",
+        "total",
+        "percentage",
+        "grade",
+        "updated_at",
+    )
+    list_filter = (
+        "exam_name",
+        "grade",
+        "student__student_class",
+        "student__section",
+    )
+    search_fields = (
+        "student__user__username",
+    )
+    # Maintained from StudentMarks; edit the marks instead.
+    readonly_fields = (
+        "student",
+        "exam_name",
+        "subjects",
+        "total",
+        "max_marks",
+        "percentage",
+        "grade",
+        "updated_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+# =========================
+# PAYMENT LEDGER ADMIN
+# =========================
+@admin.register(PaymentTransaction)
+class PaymentTransactionAdmin(admin.ModelAdmin):
+    list_display = (
+        "student",
+        "amount",
+        "balance_after",
+        "payment_id",
+        "created_at",
+    )
+    list_filter = (
+        "student__student_class",
+        "student__section",
+    )
+    search_fields = (
+        "student__user__username",
+        "payment_id",
+    )
+    # The ledger is append-only.
+    readonly_fields = list_display
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # =========================
 # HOMEWORK ADMIN
 # =========================
@@ -142,8 +313,16 @@ class HomeworkAdmin(admin.ModelAdmin):
 class AboutImageAdmin(admin.ModelAdmin):
     list_display = (
         "title",
+        "width",
+        "height",
         "created_at",
     )
+    # Generated from the upload by students.images.
+    readonly_fields = (
+        "width",
+        "height",
+        "variants",
+    )
 
 from .models import MonthlyAttendance
 
@@ -176,3 +355,27 @@ class MonthlyAttendanceAdmin(admin.ModelAdmin):
         return obj.student.section
     get_section.short_description = "Section"
 
+
+# =========================
+# DAILY ATTENDANCE ROLLUP ADMIN
+# =========================
+@admin.register(DailyAttendanceRollup)
+class DailyAttendanceRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "date",
+        "student_class",
+        "section",
+        "present",
+        "absent",
+        "total",
+    )
+    list_filter = (
+        "student_class",
+        "section",
+    )
+    date_hierarchy = "date"
+    # Maintained from Attendance; edit the attendance instead.
+    readonly_fields = list_display
+
+    def has_add_permission(self, request):
+        return False
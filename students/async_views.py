@@ -0,0 +1,84 @@
+"""
+Async versions of the read-only student and parent pages.
+
+Served under ASGI (see gnanodhaya_project/asgi.py) when ``ASYNC_VIEWS`` is
+on. Each view awaits its sync counterpart from views.py, run in a bounded
+pool of ``ASYNC_DB_THREADS`` threads: the event loop keeps accepting and
+answering other requests while a page waits on SQLite, and at most that
+many requests hold a database connection at once.
+
+The sync view runs whole, decorators included, so login and role checks,
+the session and user lookups and template rendering all happen in the pool
+thread, never on the event loop.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import views
+from .metrics import watch_connections
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS,
+            thread_name_prefix="async-views",
+        )
+    return _executor
+
+
+def _call(func, args, kwargs):
+    # Pool threads outlive requests: drop connections that are broken or
+    # past CONN_MAX_AGE, as request_started/finished do for sync workers.
+    close_old_connections()
+    watch_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """
+    Run ``func`` in the view thread pool and return its result. Context
+    variables (the request for log records, the query timer) go with it.
+    """
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), context.run, _call, func, args, kwargs)
+
+
+def pooled(view):
+    """Async view that runs the sync ``view`` through run_in_pool."""
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run_in_pool(view, request, *args, **kwargs)
+
+    return async_view
+
+
+# ===============================
+# STUDENT
+# ===============================
+
+attendance = pooled(views.attendance)
+homework_view = pooled(views.homework_view)
+exam_timetable_view = pooled(views.exam_timetable_view)
+marks_by_exam = pooled(views.marks_by_exam)
+
+
+# ===============================
+# PARENT
+# ===============================
+
+parent_dashboard = pooled(views.parent_dashboard)
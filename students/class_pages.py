@@ -0,0 +1,102 @@
+"""
+Shared cache for page fragments that every student of a class-section sees
+identically (homework list, exam timetable).
+
+Fragments are stored in the default Django cache under a key that includes
+the class-section's version stamp, so a write in any worker makes every
+worker miss on its next request; stale entries simply expire.
+
+Writes bump the stamps after they commit: row saves and deletes through the
+signals in signals.py, bulk writes (which send no signals) through
+ClassPageQuerySet, the default manager of both models.
+"""
+from django.core.cache import cache
+from django.db import models, transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import stamps
+
+
+CLASS_PAGE_TIMEOUT = 24 * 60 * 60
+
+HOMEWORK = "homework"
+TIMETABLE = "timetable"
+
+
+def _stamp_name(kind, student_class, section):
+    return f"{kind}-{student_class}-{section}"
+
+
+def class_fragment(kind, student_class, section, template, get_context):
+    """
+    Rendered ``template`` for one class-section, from the cache when the
+    class-section has not changed since it was stored. ``get_context`` is
+    only called on a miss.
+    """
+    generation = stamps.current(_stamp_name(kind, student_class, section))
+    key = f"class-page:{kind}:{student_class}:{section}:{generation}"
+
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(template, get_context())
+        cache.set(key, html, CLASS_PAGE_TIMEOUT)
+    return mark_safe(html)
+
+
+def invalidate_class_pages(kind, class_sections):
+    """Drop the cached ``kind`` fragment of each (class, section) given."""
+    for student_class, section in set(class_sections):
+        stamps.bump(_stamp_name(kind, student_class, section))
+
+
+def invalidate_on_commit(kind, class_sections):
+    """
+    invalidate_class_pages once the current transaction commits: a worker
+    that rebuilt a fragment before then would store the old rows under the
+    new stamp.
+    """
+    class_sections = set(class_sections)
+    if class_sections:
+        transaction.on_commit(lambda: invalidate_class_pages(kind, class_sections))
+
+
+class ClassPageQuerySet(models.QuerySet):
+    """
+    Bulk writes to a model shown on a class page (``class_page_kind``) that
+    also invalidate the class-sections they touch, before and after.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        invalidate_on_commit(
+            self.model.class_page_kind,
+            [(obj.student_class, obj.section) for obj in objs]
+        )
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        keys = set()
+        for obj in objs:
+            keys.add((obj.student_class, obj.section))
+            previous = getattr(obj, "_class_key", None)
+            if previous and None not in previous:
+                keys.add(previous)
+            obj._class_key = (obj.student_class, obj.section)
+
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        invalidate_on_commit(self.model.class_page_kind, keys)
+        return rows
+
+    def update(self, **kwargs):
+        keys = set(self.values_list("student_class", "section").distinct())
+        rows = super().update(**kwargs)
+        if "student_class" in kwargs or "section" in kwargs:
+            # The class-sections the rows moved into change too.
+            keys |= {
+                (kwargs.get("student_class", student_class), kwargs.get("section", section))
+                for student_class, section in keys
+            }
+        invalidate_on_commit(self.model.class_page_kind, keys)
+        return rows
@@ -0,0 +1,272 @@
+"""
+Streaming CSV and XLSX exports of attendance, marks and exam fee payments.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` and encoded
+as they arrive, so a whole-school, multi-year export runs in constant
+memory and the header goes out before the query runs. The orderings
+follow the indexes where they can: a whole-school attendance export is
+only sorted within each date, and payments not at all; marks are sorted by
+SQLite (in its temp store, not in Python) before the first row.
+
+The CSV columns match what import_records reads back.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.db import DEFAULT_DB_ALIAS
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Attendance, ExamPayment, StudentMarks
+
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows encoded per piece of the response.
+ROWS_PER_PIECE = 500
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+STUDENT_FIELDS = [
+    "student__student_class",
+    "student__section",
+    "student__roll_number",
+    "student__user__first_name",
+    "student__user__last_name",
+    "student__user__username",
+]
+STUDENT_COLUMNS = ["class", "section", "roll_number", "name"]
+STUDENT_ORDER = ["student__student_class", "student__section", "student__roll_number"]
+
+# Columns, fields after the student's and ordering of each export.
+EXPORTS = {
+    "attendance": (
+        STUDENT_COLUMNS + ["date", "status"],
+        ["date", "status"],
+        ["date"] + STUDENT_ORDER,
+    ),
+    "marks": (
+        STUDENT_COLUMNS + ["exam_name", "subject", "marks"],
+        ["exam_name", "subject", "marks"],
+        STUDENT_ORDER + ["exam_name", "subject"],
+    ),
+    "payments": (
+        STUDENT_COLUMNS + ["amount", "status", "payment_id", "paid_on"],
+        ["amount", "status", "payment_id", "paid_on"],
+        STUDENT_ORDER,
+    ),
+}
+
+MODELS = {
+    "attendance": Attendance,
+    "marks": StudentMarks,
+    "payments": ExamPayment,
+}
+
+
+# ===============================
+# ROWS
+# ===============================
+
+def export_queryset(kind, student_class="", section="", date_from=None, date_to=None,
+                    exam_name="", using=DEFAULT_DB_ALIAS):
+    """values_list() queryset of one export; empty filters mean everything."""
+    _, fields, ordering = EXPORTS[kind]
+    rows = MODELS[kind].objects.using(using)
+
+    if student_class:
+        rows = rows.filter(student__student_class=student_class)
+    if section:
+        rows = rows.filter(student__section=section)
+    if kind == "attendance":
+        if date_from:
+            rows = rows.filter(date__gte=date_from)
+        if date_to:
+            rows = rows.filter(date__lte=date_to)
+    if kind == "marks" and exam_name:
+        rows = rows.filter(exam_name=exam_name)
+
+    return rows.order_by(*ordering).values_list(*STUDENT_FIELDS, *fields)
+
+
+def export_rows(queryset):
+    """Rows ready to write: the student's name joined, dates as text."""
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        student_class, section, roll_number, first, last, username = row[:6]
+        name = f"{first} {last}".strip() or username
+        values = [student_class, section, roll_number, name]
+        for value in row[6:]:
+            if isinstance(value, datetime):
+                value = timezone.localtime(value).strftime("%Y-%m-%d %H:%M")
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(value)
+        yield values
+
+
+# ===============================
+# CSV
+# ===============================
+
+class Echo:
+    """File-like object whose write() hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def csv_pieces(columns, rows):
+    writer = csv.writer(Echo())
+    # The byte order mark makes Excel read the file as UTF-8.
+    yield "\ufeff" + writer.writerow(columns)
+
+    piece = []
+    for row in rows:
+        piece.append(writer.writerow(row))
+        if len(piece) >= ROWS_PER_PIECE:
+            yield "".join(piece)
+            piece = []
+    if piece:
+        yield "".join(piece)
+
+
+# ===============================
+# XLSX
+# ===============================
+
+class Sink(io.RawIOBase):
+    """Unseekable stream that collects what zipfile writes until drained."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+# Characters XML 1.0 does not allow.
+XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if value is None or value == "":
+        return "<c/>"
+    text = escape(XML_INVALID.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(values):
+    return "<row>" + "".join(xlsx_cell(value) for value in values) + "</row>"
+
+
+def xlsx_pieces(columns, rows, sheet_name="Export"):
+    """
+    A one-sheet workbook with inline strings (no shared string table, which
+    would need every value up front), zipped as it is generated.
+    """
+    sink = Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/workbook.xml", WORKBOOK.format(name=escape(sheet_name[:31])))
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((SHEET_START + xlsx_row(columns)).encode())
+            piece = []
+            for row in rows:
+                piece.append(xlsx_row(row))
+                if len(piece) >= ROWS_PER_PIECE:
+                    sheet.write("".join(piece).encode())
+                    piece = []
+                    yield sink.drain()
+            sheet.write(("".join(piece) + SHEET_END).encode())
+
+    yield sink.drain()
+
+
+# ===============================
+# OUTPUT
+# ===============================
+
+def export_pieces(kind, fmt, **filters):
+    """The export as an iterator of str (CSV) or bytes (XLSX) pieces."""
+    columns = EXPORTS[kind][0]
+    rows = export_rows(export_queryset(kind, **filters))
+    if fmt == "xlsx":
+        return xlsx_pieces(columns, rows, sheet_name=kind.capitalize())
+    return csv_pieces(columns, rows)
+
+
+def export_filename(kind, fmt, student_class="", section="", **filters):
+    scope = f"class-{student_class}{section}" if student_class else "school"
+    return f"{kind}-{scope}-{timezone.localdate():%Y%m%d}.{fmt}"
+
+
+def export_response(kind, fmt, **filters):
+    response = StreamingHttpResponse(
+        export_pieces(kind, fmt, **filters),
+        content_type=FORMATS[fmt]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(kind, fmt, **filters)}"'
+    return response
@@ -0,0 +1,34 @@
+"""
+Base class for middleware that runs in both WSGI and ASGI chains.
+
+log.py, which settings.py imports, builds on it, so this module must not
+import models or anything else that needs configured settings.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+class HybridMiddleware:
+    """
+    Middleware that Django never has to adapt: ``call`` serves the sync
+    chain and ``acall`` the async one. Subclasses implement both.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
@@ -0,0 +1,54 @@
+"""
+Sortable, collision-free identifiers.
+
+``new_payment_id`` builds a ULID-style id: 48 bits of millisecond time
+followed by 80 random bits, in Crockford base32 so that string order is
+time order. Within one process ids are strictly increasing (the random part
+is incremented when the clock has not moved); across gunicorn workers and
+other processes uniqueness comes from the 80 random bits, so no shared
+state or database round trip is needed.
+"""
+import secrets
+import threading
+import time
+
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last = (0, 0)
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def new_ulid():
+    """26-character id, increasing within this process."""
+    global _last
+
+    with _lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, last_random = _last
+        if millis <= last_millis:
+            # Same millisecond (or the clock stepped back): keep the old
+            # timestamp and count up so the order still holds.
+            millis = last_millis
+            random_part = last_random + 1
+            if random_part >> RANDOM_BITS:
+                millis += 1
+                random_part = secrets.randbits(RANDOM_BITS)
+        else:
+            random_part = secrets.randbits(RANDOM_BITS)
+        _last = (millis, random_part)
+
+    return _encode(millis, 10) + _encode(random_part, 16)
+
+
+def new_payment_id(prefix="DUMMY"):
+    return f"{prefix}-{new_ulid()}"
@@ -0,0 +1,112 @@
+"""
+Resized, re-encoded copies of AboutImage uploads.
+
+Each upload gets a JPEG and a WebP copy at every width in VARIANT_WIDTHS
+that is smaller than the original (or just the original width when it is
+already small). Generation runs after the upload's transaction commits, in
+a single background thread per worker, so the admin save returns at once;
+the about page shows the original until the copies exist.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import AboutImage
+
+
+logger = logging.getLogger("students")
+
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+VARIANT_DIR = "about_images/variants"
+
+# Pillow format name, file extension and encoder options.
+FORMATS = {
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "webp", {"quality": 78, "method": 4}),
+}
+
+_executor = None
+
+
+def variant_widths(original_width):
+    widths = [w for w in VARIANT_WIDTHS if w < original_width]
+    return widths or [original_width]
+
+
+def generate_variants(pk):
+    """
+    Build every copy of one AboutImage, store them and record them on the
+    row. Returns the number of files written (0 if the row is gone).
+    """
+    about = AboutImage.objects.filter(pk=pk).first()
+    if about is None or not about.image:
+        return 0
+
+    with about.image.open("rb") as f:
+        original = Image.open(f)
+        # Phone photos are often stored sideways with an EXIF rotation.
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode in ("RGBA", "LA", "P"):
+        # JPEG has no alpha: flatten transparent areas onto white.
+        rgba = original.convert("RGBA")
+        original = Image.new("RGB", rgba.size, "white")
+        original.paste(rgba, mask=rgba.getchannel("A"))
+    elif original.mode not in ("RGB", "L"):
+        original = original.convert("RGB")
+
+    stem = os.path.splitext(os.path.basename(about.image.name))[0]
+    variants = []
+    for width in variant_widths(original.width):
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.LANCZOS)
+
+        for fmt, (pil_format, extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = f"{VARIANT_DIR}/{about.pk}-{stem}-{width}.{extension}"
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({"name": name, "format": fmt, "width": width, "height": height})
+
+    previous = about.variants
+    # update(), not save(): the save signal would schedule this again.
+    AboutImage.objects.filter(pk=pk).update(
+        width=original.width,
+        height=original.height,
+        variants=variants,
+    )
+    delete_variant_files(v for v in previous if v["name"] not in {n["name"] for n in variants})
+    return len(variants)
+
+
+def delete_variant_files(variants):
+    for variant in variants:
+        default_storage.delete(variant["name"])
+
+
+def _run(pk):
+    try:
+        count = generate_variants(pk)
+        logger.info("About image variants built | image=%s | files=%s", pk, count)
+    except Exception:
+        logger.error("About image variants failed | image=%s", pk, exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(pk):
+    """Generate the copies in the background once the upload is committed."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="about-images")
+    executor = _executor
+    transaction.on_commit(lambda: executor.submit(_run, pk))
@@ -0,0 +1,369 @@
+"""
+Logging pipeline for the ``students`` logger.
+
+``DJANGO_LOG_MODE`` (see settings.py) picks one of the configurations built
+by ``build_logging_config``:
+
+* ``sync``  - the original text lines, written to school.log on the request
+  thread.
+* ``async`` - request threads only put records on a queue; a background
+  listener writes JSON lines (with request id, user, view and duration) to a
+  size- and day-rotated, gzip-compressed file.
+* ``off``   - records are dropped (used as the baseline by bench_logging).
+
+This module is imported by settings.py, so it must not import models or
+anything else that needs configured settings.
+"""
+import contextvars
+import fcntl
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from .hybrid import HybridMiddleware
+
+
+LOG_MODES = ("sync", "async", "off")
+
+# The request being served by this thread/task, for ContextFilter.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+REQUEST_ID_HEADER = "HTTP_X_REQUEST_ID"
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+# ===============================
+# RECORD CONTEXT
+# ===============================
+
+class ContextFilter(logging.Filter):
+    """
+    Copy request id, user and view of the current request onto the record.
+
+    Attach it to the handler that runs on the request thread (the queue
+    handler in async mode): the listener thread has no request context.
+    """
+
+    def filter(self, record):
+        request = current_request.get()
+        record.request_id = getattr(request, "request_id", None)
+        record.user = None
+        record.view = None
+
+        if request is not None:
+            # Only read the user if authentication already ran for this
+            # request; never trigger a session query from a log call.
+            user = getattr(request, "_cached_user", None)
+            if user is not None and user.is_authenticated:
+                record.user = user.get_username()
+            match = getattr(request, "resolver_match", None)
+            if match is not None:
+                record.view = match.view_name
+
+        if not hasattr(record, "duration_ms"):
+            record.duration_ms = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    FIELDS = ("request_id", "user", "view", "duration_ms")
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+# ===============================
+# HANDLERS
+# ===============================
+
+class BackgroundListener(QueueListener):
+    """QueueListener whose stop() waits for room instead of failing on a full queue."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Put records on a bounded queue; a QueueListener thread hands them to the
+    real handlers. When the queue is full, records are dropped and counted
+    instead of blocking the request.
+
+    ``handlers`` names other handlers from the same LOGGING dict as
+    ``cfg://handlers.<name>``. dictConfig builds handlers in name order and
+    retries ones whose targets are not built yet.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        # ConvertingList only resolves cfg:// references on item access.
+        self.targets = [handlers[i] for i in range(len(handlers))]
+        for target in self.targets:
+            if not isinstance(target, logging.Handler):
+                raise ValueError(f"target not configured yet: {target!r}")
+
+        self.dropped = 0
+        self.listener = None
+        self.start()
+        # A gunicorn --preload master forks workers after settings load;
+        # the listener thread does not survive the fork.
+        os.register_at_fork(after_in_child=self.start)
+
+    def start(self):
+        self.listener = BackgroundListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Merge the args now, since they may change after the call returns,
+        # but leave formatting (and the copy QueueHandler makes for
+        # pickling) to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotate when the file reaches ``maxBytes`` or at local midnight, keeping
+    ``backupCount`` gzipped files (``school.jsonl.1.gz`` is the newest).
+
+    Several worker processes may write to the same file; rollover happens
+    under an flock on ``<file>.lock`` and a worker that finds the file
+    already rotated by another one just reopens it.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, daily=True, encoding="utf-8"):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        super().__init__(
+            filename,
+            maxBytes=maxBytes,
+            backupCount=backupCount,
+            encoding=encoding,
+            delay=True
+        )
+        self.daily = daily
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self.compress
+        self.rollover_at = self.next_midnight()
+
+        # A file left over from an earlier day rotates on the first record.
+        try:
+            if daily and os.path.getmtime(self.baseFilename) < self.rollover_at - 86400:
+                self.rollover_at = 0
+        except OSError:
+            pass
+
+    @staticmethod
+    def next_midnight():
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    @staticmethod
+    def compress(source, dest):
+        if not os.path.exists(source):
+            return
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.daily and time.time() >= self.rollover_at:
+            return True
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return os.fstat(self.stream.fileno()).st_size >= self.maxBytes
+
+    def rotated_elsewhere(self):
+        if self.stream is None:
+            return False
+        try:
+            on_disk = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            return True
+        return on_disk != os.fstat(self.stream.fileno()).st_ino
+
+    def doRollover(self):
+        with open(f"{self.baseFilename}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.rotated_elsewhere():
+                self.stream.close()
+                self.stream = self._open()
+            else:
+                super().doRollover()
+        self.rollover_at = self.next_midnight()
+
+
+# ===============================
+# REQUEST MIDDLEWARE
+# ===============================
+
+request_logger = logging.getLogger("students.requests")
+
+
+class RequestLogMiddleware(HybridMiddleware):
+    """
+    Give every request an id (from X-Request-ID when it looks sane), make
+    the request visible to ContextFilter, and log one line per request with
+    its status and duration. Put it near the top of MIDDLEWARE.
+    """
+
+    def call(self, request):
+        token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.finish(request, response, started)
+        finally:
+            current_request.reset(token)
+        return response
+
+    async def acall(self, request):
+        # Each request runs in its own task, so the context variable is
+        # per-request here too (and is copied into the view's pool thread).
+        token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response, started)
+        finally:
+            current_request.reset(token)
+        return response
+
+    def start(self, request):
+        incoming = request.META.get(REQUEST_ID_HEADER, "")
+        request.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        return current_request.set(request)
+
+    def finish(self, request, response, started):
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info(
+                "Request | method=%s | path=%s | status=%s",
+                request.method,
+                request.path,
+                response.status_code,
+                extra={"duration_ms": duration_ms}
+            )
+        response["X-Request-ID"] = request.request_id
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+def build_logging_config(mode, text_file, json_file, max_bytes=10 * 1024 * 1024,
+                         backup_count=14, console=True):
+    """LOGGING dict for one of LOG_MODES."""
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode {mode!r}; expected one of {', '.join(LOG_MODES)}")
+
+    console_handler = {
+        "class": "logging.StreamHandler" if console else "logging.NullHandler",
+        "formatter": "simple",
+    }
+
+    config = {
+        "version": 1,
+        "disable_existing_loggers": False,
+
+        "filters": {
+            "context": {"()": "students.log.ContextFilter"},
+        },
+
+        "formatters": {
+            "simple": {
+                "format": "[{levelname}] {asctime} | {name} | {message}",
+                "style": "{",
+            },
+            "json": {"()": "students.log.JsonFormatter"},
+        },
+    }
+
+    if mode == "sync":
+        config["handlers"] = {
+            "console": console_handler,
+            "file": {
+                "class": "logging.FileHandler",
+                "filename": str(text_file),
+                "formatter": "simple",
+            },
+        }
+        handlers = ["console", "file"]
+        # The per-request line would add a blocking write to every request.
+        request_level = "WARNING"
+
+    elif mode == "async":
+        # "queue" must sort after the handlers it feeds (see BackgroundHandler).
+        config["handlers"] = {
+            "console": console_handler,
+            "json_file": {
+                "()": "students.log.GzipRotatingFileHandler",
+                "filename": str(json_file),
+                "maxBytes": max_bytes,
+                "backupCount": backup_count,
+                "formatter": "json",
+            },
+            "queue": {
+                "()": "students.log.BackgroundHandler",
+                "handlers": ["cfg://handlers.console", "cfg://handlers.json_file"],
+                "filters": ["context"],
+            },
+        }
+        handlers = ["queue"]
+        request_level = "INFO"
+
+    else:
+        config["handlers"] = {
+            "null": {"class": "logging.NullHandler"},
+        }
+        handlers = ["null"]
+        request_level = "WARNING"
+
+    config["loggers"] = {
+        "students": {
+            "handlers": handlers,
+            "level": "INFO",
+            "propagate": False,
+        },
+        "students.requests": {
+            "level": request_level,
+        },
+    }
+    return config
@@ -0,0 +1,215 @@
+import http.client
+import json
+import sqlite3
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from students.models import EXAM_MAX_MARKS, StudentProfile
+
+from .bench_views import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server with concurrent clients requesting the "
+        "read-only student and parent pages, and report requests/second and "
+        "p50/p95/p99 latency per concurrency level. Run it once against the "
+        "WSGI server and once against the ASGI one (see asgi.py), saving the "
+        "first with --save and passing it to the second with --compare. "
+        "Sessions are created in this project's database, so the server "
+        "must use the same database and SECRET_KEY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Base URL of the server, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", default="1,8,32", help="Comma separated client counts")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+        parser.add_argument("--users", type=int, default=20, help="Distinct students (and their parents) to log in")
+        parser.add_argument(
+            "--lock-hold",
+            type=float,
+            default=0.0,
+            help="Hold an exclusive database lock for this many ms ... "
+        )
+        parser.add_argument("--lock-every", type=float, default=500.0, help="... every this many ms")
+        parser.add_argument("--save", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Print a saved run next to this one")
+
+    def handle(self, *args, **options):
+        target = urlsplit(options["url"])
+        if target.scheme != "http" or not target.hostname:
+            raise CommandError("Give the server as http://host:port")
+
+        levels = [int(n) for n in options["concurrency"].split(",")]
+        sessions = self.login_sessions(options["users"])
+
+        locker = None
+        if options["lock_hold"] > 0:
+            locker = Locker(options["lock_hold"] / 1000, options["lock_every"] / 1000)
+            locker.start()
+
+        results = {}
+        try:
+            for clients in levels:
+                results[str(clients)] = self.run_level(target, sessions, clients, options["duration"])
+                self.report_line(clients, results[str(clients)])
+        finally:
+            if locker is not None:
+                locker.stop()
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if options["compare"]:
+            self.compare(results, options["compare"])
+
+    # ---------------- SETUP ----------------
+
+    def login_sessions(self, count):
+        """A session cookie and page list per logged in student and parent."""
+        students = list(
+            StudentProfile.objects.select_related("user")
+            .filter(user__groups__name="Student", parents__isnull=False)
+            .prefetch_related("parents__user")
+            .order_by("id")[:count]
+        )
+        if not students:
+            raise CommandError("Need students with parents; run seed_school first.")
+
+        exam = "SA-1" if "SA-1" in EXAM_MAX_MARKS else next(iter(EXAM_MAX_MARKS))
+        student_paths = [
+            reverse("homework"),
+            reverse("exam_timetable"),
+            reverse("attendance"),
+            reverse("marks_by_exam", args=[exam]),
+        ]
+        parent_paths = [reverse("parent_dashboard")]
+
+        sessions = []
+        for student in students:
+            sessions.append((self.session_cookie(student.user), student_paths))
+            for parent in student.parents.all():
+                sessions.append((self.session_cookie(parent.user), parent_paths))
+        return sessions
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        morsel = client.cookies[settings.SESSION_COOKIE_NAME]
+        return f"{settings.SESSION_COOKIE_NAME}={morsel.value}"
+
+    # ---------------- RUNNING ----------------
+
+    def run_level(self, target, sessions, clients, duration):
+        timings = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client_loop(n):
+            connection = None
+            own_timings = []
+            own_errors = 0
+            sent = 0
+            while time.monotonic() < deadline:
+                cookie, paths = sessions[(n + sent) % len(sessions)]
+                path = paths[sent % len(paths)]
+                sent += 1
+                if connection is None:
+                    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers={"Cookie": cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        own_errors += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    own_errors += 1
+                    connection.close()
+                    connection = None
+                    continue
+                own_timings.append((time.perf_counter() - started) * 1000)
+            if connection is not None:
+                connection.close()
+            with lock:
+                timings.extend(own_timings)
+                errors.append(own_errors)
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        if not timings:
+            raise CommandError(f"No successful requests with {clients} clients ({sum(errors)} errors)")
+
+        return {
+            "requests": len(timings),
+            "errors": sum(errors),
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+        }
+
+    def report_line(self, clients, result):
+        self.stdout.write(
+            f"{clients:>4} clients  {result['rps']:>8.1f} req/s  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"p99 {result['p99_ms']:>8.2f} ms  {result['errors']} errors"
+        )
+
+    def compare(self, results, path):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        self.stdout.write(f"\nCompared with {path}:")
+        for clients, result in results.items():
+            before = baseline.get(clients)
+            if not before:
+                continue
+            self.stdout.write(
+                f"{clients:>4} clients  req/s {before['rps']:>8.1f} -> {result['rps']:>8.1f}  "
+                f"p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms"
+            )
+
+
+class Locker(threading.Thread):
+    """
+    Periodically hold an exclusive lock on the SQLite database, the way a
+    long attendance or import transaction does, so readers have to wait.
+    """
+
+    def __init__(self, hold, every):
+        super().__init__(daemon=True)
+        self.hold = hold
+        self.every = every
+        self.stopped = threading.Event()
+
+    def run(self):
+        db = sqlite3.connect(settings.DATABASES["default"]["NAME"], timeout=30, isolation_level=None)
+        try:
+            while not self.stopped.wait(max(self.every - self.hold, 0)):
+                db.execute("BEGIN EXCLUSIVE")
+                time.sleep(self.hold)
+                db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
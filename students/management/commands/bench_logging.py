@@ -0,0 +1,96 @@
+import logging
+import logging.config
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from students.log import LOG_MODES, build_logging_config
+from students.models import StudentProfile
+
+from .bench_views import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what logging costs a request in each DJANGO_LOG_MODE: the "
+        "time of one logger.info call on the request thread, and p50/p95 of "
+        "a page that logs (marks_by_exam) compared with logging off. Log "
+        "files go to a temporary directory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=20000, help="logger.info calls per mode")
+        parser.add_argument("--requests", type=int, default=200, help="Page requests per mode")
+        parser.add_argument("--exam", default="SA-1")
+
+    def handle(self, *args, **options):
+        student = (
+            StudentProfile.objects.select_related("user")
+            .filter(user__groups__name="Student")
+            .order_by("id").first()
+        )
+        if student is None:
+            raise CommandError("Need at least one student; run seed_school first.")
+        url = reverse("marks_by_exam", args=[options["exam"]])
+
+        results = {}
+        try:
+            with tempfile.TemporaryDirectory() as tmp, \
+                    override_settings(ALLOWED_HOSTS=["testserver"], DEBUG=False):
+                for mode in LOG_MODES:
+                    self.configure(mode, Path(tmp) / mode)
+                    results[mode] = {
+                        "record_us": self.time_records(options["records"]),
+                        **self.time_requests(student.user, url, options["requests"]),
+                    }
+                    logging.shutdown()
+        finally:
+            logging.config.dictConfig(settings.LOGGING)
+
+        baseline = results["off"]["p50_ms"]
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<6} logger.info {result['record_us']:>7.2f} us  "
+                f"request p50 {result['p50_ms']:>7.2f} ms  p95 {result['p95_ms']:>7.2f} ms  "
+                f"({result['p50_ms'] - baseline:+.2f} ms vs off)"
+            )
+
+    def configure(self, mode, directory):
+        directory.mkdir()
+        config = build_logging_config(
+            mode,
+            text_file=directory / "school.log",
+            json_file=directory / "school.jsonl",
+            console=False,
+        )
+        logging.config.dictConfig(config)
+
+    def time_records(self, count):
+        logger = logging.getLogger("students")
+        started = time.perf_counter()
+        for n in range(count):
+            logger.info("Bench record | n=%s | exam=%s", n, "SA-1")
+        return (time.perf_counter() - started) / count * 1_000_000
+
+    def time_requests(self, user, url, count):
+        client = Client()
+        client.force_login(user)
+        client.get(url)
+
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return {
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+        }
@@ -0,0 +1,233 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from students import urls as student_urls
+from students.models import (
+    EXAM_MAX_MARKS,
+    Attendance,
+    PaymentTransaction,
+    StudentProfile,
+    TeacherProfile,
+)
+
+
+# Views that only accept writes or end the session are not benchmarked,
+# nor is the metrics scrape endpoint.
+SKIPPED = {"logout", "dummy_pay_exam_fee", "metrics"}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every page in students/urls.py with the test client and "
+        "report p50/p95 latency and SQL query count per view. Run it against "
+        "a database filled by seed_school."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--only", help="Comma separated URL names to run")
+        parser.add_argument("--save", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Compare against a saved JSON baseline")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=25.0,
+            help="Percent p95 slowdown allowed before --compare flags a view"
+        )
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=2.0,
+            help="Ignore p95 slowdowns smaller than this many ms (timer noise)"
+        )
+
+    def handle(self, *args, **options):
+        cases = self.build_cases()
+        if options["only"]:
+            wanted = set(options["only"].split(","))
+            cases = {name: case for name, case in cases.items() if name in wanted}
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=["testserver"], DEBUG=False):
+            for name, (user, url) in cases.items():
+                results[name] = self.run_case(user, url, options["warmup"], options["iterations"])
+                self.report_line(name, results[name])
+
+        missing = [
+            pattern.name for pattern in student_urls.urlpatterns
+            if pattern.name and pattern.name not in cases and pattern.name not in SKIPPED
+        ]
+        if missing and not options["only"]:
+            self.stdout.write(self.style.WARNING(
+                f"No benchmark case for: {', '.join(sorted(missing))}"
+            ))
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+
+        if options["compare"]:
+            self.compare(results, options["compare"], options["tolerance"], options["min_delta"])
+
+    # ---------------- CASES ----------------
+
+    def build_cases(self):
+        """Pick a representative user of each role and a URL per view."""
+        student = (
+            StudentProfile.objects.select_related("user")
+            .filter(user__groups__name="Student", parents__isnull=False)
+            .order_by("id").first()
+        )
+        teacher = (
+            User.objects.filter(groups__name="Teacher", teacherprofile__in=TeacherProfile.objects.all())
+            .order_by("id").first()
+        )
+        if student is None or teacher is None:
+            raise CommandError("Need at least one student with a parent and one teacher; run seed_school first.")
+
+        parent = student.parents.select_related("user").first().user
+        payment = PaymentTransaction.objects.filter(student=student).first()
+
+        class_query = f"load=1&class={student.student_class}&section={student.section}"
+        exam = "SA-1" if "SA-1" in EXAM_MAX_MARKS else next(iter(EXAM_MAX_MARKS))
+
+        cases = {
+            "home": (None, reverse("home")),
+            "about": (None, reverse("about")),
+            "contact": (None, reverse("contact")),
+            "login": (None, reverse("login")),
+            "teacher_login": (None, reverse("teacher_login")),
+
+            "profile": (student.user, reverse("profile")),
+            "edit_profile": (student.user, reverse("edit_profile")),
+            "marks_by_exam": (student.user, reverse("marks_by_exam", args=[exam])),
+            "attendance": (student.user, reverse("attendance")),
+            "homework": (student.user, reverse("homework")),
+            "exam_timetable": (student.user, reverse("exam_timetable")),
+
+            "teacher_dashboard": (teacher, reverse("teacher_dashboard")),
+            "teacher_add_homework": (teacher, reverse("teacher_add_homework")),
+            "teacher_mark_attendance": (
+                teacher,
+                f"{reverse('teacher_mark_attendance')}?{class_query}&date={self.latest_attendance_date()}"
+            ),
+            "teacher_marks": (
+                teacher,
+                f"{reverse('teacher_marks')}?{class_query}&subject=Maths&exam_name={exam}"
+            ),
+            "teacher_marks_grid": (
+                teacher,
+                f"{reverse('teacher_marks_grid')}?{class_query}&exam_name={exam}"
+            ),
+            "teacher_class_results": (
+                teacher,
+                f"{reverse('teacher_class_results')}?{class_query}&exam_name={exam}"
+            ),
+            "teacher_attendance_register": (
+                teacher,
+                f"{reverse('teacher_attendance_register')}?{class_query}"
+                f"&month={self.latest_attendance_date()[:7]}"
+            ),
+            # The default range, ending on the last day with attendance.
+            "teacher_attendance_trends": (teacher, reverse("teacher_attendance_trends")),
+            # The whole class's attendance as CSV, read to the last row.
+            "teacher_export": (
+                teacher,
+                f"{reverse('teacher_export')}?kind=attendance&format=csv"
+                f"&class={student.student_class}&section={student.section}"
+            ),
+
+            "parent_dashboard": (parent, reverse("parent_dashboard")),
+            "payment_history": (parent, reverse("payment_history")),
+        }
+        if payment:
+            cases["payment_receipt"] = (parent, reverse("payment_receipt", args=[payment.pk]))
+
+        known = {pattern.name for pattern in student_urls.urlpatterns}
+        return {name: case for name, case in cases.items() if name in known}
+
+    def latest_attendance_date(self):
+        latest = Attendance.objects.order_by("-date").values_list("date", flat=True).first()
+        return latest.isoformat() if latest else "2026-01-01"
+
+    # ---------------- RUNNING ----------------
+
+    def run_case(self, user, url, warmup, iterations):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        queries = []
+        status = None
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    # The rows are only read as the body is consumed.
+                    b"".join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            status = response.status_code
+
+        return {
+            "url": url,
+            "status": status,
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "queries": max(queries),
+        }
+
+    def report_line(self, name, result):
+        self.stdout.write(
+            f"{name:<30} {result['status']:>4}  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"{result['queries']:>3} queries"
+        )
+
+    def compare(self, results, path, tolerance, min_delta):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        regressions = 0
+        self.stdout.write(f"\nCompared with {path}:")
+        for name, result in sorted(results.items()):
+            before = baseline.get(name)
+            if not before:
+                self.stdout.write(f"{name:<30} (new)")
+                continue
+
+            delta = result["p95_ms"] - before["p95_ms"]
+            change = delta / before["p95_ms"] * 100 if before["p95_ms"] else 0
+            query_change = result["queries"] - before["queries"]
+            slower = (change > tolerance and delta > min_delta) or query_change > 0
+            regressions += slower
+
+            line = (
+                f"{name:<30} p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms "
+                f"({change:+.0f}%)  queries {before['queries']} -> {result['queries']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if slower else line)
+
+        if regressions:
+            raise CommandError(f"{regressions} view(s) regressed against {path}")
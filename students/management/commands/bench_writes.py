@@ -0,0 +1,160 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+
+from students.models import StudentProfile
+from students.services import save_attendance_register
+from students.utils import is_lock_error
+
+from .bench_views import percentile
+
+
+# journal_mode is what "default" sets explicitly: the copy may come from a
+# database already switched to WAL.
+PROFILES = {
+    "default": ({"journal_mode": "delete"}, 0),
+    "production": (settings.PRODUCTION_SQLITE_PRAGMAS, 600),
+}
+
+
+def _setup_worker(path, pragmas, conn_max_age):
+    django.setup()
+    settings.SQLITE_PRAGMAS = pragmas
+    connections.databases["default"].update(NAME=path, CONN_MAX_AGE=conn_max_age)
+
+
+def _write_registers(registers, dates, seconds, seed):
+    """Save random registers until the time is up, like a teacher's POSTs."""
+    rng = random.Random(seed)
+    timings = []
+    failures = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        student_ids = rng.choice(registers)
+        statuses = {
+            student_id: "Present" if rng.random() < 0.9 else "Absent"
+            for student_id in student_ids
+        }
+        # Each save is one request: connections are closed (or kept, with
+        # CONN_MAX_AGE) at the request boundaries.
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            save_attendance_register(rng.choice(dates), statuses)
+            timings.append((time.perf_counter() - started) * 1000)
+        except OperationalError as error:
+            if not is_lock_error(error):
+                raise
+            failures += 1
+        close_old_connections()
+
+    connections.close_all()
+    return timings, failures
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure attendance saves from several processes at once, with each "
+        "SQLite profile (default journal and per-request connections, then "
+        "the production pragmas and kept connections). Runs on a copy of "
+        "the database, so nothing is written to the real one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10.0, help="Run time per profile")
+        parser.add_argument("--days", type=int, default=20, help="Register dates to spread saves over")
+        parser.add_argument("--profiles", default="default,production")
+
+    def handle(self, *args, **options):
+        source = str(settings.DATABASES["default"]["NAME"])
+        if source == ":memory:" or not os.path.exists(source):
+            raise CommandError("Needs an on-disk SQLite database.")
+
+        profiles = options["profiles"].split(",")
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        registers = self.class_registers()
+        start = date.today() - timedelta(days=options["days"])
+        dates = [start + timedelta(days=n) for n in range(options["days"])]
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile in profiles:
+                path = os.path.join(tmp, f"{profile}.sqlite3")
+                self.copy_database(source, path, PROFILES[profile][0].get("journal_mode"))
+                results[profile] = self.run_profile(path, profile, registers, dates, options)
+                self.report_line(profile, results[profile])
+
+        if {"default", "production"} <= set(results):
+            before, after = results["default"], results["production"]
+            self.stdout.write(
+                f"\nproduction vs default: {after['per_second'] / max(before['per_second'], 0.1):.1f}x "
+                f"saves/s, failures {before['failures']} -> {after['failures']}"
+            )
+
+    def class_registers(self):
+        registers = {}
+        rows = StudentProfile.objects.values_list("student_class", "section", "id")
+        for student_class, section, student_id in rows:
+            registers.setdefault((student_class, section), []).append(student_id)
+        if not registers:
+            raise CommandError("No students; run seed_school first.")
+        return list(registers.values())
+
+    def copy_database(self, source, path, journal_mode):
+        connections.close_all()
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(path)
+        try:
+            src.backup(dst)
+            if journal_mode:
+                dst.execute(f"PRAGMA journal_mode = {journal_mode}")
+        finally:
+            dst.close()
+            src.close()
+
+    def run_profile(self, path, profile, registers, dates, options):
+        pragmas, conn_max_age = PROFILES[profile]
+        processes = options["processes"]
+
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_setup_worker,
+            initargs=(path, pragmas, conn_max_age),
+        ) as pool:
+            futures = [
+                pool.submit(_write_registers, registers, dates, options["seconds"], seed)
+                for seed in range(processes)
+            ]
+            outcomes = [future.result() for future in futures]
+
+        timings = [t for own, _ in outcomes for t in own]
+        failures = sum(failed for _, failed in outcomes)
+        return {
+            "saves": len(timings),
+            "failures": failures,
+            "per_second": round(len(timings) / options["seconds"], 1),
+            "p50_ms": round(statistics.median(timings), 2) if timings else 0,
+            "p95_ms": round(percentile(timings, 95), 2) if timings else 0,
+        }
+
+    def report_line(self, profile, result):
+        self.stdout.write(
+            f"{profile:<11} {result['saves']:>6} saves  {result['per_second']:>7.1f}/s  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"{result['failures']} lock failures"
+        )
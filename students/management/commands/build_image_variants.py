@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from students.images import generate_variants
+from students.models import AboutImage
+
+
+def _setup_worker():
+    # Harmless after fork; needed when workers are spawned.
+    django.setup()
+
+
+def _build(pk):
+    try:
+        return pk, generate_variants(pk), None
+    except Exception as error:
+        return pk, 0, str(error)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized JPEG/WebP copies of about page images that do not "
+        "have them yet (all images with --all), in a pool of processes "
+        "(in this one with --workers 1)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild images that already have copies")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        images = AboutImage.objects.exclude(image="")
+        if not options["all"]:
+            images = images.filter(variants=[])
+        ids = list(images.order_by("id").values_list("id", flat=True))
+
+        if not ids:
+            self.stdout.write("Nothing to build.")
+            return
+
+        started = time.monotonic()
+        failed = 0
+
+        for pk, files, error in self.build(ids, options["workers"]):
+            if error:
+                failed += 1
+                self.stderr.write(f"  image {pk}: {error}")
+            else:
+                self.stdout.write(f"  image {pk}: {files} files")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built copies for {len(ids) - failed} of {len(ids)} images "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def build(self, ids, workers):
+        """Yield ``(pk, files, error)`` per image, in this process for one worker."""
+        if workers <= 1:
+            yield from map(_build, ids)
+            return
+
+        # Forked workers must not share this process's SQLite connection.
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+            for future in as_completed([pool.submit(_build, pk) for pk in ids]):
+                yield future.result()
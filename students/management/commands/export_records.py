@@ -0,0 +1,64 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.exports import EXPORTS, FORMATS, export_pieces
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Expected a date like 2026-01-31, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Export Attendance, StudentMarks or ExamPayment rows of a class, a "
+        "section or the whole school as CSV or XLSX, written as they are read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write (default: stdout, CSV only)")
+        parser.add_argument("--class", dest="student_class", default="", help="Only this class")
+        parser.add_argument("--section", default="", help="Only this section")
+        parser.add_argument("--from", dest="start", help="First attendance date, e.g. 2025-06-01")
+        parser.add_argument("--to", dest="end", help="Last attendance date")
+        parser.add_argument("--exam", dest="exam_name", default="", help="Only this exam (marks)")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        fmt = options["fmt"]
+        if fmt == "xlsx" and not options["output"]:
+            raise CommandError("XLSX needs --output.")
+
+        pieces = export_pieces(
+            options["kind"], fmt,
+            student_class=options["student_class"],
+            section=options["section"],
+            date_from=parse_day(options["start"]) if options["start"] else None,
+            date_to=parse_day(options["end"]) if options["end"] else None,
+            exam_name=options["exam_name"],
+            using=options["database"],
+        )
+
+        started = time.monotonic()
+        if not options["output"]:
+            for piece in pieces:
+                self.stdout.write(piece, ending="")
+            return
+
+        if fmt == "xlsx":
+            out = open(options["output"], "wb")
+        else:
+            out = open(options["output"], "w", encoding="utf-8", newline="")
+        with out:
+            for piece in pieces:
+                out.write(piece)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['output']} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,202 @@
+import csv
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.models import StudentProfile
+from students.services import clean_marks, upsert_attendance, upsert_marks
+
+
+STUDENT_COLUMNS = ["class", "section", "roll_number"]
+
+COLUMNS = {
+    "marks": STUDENT_COLUMNS + ["exam_name", "subject", "marks"],
+    "attendance": STUDENT_COLUMNS + ["date", "status"],
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"]
+
+STATUS_ALIASES = {
+    "present": "Present",
+    "p": "Present",
+    "absent": "Absent",
+    "a": "Absent",
+}
+
+# Marker for roll numbers that appear more than once in a class-section.
+AMBIGUOUS = object()
+
+
+def build_student_index():
+    """Map (class, section, roll number) to a student id in one query."""
+    index = {}
+    rows = StudentProfile.objects.values_list(
+        "student_class", "section", "roll_number", "id"
+    )
+    for student_class, section, roll_number, student_id in rows.iterator():
+        key = (student_class.upper(), section.upper(), roll_number.strip())
+        index[key] = AMBIGUOUS if key in index else student_id
+    return index
+
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Import StudentMarks or Attendance rows from a CSV file. "
+        "Marks columns: class,section,roll_number,exam_name,subject,marks. "
+        "Attendance columns: class,section,roll_number,date,status."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(COLUMNS))
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows written per transaction (default 2000)"
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Where to write rejected rows (default <path>.rejects.csv)"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate only, do not write anything"
+        )
+
+    def handle(self, *args, **options):
+        kind = options["kind"]
+        chunk_size = options["chunk_size"]
+        dry_run = options["dry_run"]
+        rejects_path = options["rejects"] or f"{options['path']}.rejects.csv"
+
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        index = build_student_index()
+        parse_row = self.parse_marks if kind == "marks" else self.parse_attendance
+        write = upsert_marks if kind == "marks" else upsert_attendance
+
+        started = time.monotonic()
+        seen = accepted = rejected = created = updated = 0
+        chunk = {}
+
+        try:
+            source = open(options["path"], newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+
+        with source, open(rejects_path, "w", newline="", encoding="utf-8") as rejects_file:
+            reader = csv.DictReader(source)
+            missing = set(COLUMNS[kind]) - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(
+                    f"Missing columns: {', '.join(sorted(missing))}"
+                )
+
+            rejects = csv.writer(rejects_file)
+            rejects.writerow(["line"] + reader.fieldnames + ["error"])
+
+            for row in reader:
+                seen += 1
+                key, value, error = parse_row(row, index)
+
+                if error:
+                    rejected += 1
+                    rejects.writerow(
+                        [reader.line_num]
+                        + [row.get(name, "") for name in reader.fieldnames]
+                        + [error]
+                    )
+                    continue
+
+                accepted += 1
+                chunk[key] = value
+
+                if len(chunk) >= chunk_size:
+                    c, u = self.flush(write, chunk, dry_run)
+                    created += c
+                    updated += u
+                    chunk = {}
+                    self.report(seen, started)
+
+            c, u = self.flush(write, chunk, dry_run)
+            created += c
+            updated += u
+
+        elapsed = time.monotonic() - started
+        rate = seen / elapsed if elapsed else seen
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind}: {seen} rows in {elapsed:.1f}s ({rate:.0f} rows/sec) | "
+            f"accepted={accepted} created={created} updated={updated} "
+            f"rejected={rejected}"
+            + (" | dry run, nothing written" if dry_run else "")
+        ))
+        if rejected:
+            self.stdout.write(f"Rejected rows written to {rejects_path}")
+
+    def flush(self, write, chunk, dry_run):
+        if not chunk or dry_run:
+            return 0, 0
+        return write(chunk)
+
+    def report(self, seen, started):
+        elapsed = time.monotonic() - started
+        rate = seen / elapsed if elapsed else seen
+        self.stdout.write(f"  {seen} rows ({rate:.0f} rows/sec)")
+
+    def resolve_student(self, row, index):
+        key = (
+            (row["class"] or "").strip().upper(),
+            (row["section"] or "").strip().upper(),
+            (row["roll_number"] or "").strip(),
+        )
+        student_id = index.get(key)
+        if student_id is None:
+            return None, "Unknown student"
+        if student_id is AMBIGUOUS:
+            return None, "Duplicate roll number in class-section"
+        return student_id, ""
+
+    def parse_marks(self, row, index):
+        student_id, error = self.resolve_student(row, index)
+        if error:
+            return None, None, error
+
+        exam_name = (row["exam_name"] or "").strip().upper()
+        subject = (row["subject"] or "").strip()
+        if not subject:
+            return None, None, "Missing subject"
+
+        marks, error = clean_marks(exam_name, (row["marks"] or "").strip())
+        if error:
+            return None, None, error
+
+        return (student_id, exam_name, subject), marks, ""
+
+    def parse_attendance(self, row, index):
+        student_id, error = self.resolve_student(row, index)
+        if error:
+            return None, None, error
+
+        date = parse_date((row["date"] or "").strip())
+        if date is None:
+            return None, None, "Bad date"
+
+        status = STATUS_ALIASES.get((row["status"] or "").strip().lower())
+        if status is None:
+            return None, None, "Status must be Present or Absent"
+
+        return (student_id, date), status, ""
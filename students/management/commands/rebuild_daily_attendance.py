@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.rollups import rebuild_daily_attendance
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Expected a date like 2026-01-31, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute DailyAttendanceRollup (per class-section, per day) from the "
+        "daily Attendance rows. Students are counted under their current "
+        "class-section, so after promotions rebuild only the current term."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First date, e.g. 2025-06-01")
+        parser.add_argument("--to", dest="end", help="Last date, e.g. 2026-03-31")
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Also delete rollups in the range that have no daily attendance"
+        )
+
+    def handle(self, *args, **options):
+        start = parse_day(options["start"]) if options["start"] else None
+        end = parse_day(options["end"]) if options["end"] else None
+
+        written = rebuild_daily_attendance(start=start, end=end, prune=options["prune"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily attendance rollups"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from students.models import StudentProfile
+from students.results import rebuild_exam_results
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored ExamResult rows from StudentMarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--class", dest="student_class", help="Only this class")
+        parser.add_argument("--section", help="Only this section")
+
+    def handle(self, *args, **options):
+        students = None
+        if options["student_class"] or options["section"]:
+            students = StudentProfile.objects.all()
+            if options["student_class"]:
+                students = students.filter(student_class=options["student_class"])
+            if options["section"]:
+                students = students.filter(section=options["section"])
+
+        count = rebuild_exam_results(students=students)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {count} exam results"
+        ))
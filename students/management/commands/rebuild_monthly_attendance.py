@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.models import StudentProfile
+from students.rollups import rebuild_monthly_attendance
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Expected a month like 2026-01, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = "Recompute MonthlyAttendance from the daily Attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First month, e.g. 2025-06")
+        parser.add_argument("--to", dest="end", help="Last month, e.g. 2026-03")
+        parser.add_argument("--class", dest="student_class", help="Only this class")
+        parser.add_argument("--section", help="Only this section")
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Also delete monthly rows in the range that have no daily attendance"
+        )
+
+    def handle(self, *args, **options):
+        start = parse_month(options["start"]) if options["start"] else None
+        end = parse_month(options["end"]) if options["end"] else None
+
+        students = None
+        if options["student_class"] or options["section"]:
+            students = StudentProfile.objects.all()
+            if options["student_class"]:
+                students = students.filter(student_class=options["student_class"])
+            if options["section"]:
+                students = students.filter(section=options["section"])
+
+        written = rebuild_monthly_attendance(
+            start=start,
+            end=end,
+            students=students,
+            prune=options["prune"]
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} monthly attendance rows"
+        ))
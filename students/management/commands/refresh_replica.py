@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.replica import refresh_replica, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary database into the reporting replica with SQLite's "
+        "online backup API. With --every, keep doing it at that interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, help="Refresh every this many seconds until stopped")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("The replica is not enabled (DJANGO_REPLICA=1) or not configured.")
+
+        while True:
+            started = time.monotonic()
+            if refresh_replica():
+                self.stdout.write(f"Replica refreshed in {time.monotonic() - started:.2f}s")
+            else:
+                self.stdout.write("Another process is refreshing the replica; skipped.")
+
+            if not options["every"]:
+                return
+            time.sleep(max(options["every"] - (time.monotonic() - started), 0))
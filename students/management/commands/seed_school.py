@@ -0,0 +1,325 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from students.models import (
+    CLASS_CHOICES,
+    EXAM_MAX_MARKS,
+    SECTION_CHOICES,
+    SUBJECTS,
+    Attendance,
+    ExamFee,
+    ExamPayment,
+    ExamResult,
+    ExamTimetable,
+    Homework,
+    MonthlyAttendance,
+    ParentProfile,
+    PaymentTransaction,
+    StudentMarks,
+    StudentProfile,
+    TeacherProfile,
+)
+from students.class_pages import HOMEWORK, TIMETABLE, invalidate_class_pages
+from students.results import rebuild_exam_results
+from students.roles import invalidate_roles
+from students.rollups import rebuild_daily_attendance, rebuild_monthly_attendance
+
+
+PREFIX = "seed_"
+# Marks seeded homework and timetable rows so --flush leaves real ones alone.
+MARKER = "(seed)"
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic school (students, parents, teachers, attendance, "
+        "marks, homework, timetables, payments) for benchmarking. All seeded "
+        f"users are named {PREFIX}*; their password is set with --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=40, help="Students per class-section")
+        parser.add_argument(
+            "--sections",
+            default=",".join(code for code, _ in SECTION_CHOICES),
+            help="Comma separated sections (default all)"
+        )
+        parser.add_argument("--teachers", type=int, default=20)
+        parser.add_argument("--years", type=int, default=2, help="Years of daily attendance")
+        parser.add_argument("--homework-days", type=int, default=60)
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed")
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help=f"Delete previously seeded {PREFIX}* users and class data first"
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.password = make_password(options["password"])
+        sections = [s.strip() for s in options["sections"].split(",") if s.strip()]
+        classes = [code for code, _ in CLASS_CHOICES]
+
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            if not options["flush"]:
+                raise CommandError("Seed data already exists; use --flush to replace it.")
+            self.flush()
+
+        started = time.monotonic()
+
+        with transaction.atomic():
+            groups = {
+                name: Group.objects.get_or_create(name=name)[0]
+                for name in ("Teacher", "Parent", "Student")
+            }
+            students = self.create_students(classes, sections, options["students"], groups)
+            self.create_parents(students, groups)
+            self.create_teachers(options["teachers"], groups)
+            self.step("homework and timetables", self.create_class_data, classes, sections, options["homework_days"])
+            self.step("fees and payments", self.create_payments, students, classes)
+            self.step("marks", self.create_marks, students)
+
+        # bulk_create sends no signals.
+        class_sections = [(c, s) for c in classes for s in sections]
+        invalidate_class_pages(HOMEWORK, class_sections)
+        invalidate_class_pages(TIMETABLE, class_sections)
+
+        school_days = self.school_days(options["years"])
+        self.step("attendance", self.create_attendance, students, school_days)
+        self.step("monthly rollups", rebuild_monthly_attendance)
+        self.step("daily rollups", rebuild_daily_attendance)
+        self.step("exam results", rebuild_exam_results)
+        invalidate_roles()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(students)} students over {len(classes) * len(sections)} "
+            f"class-sections and {len(school_days)} school days "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def step(self, label, func, *args):
+        started = time.monotonic()
+        func(*args)
+        self.stdout.write(f"  {label}: {time.monotonic() - started:.1f}s")
+
+    # ---------------- PEOPLE ----------------
+
+    def create_users(self, prefix, names, group):
+        usernames = [f"{prefix}{name}" for name in names]
+        User.objects.bulk_create(
+            [User(username=username, password=self.password) for username in usernames],
+            batch_size=BATCH_SIZE
+        )
+        # SQLite does not return primary keys from bulk inserts.
+        ids = dict(
+            User.objects.filter(username__startswith=prefix)
+            .values_list("username", "id")
+        )
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=ids[username], group_id=group.id) for username in usernames],
+            batch_size=BATCH_SIZE
+        )
+        return [ids[username] for username in usernames]
+
+    def create_students(self, classes, sections, per_section, groups):
+        keys = [
+            (student_class, section, roll)
+            for student_class in classes
+            for section in sections
+            for roll in range(1, per_section + 1)
+        ]
+        user_ids = self.create_users(
+            f"{PREFIX}s_",
+            [f"{c}{s}_{r}" for c, s, r in keys],
+            groups["Student"]
+        )
+
+        StudentProfile.objects.bulk_create(
+            [
+                StudentProfile(
+                    user_id=user_id,
+                    roll_number=str(roll),
+                    student_class=student_class,
+                    section=section,
+                )
+                for user_id, (student_class, section, roll) in zip(user_ids, keys)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        return list(
+            StudentProfile.objects.filter(user__username__startswith=f"{PREFIX}s_")
+            .values_list("id", "student_class")
+        )
+
+    def create_parents(self, students, groups):
+        user_ids = self.create_users(
+            f"{PREFIX}p_",
+            [str(student_id) for student_id, _ in students],
+            groups["Parent"]
+        )
+        ParentProfile.objects.bulk_create(
+            [
+                ParentProfile(user_id=user_id, student_id=student_id)
+                for user_id, (student_id, _) in zip(user_ids, students)
+            ],
+            batch_size=BATCH_SIZE
+        )
+
+    def create_teachers(self, count, groups):
+        user_ids = self.create_users(
+            f"{PREFIX}t_",
+            [str(n) for n in range(1, count + 1)],
+            groups["Teacher"]
+        )
+        TeacherProfile.objects.bulk_create(
+            [TeacherProfile(user_id=user_id) for user_id in user_ids]
+        )
+
+    # ---------------- CLASS DATA ----------------
+
+    def create_class_data(self, classes, sections, homework_days):
+        today = timezone.localdate()
+        homework = []
+        timetable = []
+
+        for student_class in classes:
+            for section in sections:
+                for day in range(homework_days):
+                    homework.append(Homework(
+                        date=today - timedelta(days=day),
+                        student_class=student_class,
+                        section=section,
+                        subject=SUBJECTS[day % len(SUBJECTS)],
+                        details=f"Complete the exercise from today's lesson. {MARKER}",
+                    ))
+                for exam_index, exam_name in enumerate(EXAM_MAX_MARKS):
+                    for subject_index, subject in enumerate(SUBJECTS):
+                        exam_date = today + timedelta(days=30 * exam_index + subject_index)
+                        timetable.append(ExamTimetable(
+                            exam_name=exam_name,
+                            student_class=student_class,
+                            section=section,
+                            subject=subject,
+                            exam_date=exam_date,
+                            day=exam_date.strftime("%A"),
+                            time=f"10:00 AM - 12:00 PM {MARKER}",
+                        ))
+
+        Homework.objects.bulk_create(homework, batch_size=BATCH_SIZE)
+        ExamTimetable.objects.bulk_create(timetable, batch_size=BATCH_SIZE)
+
+    def create_payments(self, students, classes):
+        fees = {}
+        for index, student_class in enumerate(classes):
+            fee, _ = ExamFee.objects.get_or_create(
+                class_name=student_class,
+                defaults={"amount": 1000 + 100 * index}
+            )
+            fees[student_class] = fee.amount
+
+        now = timezone.now()
+        payments = []
+        for student_id, student_class in students:
+            if self.random.random() < 0.5:
+                continue
+            amount = self.random.choice([fees[student_class] // 2, fees[student_class]])
+            payments.append(ExamPayment(
+                student_id=student_id,
+                amount=amount,
+                status="Paid" if amount >= fees[student_class] else "Partial",
+                payment_id=f"SEED-{student_id}",
+                paid_on=now - timedelta(days=self.random.randint(0, 90)),
+            ))
+        ExamPayment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        PaymentTransaction.objects.bulk_create(
+            [
+                PaymentTransaction(
+                    student_id=payment.student_id,
+                    amount=payment.amount,
+                    balance_after=payment.amount,
+                    payment_id=payment.payment_id,
+                    created_at=payment.paid_on,
+                )
+                for payment in payments
+            ],
+            batch_size=BATCH_SIZE
+        )
+
+    def create_marks(self, students):
+        marks = []
+        for student_id, _ in students:
+            for exam_name, max_marks in EXAM_MAX_MARKS.items():
+                for subject in SUBJECTS:
+                    marks.append(StudentMarks(
+                        student_id=student_id,
+                        exam_name=exam_name,
+                        subject=subject,
+                        marks=self.random.randint(max_marks * 3 // 10, max_marks),
+                    ))
+                if len(marks) >= BATCH_SIZE:
+                    StudentMarks.objects.bulk_create(marks)
+                    marks = []
+        StudentMarks.objects.bulk_create(marks)
+
+    # ---------------- ATTENDANCE ----------------
+
+    def school_days(self, years):
+        today = timezone.localdate()
+        start = date(today.year - years, today.month, 1)
+        days = []
+        day = start
+        while day <= today:
+            if day.weekday() != 6:
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def create_attendance(self, students, school_days):
+        absent_chance = 0.08
+        with transaction.atomic():
+            for day in school_days:
+                # Some days have more absences than others.
+                threshold = absent_chance * self.random.random()
+                Attendance.objects.bulk_create(
+                    [
+                        Attendance(
+                            student_id=student_id,
+                            date=day,
+                            status="Absent" if self.random.random() < threshold else "Present",
+                        )
+                        for student_id, _ in students
+                    ],
+                    batch_size=BATCH_SIZE
+                )
+
+    # ---------------- CLEANUP ----------------
+
+    def flush(self):
+        started = time.monotonic()
+        seeded = StudentProfile.objects.filter(user__username__startswith=PREFIX)
+        with transaction.atomic():
+            # Delete the per-student history directly: going through the
+            # cascade would fire the rollup signals once per daily row.
+            for model in (
+                Attendance,
+                MonthlyAttendance,
+                StudentMarks,
+                ExamResult,
+                ExamPayment,
+                PaymentTransaction,
+            ):
+                rows = model.objects.filter(student__in=seeded)
+                rows._raw_delete(rows.db)
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Homework.objects.filter(details__endswith=MARKER).delete()
+            ExamTimetable.objects.filter(time__endswith=MARKER).delete()
+        self.stdout.write(f"  flushed previous seed: {time.monotonic() - started:.1f}s")
@@ -0,0 +1,424 @@
+"""
+Request and SQL metrics in Prometheus text format.
+
+Each worker process keeps its counters in memory and writes them to
+``settings.METRICS_DIR/metrics-<pid>-<start>.json`` at most every
+``settings.METRICS_FLUSH_INTERVAL`` seconds. The /metrics view adds up every
+worker's file (using live numbers for its own process), so a scrape sees the
+whole gunicorn server no matter which worker answers it.
+
+The start time in the name keeps a new worker that reuses an old pid from
+overwriting (and so shrinking) the old worker's counts. A scrape folds the
+files of workers that have exited into ``archive.json``: their counts stay
+part of the totals without the directory growing with every restart.
+"""
+import atexit
+import contextvars
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .hybrid import HybridMiddleware
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1_000, 5_000, 20_000, 50_000, 100_000, 500_000, 1_000_000)
+
+HELP = {
+    "students_http_requests_total": ("counter", "Requests by view, method and status."),
+    "students_http_request_duration_seconds": ("histogram", "Request latency by view."),
+    "students_http_response_size_bytes": ("histogram", "Response body size by view."),
+    "students_db_queries_per_request": ("histogram", "SQL queries per request by view."),
+    "students_db_queries_total": ("counter", "SQL queries by view."),
+    "students_db_query_duration_seconds_total": ("counter", "Time spent in SQL by view."),
+}
+
+
+class Registry:
+    """Counters and histograms for one process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start empty under a new file name (also in a forked worker)."""
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.filename = f"metrics-{os.getpid()}-{time.time_ns()}.json"
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    "buckets": list(buckets),
+                    "counts": [0] * len(buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            index = bisect_left(hist["buckets"], value)
+            if index < len(hist["counts"]):
+                hist["counts"][index] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), dict(hist, counts=list(hist["counts"]))]
+                    for (name, labels), hist in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, self.filename)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+registry = Registry()
+atexit.register(lambda: registry.counters and registry.flush(force=True))
+# gunicorn forks its workers after importing the app: each one counts from
+# zero into its own file.
+os.register_at_fork(after_in_child=registry.reset)
+
+
+# ===============================
+# COLLECTION
+# ===============================
+
+class QueryTimer:
+    """Counts the queries and SQL time of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+# The QueryTimer of the request being served. A context variable rather than
+# a per-request execute_wrapper, so queries an async view runs in a pool
+# thread (see async_views.py) are counted too.
+current_timer = contextvars.ContextVar("current_timer", default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def watch_connections():
+    """Route this thread's queries through time_query (once per connection)."""
+    for connection in connections.all():
+        if time_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(time_query)
+
+
+def view_label(request, response):
+    match = getattr(request, "resolver_match", None)
+    if match is not None:
+        return match.view_name
+    return "not_found" if response.status_code == 404 else "unmatched"
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Record per-view request, latency, size and SQL metrics. Put it first."""
+
+    def call(self, request):
+        watch_connections()
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+
+        self.record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    async def acall(self, request):
+        # The thread that runs the sync views is watched in process_view.
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+
+        self.record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI Django calls this in the thread that then runs a sync
+        # view (thread_sensitive), so that thread's connections are timed.
+        watch_connections()
+
+    def record(self, request, response, timer, elapsed):
+        view = view_label(request, response)
+
+        registry.inc(
+            "students_http_requests_total",
+            (view, request.method, str(response.status_code))
+        )
+        registry.observe("students_http_request_duration_seconds", (view,), elapsed, LATENCY_BUCKETS)
+        registry.observe("students_db_queries_per_request", (view,), timer.count, QUERY_COUNT_BUCKETS)
+        registry.inc("students_db_queries_total", (view,), timer.count)
+        registry.inc("students_db_query_duration_seconds_total", (view,), timer.seconds)
+
+        if not response.streaming:
+            registry.observe(
+                "students_http_response_size_bytes", (view,), len(response.content), SIZE_BUCKETS
+            )
+
+        registry.flush()
+
+
+# ===============================
+# EXPOSITION
+# ===============================
+
+LABEL_NAMES = {
+    "students_http_requests_total": ("view", "method", "status"),
+}
+
+
+ARCHIVE_NAME = "archive.json"
+WORKER_FILE = re.compile(r"metrics-(\d+)(?:-(\d+))?\.json")
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def add_snapshot(counters, histograms, snapshot):
+    for name, labels, value in snapshot["counters"]:
+        key = (name, tuple(labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, hist in snapshot["histograms"]:
+        key = (name, tuple(labels))
+        merged = histograms.setdefault(key, {
+            "buckets": hist["buckets"],
+            "counts": [0] * len(hist["counts"]),
+            "sum": 0.0,
+            "count": 0,
+        })
+        merged["counts"] = [a + b for a, b in zip(merged["counts"], hist["counts"])]
+        merged["sum"] += hist["sum"]
+        merged["count"] += hist["count"]
+
+
+def worker_files():
+    """``{filename: (pid, start)}`` of the flushed worker files."""
+    files = {}
+    for filename in os.listdir(settings.METRICS_DIR):
+        match = WORKER_FILE.fullmatch(filename)
+        if match:
+            files[filename] = (int(match.group(1)), int(match.group(2) or 0))
+    return files
+
+
+def exited_workers(files):
+    """
+    Files whose worker has exited: its pid is gone, or a later file (this
+    process included) has the same pid.
+    """
+    latest = {}
+    for pid, start in files.values():
+        latest[pid] = max(latest.get(pid, 0), start)
+    return [
+        filename for filename, (pid, start) in files.items()
+        if filename != registry.filename
+        and (pid == os.getpid() or start < latest[pid] or not pid_alive(pid))
+    ]
+
+
+def fold_exited_workers(files):
+    """
+    Add the files of exited workers to the archive, then delete them. The
+    archive lists the files it already holds, so a file left behind by a
+    crash between the two steps is deleted again rather than added twice.
+    Returns the archive and the files still to read.
+    """
+    path = os.path.join(settings.METRICS_DIR, ARCHIVE_NAME)
+    archive = read_snapshot(path) or {"counters": [], "histograms": [], "folded": []}
+    folded = set(archive["folded"])
+    exited = exited_workers(files)
+
+    if exited:
+        counters, histograms = {}, {}
+        add_snapshot(counters, histograms, archive)
+        for filename in exited:
+            if filename in folded:
+                continue
+            snapshot = read_snapshot(os.path.join(settings.METRICS_DIR, filename))
+            if snapshot is not None:
+                add_snapshot(counters, histograms, snapshot)
+            folded.add(filename)
+
+        archive = {
+            "counters": [
+                [name, list(labels), value]
+                for (name, labels), value in counters.items()
+            ],
+            "histograms": [
+                [name, list(labels), hist]
+                for (name, labels), hist in histograms.items()
+            ],
+            # Names already deleted can go: pids and start times never repeat.
+            "folded": sorted(folded & set(files)),
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(archive, f)
+        os.replace(tmp, path)
+
+        for filename in exited:
+            try:
+                os.remove(os.path.join(settings.METRICS_DIR, filename))
+            except FileNotFoundError:
+                pass
+
+    live = [
+        filename for filename in files
+        if filename not in folded and filename != registry.filename
+    ]
+    return archive, live
+
+
+def merged_snapshot():
+    """Add up the archive, the files of live workers and this process's live data."""
+    counters = {}
+    histograms = {}
+    add_snapshot(counters, histograms, registry.snapshot())
+
+    if not os.path.isdir(settings.METRICS_DIR):
+        return counters, histograms
+
+    # One scrape at a time: another must not read a file and the archive
+    # it is being folded into.
+    with open(os.path.join(settings.METRICS_DIR, "archive.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive, live = fold_exited_workers(worker_files())
+        add_snapshot(counters, histograms, archive)
+        for filename in live:
+            snapshot = read_snapshot(os.path.join(settings.METRICS_DIR, filename))
+            if snapshot is not None:
+                add_snapshot(counters, histograms, snapshot)
+
+    return counters, histograms
+
+
+def format_labels(name, labels, extra=None):
+    names = LABEL_NAMES.get(name, ("view",))
+    pairs = list(zip(names, labels)) + (extra or [])
+    body = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def render_prometheus():
+    counters, histograms = merged_snapshot()
+    lines = []
+
+    for metric, (kind, help_text) in HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+
+        if kind == "counter":
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f"{metric}{format_labels(name, labels)} {value}")
+            continue
+
+        for (name, labels), hist in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(hist["buckets"], hist["counts"]):
+                cumulative += count
+                lines.append(
+                    f"{metric}_bucket{format_labels(name, labels, [('le', bound)])} {cumulative}"
+                )
+            lines.append(
+                f"{metric}_bucket{format_labels(name, labels, [('le', '+Inf')])} {hist['count']}"
+            )
+            lines.append(f"{metric}_sum{format_labels(name, labels)} {hist['sum']}")
+            lines.append(f"{metric}_count{format_labels(name, labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Open to staff users, or to a scraper sending
+    ``Authorization: Bearer <METRICS_TOKEN>`` when that setting is set.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    token_ok = token and constant_time_compare(header, f"Bearer {token}")
+
+    if not token_ok and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden("Forbidden")
+
+    return HttpResponse(
+        render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,50 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .hybrid import HybridMiddleware
+from .roles import get_roles
+
+
+class RoleMiddleware(HybridMiddleware):
+    """
+    Expose the user's roles as ``request.roles``.
+
+    Must come after AuthenticationMiddleware. The lookup is lazy, so public
+    pages never touch the session for it.
+    """
+
+    def call(self, request):
+        request.roles = SimpleLazyObject(lambda: get_roles(request))
+        return self.get_response(request)
+
+    async def acall(self, request):
+        request.roles = SimpleLazyObject(lambda: get_roles(request))
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware(HybridMiddleware, WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run in an async middleware chain.
+
+    WhiteNoiseMiddleware is sync-only. Under ASGI, Django would run it (and
+    so every request's trip through the rest of the chain) in its single
+    shared sync thread, one request at a time. Here only serving an actual
+    static file leaves the event loop.
+    """
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        WhiteNoiseMiddleware.__init__(self, get_response, *args, **kwargs)
+        HybridMiddleware.__init__(self, get_response)
+
+    def call(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def acall(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+from students.results import compute_result
+
+
+def backfill_results(apps, schema_editor):
+    """
+    Results are read from ExamResult only, so compute one for every
+    (student, exam) that already has marks.
+    """
+    StudentMarks = apps.get_model('students', 'StudentMarks')
+    ExamResult = apps.get_model('students', 'ExamResult')
+
+    marks = defaultdict(lambda: defaultdict(list))
+    rows = StudentMarks.objects.order_by('id').values_list('student_id', 'exam_name', 'subject', 'marks')
+    for student_id, exam_name, subject, value in rows.iterator():
+        marks[student_id][exam_name].append((subject, value))
+
+    results = []
+    for student_id, exams in marks.items():
+        for exam_name in exams:
+            values = compute_result(exam_name, exams)
+            if values is not None:
+                results.append(ExamResult(student_id=student_id, exam_name=exam_name, **values))
+
+    ExamResult.objects.bulk_create(results, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_auto_20260129_1226'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_name', models.CharField(max_length=50)),
+                ('subjects', models.JSONField(default=list)),
+                ('total', models.IntegerField(default=0)),
+                ('max_marks', models.IntegerField(default=0)),
+                ('percentage', models.FloatField(default=0)),
+                ('grade', models.CharField(max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_results', to='students.studentprofile')),
+            ],
+            options={
+                'unique_together': {('student', 'exam_name')},
+            },
+        ),
+        migrations.RunPython(backfill_results, migrations.RunPython.noop),
+    ]
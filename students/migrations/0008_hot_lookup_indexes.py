@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_examresult'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'student'], name='attendance_date_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exampayment',
+            index=models.Index(fields=['student', '-paid_on'], name='payment_student_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examtimetable',
+            index=models.Index(fields=['student_class', 'section', 'exam_date'], name='timetable_class_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['student_class', 'section', '-date'], name='homework_class_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['student_class', 'section', 'roll_number'], name='student_class_section_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_transactions(apps, schema_editor):
+    """
+    ExamPayment only kept a running total; record it as one transaction per
+    student so history and receipts keep showing what was paid.
+    """
+    ExamPayment = apps.get_model('students', 'ExamPayment')
+    PaymentTransaction = apps.get_model('students', 'PaymentTransaction')
+
+    PaymentTransaction.objects.bulk_create(
+        [
+            PaymentTransaction(
+                student_id=payment.student_id,
+                amount=payment.amount,
+                balance_after=payment.amount,
+                payment_id=payment.payment_id,
+                created_at=payment.paid_on or django.utils.timezone.now(),
+            )
+            for payment in ExamPayment.objects.filter(amount__gt=0).order_by('paid_on', 'id').iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('balance_after', models.IntegerField()),
+                ('payment_id', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_transactions', to='students.studentprofile')),
+            ],
+        ),
+        migrations.RunPython(backfill_transactions, migrations.RunPython.noop),
+    ]
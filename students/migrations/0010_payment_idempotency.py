@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+def dedupe_payment_ids(apps, schema_editor):
+    """
+    Ids used to be DUMMY-<timestamp to the second>, so backfilled rows can
+    share one (or have none). Suffix the row id to make them unique.
+    """
+    PaymentTransaction = apps.get_model('students', 'PaymentTransaction')
+
+    seen = set()
+    for txn in PaymentTransaction.objects.order_by('id').only('id', 'payment_id').iterator():
+        if txn.payment_id and txn.payment_id not in seen:
+            seen.add(txn.payment_id)
+            continue
+        txn.payment_id = f"{txn.payment_id or 'LEGACY'}-{txn.id}"
+        seen.add(txn.payment_id)
+        txn.save(update_fields=['payment_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_payment_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(dedupe_payment_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='payment_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='paymenttransaction',
+            constraint=models.UniqueConstraint(fields=('student', 'idempotency_key'), name='payment_idempotency_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+from students.rollups import daily_counts
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Count the attendance already recorded, with the grouped query
+    rebuild_daily_attendance uses, so the trends page starts complete.
+    """
+    Attendance = apps.get_model('students', 'Attendance')
+    DailyAttendanceRollup = apps.get_model('students', 'DailyAttendanceRollup')
+
+    DailyAttendanceRollup.objects.bulk_create(
+        [
+            DailyAttendanceRollup(
+                date=day,
+                student_class=student_class,
+                section=section,
+                present=present,
+                absent=absent,
+                total=present + absent,
+            )
+            for (day, student_class, section), (present, absent)
+            in daily_counts(Attendance.objects.all()).items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0011_aboutimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('student_class', models.CharField(choices=[('LKG', 'LKG'), ('UKG', 'UKG'), ('1', 'Class 1'), ('2', 'Class 2'), ('3', 'Class 3'), ('4', 'Class 4'), ('5', 'Class 5'), ('6', 'Class 6'), ('7', 'Class 7'), ('8', 'Class 8'), ('9', 'Class 9'), ('10', 'Class 10')], max_length=10)),
+                ('section', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=5)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('date', 'student_class', 'section')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+from students.rollups import monthly_counts
+
+
+def backfill_monthly(apps, schema_editor):
+    """
+    The attendance page totals MonthlyAttendance, which was only kept by
+    hand before attendance writes maintained it. Recount every month that
+    has daily rows, with the grouped query rebuild_monthly_attendance uses;
+    hand-entered months without daily rows are kept.
+    """
+    Attendance = apps.get_model('students', 'Attendance')
+    MonthlyAttendance = apps.get_model('students', 'MonthlyAttendance')
+
+    counts = monthly_counts(Attendance.objects.all())
+    existing = {
+        (row.student_id, row.month): row
+        for row in MonthlyAttendance.objects.all()
+    }
+
+    to_create = []
+    to_update = []
+    for (student_id, month), (total, present) in counts.items():
+        row = existing.get((student_id, month))
+        if row is None:
+            to_create.append(MonthlyAttendance(
+                student_id=student_id,
+                month=month,
+                total_days=total,
+                present_days=present,
+            ))
+        elif (row.total_days, row.present_days) != (total, present):
+            row.total_days = total
+            row.present_days = present
+            to_update.append(row)
+
+    MonthlyAttendance.objects.bulk_create(to_create, batch_size=1000)
+    MonthlyAttendance.objects.bulk_update(to_update, ['total_days', 'present_days'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0012_dailyattendancerollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_monthly, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .class_pages import HOMEWORK, TIMETABLE, ClassPageQuerySet
+
 CLASS_CHOICES = [
     ("LKG", "LKG"),
     ("UKG", "UKG"),
@@ -23,13 +26,57 @@ SECTION_CHOICES = [
     ("C", "C"),
 ]
 
-class StudentProfile(models.Model):
+EXAM_MAX_MARKS = {
+    "FA-1": 20,
+    "FA-2": 20,
+    "FA-3": 20,
+    "FA-4": 20,
+    "SA-1": 100,
+    "SA-2": 100,
+}
+
+SUBJECTS = [
+    "Telugu",
+    "Hindi",
+    "English",
+    "Maths",
+    "Science",
+    "Social",
+]
+
+class ClassSectionRowMixin:
+    """
+    Remembers the class-section a row was loaded from, so moving it to
+    another one can refresh what is kept for both: the cached class pages
+    (see class_pages.py) or, for a student, the daily attendance rollups.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._class_key = (
+            instance.__dict__.get("student_class"),
+            instance.__dict__.get("section"),
+        )
+        return instance
+
+
+class StudentProfile(ClassSectionRowMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     roll_number = models.CharField(max_length=20)
     student_class = models.CharField(max_length=10,choices=CLASS_CHOICES)
     section = models.CharField(max_length=5,choices=SECTION_CHOICES)
     phone = models.CharField(max_length=15, blank=True)
 
+    class Meta:
+        indexes = [
+            # Every teacher page loads a class-section ordered by roll number.
+            models.Index(
+                fields=["student_class", "section", "roll_number"],
+                name="student_class_section_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.user.username
     
@@ -64,9 +111,45 @@ class StudentMarks(models.Model):
     class Meta:
         unique_together = ('student', 'exam_name', 'subject')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which result the row was loaded under so an edit that
+        # moves it to another student or exam can refresh both results.
+        instance._result_key = (
+            instance.__dict__.get("student_id"),
+            instance.__dict__.get("exam_name"),
+        )
+        return instance
+
     def __str__(self):
         return f"{self.student.user.username} - {self.exam_name} - {self.subject}"
     
+class ExamResult(models.Model):
+    """
+    Materialized result of one student in one exam, kept in step with
+    StudentMarks by students.results. ``subjects`` holds one entry per
+    subject: {"subject", "marks", "fa_total", "total"}.
+    """
+    student = models.ForeignKey(
+        StudentProfile,
+        on_delete=models.CASCADE,
+        related_name="exam_results"
+    )
+    exam_name = models.CharField(max_length=50)
+    subjects = models.JSONField(default=list)
+    total = models.IntegerField(default=0)
+    max_marks = models.IntegerField(default=0)
+    percentage = models.FloatField(default=0)
+    grade = models.CharField(max_length=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'exam_name')
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.exam_name} - {self.percentage}%"
+
 class Attendance(models.Model):
     student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE)
     date = models.DateField()
@@ -76,10 +159,27 @@ class Attendance(models.Model):
     )
     class Meta:
         unique_together = ('student', 'date')
+        indexes = [
+            # Registers look up one date for many students.
+            models.Index(fields=["date", "student"], name="attendance_date_student_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the row was loaded from so an edit that moves it to
+        # another student or month can refresh the rollups of both.
+        instance._rollup_key = (
+            instance.__dict__.get("student_id"),
+            instance.__dict__.get("date"),
+        )
+        return instance
 
     def __str__(self):
         return f"{self.student.user.username} - {self.date} - {self.status}"
-class ExamTimetable(models.Model):
+
+
+class ExamTimetable(ClassSectionRowMixin, models.Model):
     exam_name = models.CharField(max_length=50)
     student_class = models.CharField(max_length=10,choices=CLASS_CHOICES)
     section = models.CharField(max_length=5,choices=SECTION_CHOICES)
@@ -89,11 +189,22 @@ class ExamTimetable(models.Model):
     day = models.CharField(max_length=15)
     time = models.CharField(max_length=30)
 
+    class_page_kind = TIMETABLE
+    objects = ClassPageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["student_class", "section", "exam_date"],
+                name="timetable_class_date_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.exam_name} - Class {self.student_class}{self.section} - {self.subject}"
  
 
-class Homework(models.Model):
+class Homework(ClassSectionRowMixin, models.Model):
 
     date = models.DateField()
     student_class = models.CharField(max_length=10, choices=CLASS_CHOICES)
@@ -101,6 +212,17 @@ class Homework(models.Model):
     subject = models.CharField(max_length=100)
     details = models.TextField()
 
+    class_page_kind = HOMEWORK
+    objects = ClassPageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["student_class", "section", "-date"],
+                name="homework_class_date_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Class {self.student_class}-{self.section} | {self.subject}"
 
@@ -111,6 +233,42 @@ class AboutImage(models.Model):
     image = models.ImageField(upload_to='about_images/')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Filled in by students.images after upload: the original's size and
+    # one {"name", "format", "width", "height"} entry per resized copy.
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variants = models.JSONField(default=list, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the save signal tell a new upload from a title edit.
+        instance._image_name = instance.__dict__.get("image")
+        return instance
+
+    def _srcset(self, fmt):
+        return ", ".join(
+            f"{default_storage.url(v['name'])} {v['width']}w"
+            for v in self.variants
+            if v["format"] == fmt
+        )
+
+    @property
+    def webp_srcset(self):
+        return self._srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        return self._srcset("jpeg")
+
+    @property
+    def fallback_url(self):
+        """Largest JPEG copy, for browsers without srcset; the original until copies exist."""
+        jpegs = [v for v in self.variants if v["format"] == "jpeg"]
+        if not jpegs:
+            return self.image.url
+        return default_storage.url(max(jpegs, key=lambda v: v["width"])["name"])
+
     def __str__(self):
         return self.title or "About Image"
 
@@ -149,9 +307,49 @@ class ExamPayment(models.Model):
     payment_id = models.CharField(max_length=100, blank=True)
     paid_on = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["student", "-paid_on"], name="payment_student_paid_idx"),
+        ]
+
     def __str__(self):
         return f"{self.student.user.username} - {self.status}"   
 
+class PaymentTransaction(models.Model):
+    """
+    One exam fee payment. Rows are append-only: ExamPayment holds the
+    student's running total, and ``balance_after`` records that total as it
+    stood right after this payment.
+    """
+    student = models.ForeignKey(
+        StudentProfile,
+        on_delete=models.CASCADE,
+        related_name="payment_transactions"
+    )
+    amount = models.IntegerField()
+    balance_after = models.IntegerField()
+    payment_id = models.CharField(max_length=100, unique=True)
+    # Sent with the pay form; a resubmitted form finds its first result.
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "idempotency_key"],
+                name="payment_idempotency_key_uniq",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Payment transactions cannot be changed once recorded.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.student.user.username} - ₹{self.amount} - {self.payment_id}"
+
+
 class ExamFee(models.Model):
     class_name = models.CharField(max_length=10, unique=True,choices=CLASS_CHOICES)
     amount = models.IntegerField(default=0)
@@ -184,3 +382,20 @@ class MonthlyAttendance(models.Model):
     def __str__(self):
         return f"{self.student.user.username} - {self.month.strftime('%B %Y')}"
 
+
+
+class DailyAttendanceRollup(models.Model):
+    """Present/absent counts of one class-section on one day."""
+    date = models.DateField()
+    student_class = models.CharField(max_length=10, choices=CLASS_CHOICES)
+    section = models.CharField(max_length=5, choices=SECTION_CHOICES)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also the index for date-range reads of the trends dashboard.
+        unique_together = ("date", "student_class", "section")
+
+    def __str__(self):
+        return f"{self.date} - {self.student_class}{self.section} - {self.present}/{self.total}"
@@ -0,0 +1,75 @@
+"""
+Stored payment receipts.
+
+A PaymentTransaction never changes, so its receipt is rendered once per
+layout and kept as a file under ``settings.RECEIPT_DIR/<student>/``. Views
+serve that file with a strong ETag derived (HMAC) from the student, the
+transaction and the layout: a parent's browser revalidating a receipt gets
+a 304 without the template engine or the ledger being touched, and nobody
+can produce a matching tag for a receipt that is not theirs.
+"""
+import os
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+
+from .context_processors import SCHOOL_CONTEXT
+
+
+# Bump when the receipt templates change so stored files and browser
+# caches are not reused.
+RECEIPT_VERSION = 1
+
+RECEIPT_LAYOUTS = {
+    "screen": "parents/payment_receipt.html",
+    "print": "parents/payment_receipt_print.html",
+}
+
+RECEIPT_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def receipt_etag(student_id, pk, layout):
+    return salted_hmac(
+        "students.receipts",
+        f"{RECEIPT_VERSION}:{student_id}:{pk}:{layout}",
+        algorithm="sha256"
+    ).hexdigest()[:32]
+
+
+def _path(student_id, pk, layout):
+    return os.path.join(
+        settings.RECEIPT_DIR,
+        str(student_id),
+        f"{pk}-{layout}-v{RECEIPT_VERSION}.html"
+    )
+
+
+def receipt_stored(student_id, pk, layout):
+    """Whether the receipt was rendered and stored (under that student)."""
+    return os.path.exists(_path(student_id, pk, layout))
+
+
+def load_receipt(student_id, pk, layout):
+    """Stored receipt bytes, or None if it has not been rendered yet."""
+    try:
+        with open(_path(student_id, pk, layout), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def build_receipt(payment, layout):
+    """Render a receipt, store it and return its bytes."""
+    content = render_to_string(RECEIPT_LAYOUTS[layout], {
+        **SCHOOL_CONTEXT,
+        "payment": payment,
+    }).encode("utf-8")
+
+    path = _path(payment.student_id, payment.pk, layout)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return content
@@ -0,0 +1,52 @@
+"""
+In-process cache of small reference tables (exam fees per class).
+
+Each worker loads the tables once and serves them from memory. Admin edits
+bump the "refdata" version stamp, which every worker checks with one
+``stat()`` per lookup and reloads when it has moved.
+"""
+import threading
+
+from . import stamps
+from .models import ExamFee
+
+
+STAMP_NAME = "refdata"
+
+
+class RefData:
+    def __init__(self, stamp, fees):
+        self.stamp = stamp
+        self.fees = fees
+
+
+_lock = threading.Lock()
+_refdata = None
+
+
+def get_refdata():
+    global _refdata
+
+    stamp = stamps.current(STAMP_NAME)
+    refdata = _refdata
+    if refdata is not None and refdata.stamp == stamp:
+        return refdata
+
+    with _lock:
+        if _refdata is None or _refdata.stamp != stamp:
+            # Read the stamp before the tables: an edit that lands while
+            # loading moves the stamp again and forces another reload.
+            _refdata = RefData(
+                stamp,
+                fees=dict(ExamFee.objects.values_list("class_name", "amount")),
+            )
+        return _refdata
+
+
+def exam_fee(student_class):
+    """Exam fee for a class, 0 when none is set."""
+    return get_refdata().fees.get(student_class, 0)
+
+
+def invalidate_refdata():
+    stamps.bump(STAMP_NAME)
@@ -0,0 +1,82 @@
+"""
+Monthly attendance register: students down the side, days of the month
+across the top.
+
+The month's Attendance rows for the class are read in one query as plain
+tuples and written into a bytearray with one byte per (student, day)
+cell, so no model instances or per-cell dicts are built. Totals are
+counted on slices of it.
+"""
+import calendar
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Attendance
+from .rollups import month_start, next_month
+
+
+# Cell values; a day with no attendance row stays UNMARKED.
+UNMARKED, PRESENT, ABSENT = 0, 1, 2
+STATUS_CODES = {"Present": PRESENT, "Absent": ABSENT}
+
+# Cell value to the letter shown in the register.
+MARKS = bytes.maketrans(bytes([UNMARKED, PRESENT, ABSENT]), b"-PA")
+
+
+def monthly_register(students, month, using=DEFAULT_DB_ALIAS):
+    """
+    The register of ``students`` (a StudentProfile queryset) for the month
+    containing ``month``.
+
+    Each row has the student, ``marks`` (a string with one letter per day:
+    P, A, or - when not marked) and the student's totals; ``days`` has the
+    per-day totals. ``using`` names the database to read from (see
+    replica.reporting_alias).
+    """
+    start = month_start(month)
+    end = next_month(start)
+    days = (end - start).days
+
+    students = list(students.using(using).select_related("user"))
+    position = {student.id: index * days for index, student in enumerate(students)}
+
+    grid = bytearray(len(students) * days)
+    rows = Attendance.objects.using(using).filter(
+        student_id__in=list(position),
+        date__gte=start,
+        date__lt=end
+    ).values_list("student_id", "date", "status")
+    for student_id, day, status in rows:
+        grid[position[student_id] + day.day - 1] = STATUS_CODES.get(status, UNMARKED)
+
+    register = []
+    for student in students:
+        cells = grid[position[student.id]:position[student.id] + days]
+        present = cells.count(PRESENT)
+        absent = cells.count(ABSENT)
+        register.append({
+            "student": student,
+            "marks": cells.translate(MARKS).decode(),
+            "present": present,
+            "absent": absent,
+            "percentage": round(present * 100 / (present + absent), 1) if present + absent else None,
+        })
+
+    day_totals = []
+    for offset in range(days):
+        # Every student's cell for this day.
+        cells = grid[offset::days]
+        day_totals.append({
+            "day": offset + 1,
+            "weekday": calendar.day_abbr[(start.weekday() + offset) % 7][0],
+            "present": cells.count(PRESENT),
+            "absent": cells.count(ABSENT),
+        })
+
+    return {
+        "month": start,
+        "rows": register,
+        "days": day_totals,
+        "present": grid.count(PRESENT),
+        "absent": grid.count(ABSENT),
+    }
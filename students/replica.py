@@ -0,0 +1,197 @@
+"""
+Read replica for report pages.
+
+The ``replica`` database is a snapshot of the primary copied with SQLite's
+online backup API, by ``manage.py refresh_replica`` (run it from cron or
+with --every) and opportunistically in the background when a report finds
+the snapshot older than ``REPLICA_REFRESH_INTERVAL``. The "replica" stamp
+holds the time the snapshot was taken. It is used only with
+``settings.REPLICA_ENABLED``, on by default in the production (WAL) profile.
+
+Nothing reads from the replica unless asked: report views pass
+``reporting_alias(request)`` to ``.using()``. It names the replica only
+while the snapshot is at most ``REPLICA_MAX_STALENESS`` seconds old and
+newer than the user's own last write, so a teacher who just saved marks
+sees them in the class results.
+"""
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import stamps
+from .hybrid import HybridMiddleware
+
+
+logger = logging.getLogger("students")
+
+REPLICA_ALIAS = "replica"
+STAMP_NAME = "replica"
+
+# Session key: time of the user's last write request.
+LAST_WRITE_KEY = "_last_write"
+
+_executor = None
+_refresh_pending = threading.Lock()
+
+
+class ReplicaRouter:
+    """
+    Keep the replica read-only: writes (including saving an instance that
+    was read from it) go to the primary, and it is never migrated; it gets
+    its tables from the snapshot.
+    """
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+# ===============================
+# SNAPSHOTS
+# ===============================
+
+def replica_enabled():
+    """Whether reports may read from the replica at all."""
+    return settings.REPLICA_ENABLED and REPLICA_ALIAS in settings.DATABASES
+
+
+def replica_configured():
+    """
+    Whether there is a replica to refresh: False when it is disabled, when
+    it mirrors the primary (in tests) or when the primary is an in-memory
+    database that cannot be copied from a file.
+    """
+    if not replica_enabled():
+        return False
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.is_in_memory_db():
+        return False
+    return connections[REPLICA_ALIAS].settings_dict["NAME"] != primary.settings_dict["NAME"]
+
+
+def refresh_replica():
+    """
+    Copy the primary into the replica, ``REPLICA_BACKUP_PAGES`` pages per
+    backup step. Returns False without waiting if another process is
+    already refreshing it, or when there is no replica to refresh.
+    """
+    if not replica_configured():
+        return False
+
+    source = str(connections[DEFAULT_DB_ALIAS].settings_dict["NAME"])
+    target = str(connections[REPLICA_ALIAS].settings_dict["NAME"])
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with open(f"{target}.lock", "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        started = time.time_ns()
+        src = sqlite3.connect(source, timeout=30, uri=True)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            # One read transaction across all the steps pins the snapshot,
+            # so a commit between steps does not make the copy start over.
+            # Under WAL writers carry on meanwhile. With a rollback journal
+            # they wait for the whole copy (unpinned, a busy writer could
+            # restart it forever), hence REPLICA_ENABLED follows WAL.
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            src.backup(dst, pages=settings.REPLICA_BACKUP_PAGES)
+        finally:
+            dst.close()
+            src.close()
+        stamps.bump(STAMP_NAME, at=started)
+
+    logger.info(
+        "Replica refreshed | seconds=%.2f",
+        (time.time_ns() - started) / 1e9
+    )
+    return True
+
+
+def snapshot_time():
+    """When the replica's snapshot was taken (epoch seconds, 0 if never)."""
+    return stamps.current(STAMP_NAME) / 1e9
+
+
+def _refresh_in_background():
+    try:
+        refresh_replica()
+    except Exception:
+        logger.error("Replica refresh failed", exc_info=True)
+    finally:
+        _refresh_pending.release()
+
+
+def schedule_refresh():
+    """Refresh in a background thread, unless this process already is."""
+    global _executor
+    if not _refresh_pending.acquire(blocking=False):
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replica")
+    _executor.submit(_refresh_in_background)
+
+
+# ===============================
+# CHOOSING A DATABASE
+# ===============================
+
+def reporting_alias(request):
+    """Database alias for a report query made while serving ``request``."""
+    if not replica_enabled():
+        return DEFAULT_DB_ALIAS
+
+    taken = snapshot_time()
+    age = time.time() - taken
+    if age > settings.REPLICA_REFRESH_INTERVAL:
+        schedule_refresh()
+    if age > settings.REPLICA_MAX_STALENESS:
+        return DEFAULT_DB_ALIAS
+
+    # Read your writes: the snapshot must include the user's last write.
+    if request.session.get(LAST_WRITE_KEY, 0) >= taken:
+        return DEFAULT_DB_ALIAS
+
+    return REPLICA_ALIAS
+
+
+class ReadYourWritesMiddleware(HybridMiddleware):
+    """
+    Remember when a logged in user last sent a write request, for
+    reporting_alias. Put it after AuthenticationMiddleware.
+    """
+
+    def call(self, request):
+        response = self.get_response(request)
+        self.remember_write(request, response)
+        return response
+
+    async def acall(self, request):
+        response = await self.get_response(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            # Session and user lookups are database queries.
+            await sync_to_async(self.remember_write)(request, response)
+        return response
+
+    def remember_write(self, request, response):
+        if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 500:
+            return
+        if request.user.is_authenticated:
+            request.session[LAST_WRITE_KEY] = time.time()
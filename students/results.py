@@ -0,0 +1,279 @@
+import statistics
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Avg, Count, F, IntegerField, Max, Min, Q, StdDev
+from django.db.models.functions import Cast, Rank
+from django.db.models.expressions import Window
+from django.utils import timezone
+
+from .models import EXAM_MAX_MARKS, ExamResult, StudentMarks
+from .utils import batched, retry_on_lock, write_transaction
+
+
+# FA exams whose marks are added to each SA subject total.
+SA_FA_EXAMS = {
+    "SA-1": ["FA-1", "FA-2"],
+    "SA-2": ["FA-3", "FA-4"],
+}
+
+
+# Share of an exam's maximum marks needed to pass a subject.
+PASS_PERCENTAGE = 35
+
+HISTOGRAM_BUCKETS = 10
+
+
+def grade_for(percentage):
+    if percentage >= 90:
+        return "A+"
+    if percentage >= 80:
+        return "A"
+    if percentage >= 70:
+        return "B"
+    if percentage >= 60:
+        return "C"
+    return "Fail"
+
+
+def affected_exams(exam_name):
+    """Exams whose result depends on marks entered for ``exam_name``."""
+    exams = {exam_name}
+    for sa_exam, fa_exams in SA_FA_EXAMS.items():
+        if exam_name in fa_exams:
+            exams.add(sa_exam)
+    return exams
+
+
+def source_exams(exam_name):
+    """Exams whose marks are needed to compute ``exam_name``."""
+    return [exam_name] + SA_FA_EXAMS.get(exam_name, [])
+
+
+def compute_result(exam_name, marks):
+    """
+    Work out one student's result from their marks.
+
+    ``marks`` maps exam name to an ordered list of ``(subject, marks)``.
+    Returns the ExamResult field values, or None when there are no marks.
+    """
+    exam_marks = marks.get(exam_name, [])
+    if not exam_marks:
+        return None
+
+    if exam_name in SA_FA_EXAMS:
+        fa_totals = defaultdict(int)
+        for fa_exam in SA_FA_EXAMS[exam_name]:
+            for subject, value in marks.get(fa_exam, []):
+                fa_totals[subject] += value
+        subject_max = 100
+    else:
+        fa_totals = {}
+        subject_max = 20
+
+    subjects = []
+    total = 0
+    for subject, value in exam_marks:
+        fa_total = fa_totals.get(subject, 0)
+        subject_total = fa_total + value
+        subjects.append({
+            "subject": subject,
+            "marks": value,
+            "fa_total": fa_total,
+            "total": subject_total,
+        })
+        total += subject_total
+
+    max_marks = len(subjects) * subject_max
+    percentage = round((total / max_marks) * 100, 2) if max_marks else 0
+
+    return {
+        "subjects": subjects,
+        "total": total,
+        "max_marks": max_marks,
+        "percentage": percentage,
+        "grade": grade_for(percentage),
+    }
+
+
+@retry_on_lock()
+def refresh_exam_results(keys):
+    """
+    Recompute the results touched by a marks write.
+
+    ``keys`` is an iterable of ``(student_id, exam_name)`` for the marks
+    that changed; dependent SA results are included automatically.
+    """
+    targets = set()
+    for student_id, exam_name in keys:
+        for exam in affected_exams(exam_name):
+            targets.add((student_id, exam))
+    if not targets:
+        return
+
+    student_ids = {student_id for student_id, _ in targets}
+    exams = set()
+    for _, exam_name in targets:
+        exams.update(source_exams(exam_name))
+
+    with write_transaction():
+        marks = defaultdict(lambda: defaultdict(list))
+        existing = {}
+
+        for batch in batched(student_ids):
+            rows = StudentMarks.objects.filter(
+                student_id__in=batch,
+                exam_name__in=exams
+            ).order_by("id").values_list("student_id", "exam_name", "subject", "marks")
+            for student_id, exam_name, subject, value in rows:
+                marks[student_id][exam_name].append((subject, value))
+
+            for result in ExamResult.objects.filter(
+                student_id__in=batch,
+                exam_name__in=exams
+            ):
+                existing[(result.student_id, result.exam_name)] = result
+
+        to_create = []
+        to_update = []
+        to_delete = []
+        fields = ["subjects", "total", "max_marks", "percentage", "grade"]
+        now = timezone.now()
+
+        for student_id, exam_name in targets:
+            values = compute_result(exam_name, marks[student_id])
+            result = existing.get((student_id, exam_name))
+
+            if values is None:
+                if result is not None:
+                    to_delete.append(result.id)
+            elif result is None:
+                to_create.append(ExamResult(
+                    student_id=student_id,
+                    exam_name=exam_name,
+                    **values
+                ))
+            elif any(getattr(result, f) != values[f] for f in fields):
+                for f in fields:
+                    setattr(result, f, values[f])
+                result.updated_at = now
+                to_update.append(result)
+
+        if to_create:
+            ExamResult.objects.bulk_create(to_create)
+        if to_update:
+            ExamResult.objects.bulk_update(to_update, fields + ["updated_at"])
+        for batch in batched(to_delete):
+            ExamResult.objects.filter(id__in=batch).delete()
+
+
+def get_exam_result(student, exam_name):
+    """
+    One indexed lookup for a student's result, None when there is none.
+
+    Read-only: every marks write keeps ExamResult current, and marks entered
+    before results were materialized are filled in by rebuild_exam_results.
+    """
+    return ExamResult.objects.filter(student=student, exam_name=exam_name).first()
+
+
+def rebuild_exam_results(students=None):
+    """Recompute every stored result, optionally for a StudentProfile queryset."""
+    marks = StudentMarks.objects.all()
+    results = ExamResult.objects.all()
+    if students is not None:
+        marks = marks.filter(student__in=students)
+        results = results.filter(student__in=students)
+    keys = set(marks.values_list("student_id", "exam_name").distinct())
+    keys.update(results.values_list("student_id", "exam_name"))
+    refresh_exam_results(keys)
+    return len(keys)
+
+
+# ===============================
+# CLASS ANALYTICS
+# ===============================
+
+def class_results(students, exam_name, using=DEFAULT_DB_ALIAS):
+    """
+    Results, ranks and per-subject statistics for one class-section.
+
+    ``students`` is a StudentProfile queryset. Everything is computed with
+    grouped aggregate queries, so the query count does not grow with the
+    size of the class. ``using`` names the database to read from (see
+    replica.reporting_alias). Nothing is written: results are kept current
+    by the marks writes (and rebuild_exam_results).
+    """
+    students = students.using(using)
+
+    results = ExamResult.objects.using(using).filter(
+        student__in=students,
+        exam_name=exam_name
+    ).select_related("student__user")
+
+    if connections[using].features.supports_over_clause:
+        results = list(results.annotate(
+            rank=Window(expression=Rank(), order_by=F("total").desc())
+        ).order_by("rank", "student__roll_number"))
+    else:
+        results = sorted(results, key=lambda r: (-r.total, r.student.roll_number))
+        for position, result in enumerate(results, start=1):
+            previous = results[position - 2] if position > 1 else None
+            result.rank = previous.rank if previous and previous.total == result.total else position
+
+    max_marks = EXAM_MAX_MARKS.get(exam_name, 20)
+    pass_mark = max_marks * PASS_PERCENTAGE / 100
+
+    marks = StudentMarks.objects.using(using).filter(student__in=students, exam_name=exam_name)
+
+    subjects = list(
+        marks.values("subject")
+        .annotate(
+            count=Count("id"),
+            mean=Avg("marks"),
+            stddev=StdDev("marks"),
+            lowest=Min("marks"),
+            highest=Max("marks"),
+            passed=Count("id", filter=Q(marks__gte=pass_mark)),
+        )
+        .order_by("subject")
+    )
+
+    # SQLite has no median aggregate: one ordered pass over the marks.
+    by_subject = defaultdict(list)
+    for subject, value in marks.order_by("subject", "marks").values_list("subject", "marks"):
+        by_subject[subject].append(value)
+
+    for row in subjects:
+        row["median"] = statistics.median(by_subject[row["subject"]])
+        row["mean"] = round(row["mean"], 2)
+        row["stddev"] = round(row["stddev"] or 0, 2)
+        row["pass_rate"] = round(row["passed"] * 100 / row["count"], 1)
+
+    buckets = dict(
+        ExamResult.objects.using(using).filter(student__in=students, exam_name=exam_name)
+        .annotate(bucket=Cast(F("percentage") / 10, IntegerField()))
+        .values("bucket")
+        .annotate(count=Count("id"))
+        .values_list("bucket", "count")
+        .order_by()
+    )
+    histogram = [0] * HISTOGRAM_BUCKETS
+    for bucket, count in buckets.items():
+        histogram[min(max(bucket, 0), HISTOGRAM_BUCKETS - 1)] += count
+    peak = max(histogram) or 1
+
+    return {
+        "results": results,
+        "subjects": subjects,
+        "histogram": [
+            {
+                "label": f"{i * 10}-{i * 10 + 9 if i < HISTOGRAM_BUCKETS - 1 else 100}%",
+                "count": count,
+                "width": round(count * 100 / peak),
+            }
+            for i, count in enumerate(histogram)
+        ],
+        "max_marks": max_marks,
+        "pass_mark": pass_mark,
+    }
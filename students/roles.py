@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+
+from . import stamps
+
+
+ROLE_GROUPS = ("Teacher", "Parent", "Student")
+
+SESSION_KEY = "_roles"
+STAMP_NAME = "roles"
+
+
+class Roles:
+    """The groups and profile ids of the logged-in user."""
+
+    def __init__(self, groups=(), student_id=None, parent_id=None, teacher_id=None, child_id=None):
+        self.groups = frozenset(groups)
+        self.student_id = student_id
+        self.parent_id = parent_id
+        self.teacher_id = teacher_id
+        # StudentProfile id of a parent's child.
+        self.child_id = child_id
+
+    @property
+    def is_teacher(self):
+        return "Teacher" in self.groups
+
+    @property
+    def is_parent(self):
+        return "Parent" in self.groups
+
+    @property
+    def is_student(self):
+        return "Student" in self.groups
+
+    def as_session(self, stamp):
+        return {
+            "groups": sorted(self.groups),
+            "student_id": self.student_id,
+            "parent_id": self.parent_id,
+            "teacher_id": self.teacher_id,
+            "child_id": self.child_id,
+            "stamp": stamp,
+        }
+
+
+def resolve_roles(user):
+    """Look up a user's role groups and profile ids (two queries)."""
+    groups = user.groups.filter(
+        name__in=ROLE_GROUPS
+    ).values_list("name", flat=True)
+
+    profile_ids = User.objects.filter(pk=user.pk).values_list(
+        "studentprofile__id",
+        "parentprofile__id",
+        "teacherprofile__id",
+        "parentprofile__student_id",
+    ).first() or (None, None, None, None)
+
+    return Roles(list(groups), *profile_ids)
+
+
+def remember_roles(request, user):
+    """Resolve roles once (at login) and keep them in the session."""
+    stamp = stamps.current(STAMP_NAME)
+    roles = resolve_roles(user)
+    request.session[SESSION_KEY] = roles.as_session(stamp)
+    request.roles = roles
+    return roles
+
+
+def get_roles(request):
+    """
+    Roles for the current request, from the session when the stored copy is
+    still current, otherwise resolved again and re-stored.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return Roles()
+
+    stored = request.session.get(SESSION_KEY)
+    # Sessions stored before child_id existed are resolved again.
+    if stored and "child_id" in stored and stored.get("stamp") == stamps.current(STAMP_NAME):
+        return Roles(
+            stored["groups"],
+            stored["student_id"],
+            stored["parent_id"],
+            stored["teacher_id"],
+            stored["child_id"],
+        )
+
+    return remember_roles(request, user)
+
+
+def invalidate_roles():
+    """Make every session re-resolve its roles on the next request."""
+    stamps.bump(STAMP_NAME)
@@ -0,0 +1,339 @@
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Attendance, DailyAttendanceRollup, MonthlyAttendance, StudentProfile
+from .utils import batched, retry_on_lock, write_transaction
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def monthly_counts(queryset):
+    """
+    Group daily attendance rows into per-student, per-month counters.
+
+    One aggregate query; returns ``{(student_id, month): (total, present)}``.
+    """
+    rows = (
+        queryset
+        .annotate(month=TruncMonth("date"))
+        .values("student_id", "month")
+        .annotate(
+            total=Count("id"),
+            present=Count("id", filter=Q(status="Present")),
+        )
+        .order_by()
+    )
+    return {
+        (row["student_id"], row["month"]): (row["total"], row["present"])
+        for row in rows
+    }
+
+
+def _save_monthly(counts, keys):
+    """
+    Make MonthlyAttendance match ``counts`` for every key in ``keys``.
+
+    Keys without any daily rows left are deleted.
+    """
+    by_month = defaultdict(set)
+    for student_id, month in keys:
+        by_month[month].add(student_id)
+
+    existing = {}
+    for month, student_ids in by_month.items():
+        for batch in batched(student_ids):
+            for row in MonthlyAttendance.objects.filter(
+                student_id__in=batch,
+                month=month
+            ):
+                existing[(row.student_id, row.month)] = row
+
+    to_create = []
+    to_update = []
+    to_delete = []
+
+    for key in keys:
+        row = existing.get(key)
+        total, present = counts.get(key, (0, 0))
+
+        if not total:
+            if row is not None:
+                to_delete.append(row.id)
+        elif row is None:
+            to_create.append(MonthlyAttendance(
+                student_id=key[0],
+                month=key[1],
+                total_days=total,
+                present_days=present
+            ))
+        elif (row.total_days, row.present_days) != (total, present):
+            row.total_days = total
+            row.present_days = present
+            to_update.append(row)
+
+    if to_create:
+        MonthlyAttendance.objects.bulk_create(to_create)
+    if to_update:
+        MonthlyAttendance.objects.bulk_update(
+            to_update, ["total_days", "present_days"]
+        )
+    for batch in batched(to_delete):
+        MonthlyAttendance.objects.filter(id__in=batch).delete()
+
+
+@retry_on_lock()
+def refresh_monthly_attendance(keys):
+    """
+    Recompute the monthly rollups touched by an attendance write.
+
+    ``keys`` is an iterable of ``(student_id, any date in the month)``.
+    """
+    keys = {(student_id, month_start(day)) for student_id, day in keys}
+    if not keys:
+        return
+
+    first = min(month for _, month in keys)
+    last = next_month(max(month for _, month in keys))
+    student_ids = {student_id for student_id, _ in keys}
+
+    with write_transaction():
+        counts = {}
+        for batch in batched(student_ids):
+            counts.update(monthly_counts(Attendance.objects.filter(
+                student_id__in=batch,
+                date__gte=first,
+                date__lt=last
+            )))
+        _save_monthly(counts, keys)
+
+
+def rebuild_monthly_attendance(start=None, end=None, students=None, prune=False):
+    """
+    Recompute every monthly rollup between ``start`` and ``end`` (months,
+    inclusive) from the daily rows with one grouped aggregate query.
+
+    Hand-entered months with no daily rows are kept unless ``prune`` is set.
+    Returns the number of rollups written.
+    """
+    daily = Attendance.objects.all()
+    rollups = MonthlyAttendance.objects.all()
+
+    if start:
+        daily = daily.filter(date__gte=month_start(start))
+        rollups = rollups.filter(month__gte=month_start(start))
+    if end:
+        daily = daily.filter(date__lt=next_month(end))
+        rollups = rollups.filter(month__lt=next_month(end))
+    if students is not None:
+        daily = daily.filter(student__in=students)
+        rollups = rollups.filter(student__in=students)
+
+    with transaction.atomic():
+        counts = monthly_counts(daily)
+        keys = set(counts)
+        if prune:
+            keys.update(rollups.values_list("student_id", "month"))
+        _save_monthly(counts, keys)
+
+    return len(counts)
+
+
+# ===============================
+# DAILY CLASS-SECTION ROLLUPS
+# ===============================
+#
+# Attendance has no class of its own: rows are counted under the
+# class-section the student is in when the rollup is computed. Moving a
+# student recounts only the current term (from TERM_START_MONTH), and after
+# promotions rebuild only the new term, so earlier terms keep the classes
+# they were recorded under.
+
+def term_start(today=None):
+    """First day of the current school year (settings.TERM_START_MONTH)."""
+    today = today or timezone.localdate()
+    start = date(today.year, settings.TERM_START_MONTH, 1)
+    if start > today:
+        start = start.replace(year=today.year - 1)
+    return start
+
+
+def daily_counts(queryset):
+    """
+    Group daily attendance rows into per-class-section, per-day counters.
+
+    One aggregate query; returns ``{(date, class, section): (present, absent)}``.
+    """
+    rows = (
+        queryset
+        .values("date", "student__student_class", "student__section")
+        .annotate(
+            present=Count("id", filter=Q(status="Present")),
+            absent=Count("id", filter=Q(status="Absent")),
+        )
+        .order_by()
+    )
+    return {
+        (row["date"], row["student__student_class"], row["student__section"]):
+            (row["present"], row["absent"])
+        for row in rows
+    }
+
+
+def _save_daily(counts, keys):
+    """
+    Make DailyAttendanceRollup match ``counts`` for every key in ``keys``.
+
+    Keys without any daily rows left are deleted.
+    """
+    existing = {}
+    for batch in batched({day for day, _, _ in keys}):
+        for row in DailyAttendanceRollup.objects.filter(date__in=batch):
+            existing[(row.date, row.student_class, row.section)] = row
+
+    to_create = []
+    to_update = []
+    to_delete = []
+
+    for key in keys:
+        row = existing.get(key)
+        present, absent = counts.get(key, (0, 0))
+
+        if not present + absent:
+            if row is not None:
+                to_delete.append(row.id)
+        elif row is None:
+            to_create.append(DailyAttendanceRollup(
+                date=key[0],
+                student_class=key[1],
+                section=key[2],
+                present=present,
+                absent=absent,
+                total=present + absent
+            ))
+        elif (row.present, row.absent) != (present, absent):
+            row.present = present
+            row.absent = absent
+            row.total = present + absent
+            to_update.append(row)
+
+    if to_create:
+        DailyAttendanceRollup.objects.bulk_create(to_create)
+    if to_update:
+        DailyAttendanceRollup.objects.bulk_update(
+            to_update, ["present", "absent", "total"]
+        )
+    for batch in batched(to_delete):
+        DailyAttendanceRollup.objects.filter(id__in=batch).delete()
+
+
+@retry_on_lock()
+def refresh_daily_attendance(keys):
+    """
+    Recompute the class-section rollups touched by an attendance write.
+
+    ``keys`` is an iterable of ``(student_id, date)``.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    classes = {}
+    for batch in batched({student_id for student_id, _ in keys}):
+        for student_id, student_class, section in StudentProfile.objects.filter(
+            id__in=batch
+        ).values_list("id", "student_class", "section"):
+            classes[student_id] = (student_class, section)
+
+    _refresh_daily({
+        (day, *classes[student_id])
+        for student_id, day in keys
+        if student_id in classes
+    })
+
+
+@retry_on_lock()
+def refresh_moved_student(student_id, previous, current):
+    """
+    Recompute the rollups of a student who moved from the class-section
+    ``previous`` to ``current``: on every date this term they have
+    attendance, both class-sections' counts change. Only those two
+    class-sections are counted.
+    """
+    days = Attendance.objects.filter(
+        student_id=student_id,
+        date__gte=term_start()
+    ).values_list("date", flat=True)
+
+    sections = Q()
+    for student_class, section in (previous, current):
+        sections |= Q(student__student_class=student_class, student__section=section)
+
+    _refresh_daily(
+        {
+            (day, *class_section)
+            for day in days
+            for class_section in (previous, current)
+        },
+        Attendance.objects.filter(sections)
+    )
+
+
+def _refresh_daily(rollup_keys, daily=None):
+    """
+    Recompute the ``(date, class, section)`` rollups in ``rollup_keys``,
+    counting ``daily`` (all attendance by default) on their dates.
+    """
+    if not rollup_keys:
+        return
+    if daily is None:
+        # A whole day of the school is one short index range, so count
+        # every class-section on the touched dates in one query.
+        daily = Attendance.objects.all()
+
+    with write_transaction():
+        counts = {}
+        for batch in batched({day for day, _, _ in rollup_keys}):
+            counts.update(daily_counts(daily.filter(date__in=batch)))
+        _save_daily(counts, rollup_keys)
+
+
+def rebuild_daily_attendance(start=None, end=None, prune=False):
+    """
+    Recompute every class-section rollup between ``start`` and ``end``
+    (dates, inclusive) with one grouped aggregate query.
+
+    With ``prune``, rollups in the range that no longer have any daily rows
+    are deleted. Returns the number of rollups written.
+    """
+    daily = Attendance.objects.all()
+    rollups = DailyAttendanceRollup.objects.all()
+
+    if start:
+        daily = daily.filter(date__gte=start)
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        daily = daily.filter(date__lte=end)
+        rollups = rollups.filter(date__lte=end)
+
+    with transaction.atomic():
+        counts = daily_counts(daily)
+        keys = set(counts)
+        if prune:
+            keys.update(rollups.values_list("date", "student_class", "section"))
+        _save_daily(counts, keys)
+
+    return len(counts)
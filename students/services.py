@@ -0,0 +1,375 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import (
+    CLASS_CHOICES,
+    EXAM_MAX_MARKS,
+    Attendance,
+    ExamPayment,
+    PaymentTransaction,
+    StudentMarks,
+    StudentProfile,
+)
+from .ids import new_payment_id
+from .results import refresh_exam_results
+from .rollups import refresh_daily_attendance, refresh_monthly_attendance
+from .utils import batched, retry_on_lock, write_transaction
+
+
+ATTENDANCE_STATUSES = {"Present", "Absent"}
+
+
+# ===============================
+# ATTENDANCE
+# ===============================
+
+@retry_on_lock()
+def upsert_attendance(records):
+    """
+    Write many attendance rows at once.
+
+    ``records`` maps ``(student_id, date)`` to a status. Existing rows are
+    resolved with one query per batch of students, then everything is
+    inserted/updated with bulk_create / bulk_update in one transaction.
+    Returns ``(created, updated)`` counts; unchanged rows are not written.
+    """
+    if not records:
+        return 0, 0
+
+    student_ids = {student_id for student_id, _ in records}
+    dates = {date for _, date in records}
+
+    with write_transaction():
+        existing = {}
+        for batch in batched(student_ids):
+            rows = Attendance.objects.filter(
+                student_id__in=batch,
+                date__in=dates
+            ).only("id", "student_id", "date", "status")
+            for row in rows:
+                existing[(row.student_id, row.date)] = row
+
+        to_create = []
+        to_update = []
+
+        for (student_id, date), status in records.items():
+            row = existing.get((student_id, date))
+            if row is None:
+                to_create.append(
+                    Attendance(student_id=student_id, date=date, status=status)
+                )
+            elif row.status != status:
+                row.status = status
+                to_update.append(row)
+
+        if to_create:
+            Attendance.objects.bulk_create(to_create)
+        if to_update:
+            Attendance.objects.bulk_update(to_update, ["status"])
+
+        # bulk_create / bulk_update skip model signals, so keep the
+        # rollups in step here.
+        written = [(row.student_id, row.date) for row in to_create + to_update]
+        refresh_monthly_attendance(written)
+        refresh_daily_attendance(written)
+
+    return len(to_create), len(to_update)
+
+
+def save_attendance_register(attendance_date, statuses, students=None):
+    """
+    Save a register for one date.
+
+    ``statuses`` maps student id to "Present"/"Absent". When ``students`` is
+    given (a StudentProfile queryset, e.g. one class-section), ids outside it
+    are ignored so a tampered form cannot touch other classes.
+    """
+    if students is not None:
+        allowed = set(students.values_list("id", flat=True))
+        statuses = {
+            student_id: status
+            for student_id, status in statuses.items()
+            if student_id in allowed
+        }
+
+    records = {
+        (student_id, attendance_date): status
+        for student_id, status in statuses.items()
+        if status in ATTENDANCE_STATUSES
+    }
+    return upsert_attendance(records)
+
+
+def statuses_from_post(data, prefix="status_"):
+    """Collect ``status_<student id>`` fields from a submitted register."""
+    statuses = {}
+    for key, value in data.items():
+        if not key.startswith(prefix):
+            continue
+        try:
+            student_id = int(key[len(prefix):])
+        except ValueError:
+            continue
+        statuses[student_id] = value
+    return statuses
+
+
+def register_sections():
+    """Class-sections that have students, in CLASS_CHOICES order."""
+    order = {value: index for index, (value, _) in enumerate(CLASS_CHOICES)}
+    pairs = StudentProfile.objects.values_list("student_class", "section").distinct().order_by()
+    return sorted(set(pairs), key=lambda pair: (order.get(pair[0], len(order)), pair[1]))
+
+
+def school_register(attendance_date, student_class, section):
+    """
+    One class-section of the school register, ordered by roll number, with
+    each student's status on the date.
+
+    The register is paged by class-section: one form for the whole school
+    would post a field per student, past DATA_UPLOAD_MAX_NUMBER_FIELDS.
+    """
+    students = list(
+        StudentProfile.objects.filter(student_class=student_class, section=section)
+        .select_related("user")
+        .order_by("roll_number")
+    )
+    status_map = dict(
+        Attendance.objects.filter(
+            date=attendance_date,
+            student_id__in=[student.id for student in students]
+        ).values_list("student_id", "status")
+    )
+    for student in students:
+        student.current_status = status_map.get(student.id, "")
+    return students
+
+
+# ===============================
+# MARKS
+# ===============================
+
+@retry_on_lock()
+def upsert_marks(records):
+    """
+    Write many marks at once.
+
+    ``records`` maps ``(student_id, exam_name, subject)`` to marks. Works like
+    upsert_attendance: one lookup per batch of students, then bulk writes in
+    one transaction, skipping cells whose value did not change.
+    """
+    if not records:
+        return 0, 0
+
+    student_ids = {key[0] for key in records}
+    exam_names = {key[1] for key in records}
+    subjects = {key[2] for key in records}
+
+    with write_transaction():
+        existing = {}
+        for batch in batched(student_ids):
+            rows = StudentMarks.objects.filter(
+                student_id__in=batch,
+                exam_name__in=exam_names,
+                subject__in=subjects
+            ).only("id", "student_id", "exam_name", "subject", "marks")
+            for row in rows:
+                existing[(row.student_id, row.exam_name, row.subject)] = row
+
+        to_create = []
+        to_update = []
+
+        for (student_id, exam_name, subject), marks in records.items():
+            row = existing.get((student_id, exam_name, subject))
+            if row is None:
+                to_create.append(StudentMarks(
+                    student_id=student_id,
+                    exam_name=exam_name,
+                    subject=subject,
+                    marks=marks
+                ))
+            elif row.marks != marks:
+                row.marks = marks
+                to_update.append(row)
+
+        if to_create:
+            StudentMarks.objects.bulk_create(to_create)
+        if to_update:
+            StudentMarks.objects.bulk_update(to_update, ["marks"])
+
+        refresh_exam_results([
+            (row.student_id, row.exam_name) for row in to_create + to_update
+        ])
+
+    return len(to_create), len(to_update)
+
+
+def clean_marks(exam_name, raw):
+    """Parse one submitted mark. Returns ``(marks, error)``."""
+    max_marks = EXAM_MAX_MARKS.get(exam_name)
+    if max_marks is None:
+        return None, f"Unknown exam {exam_name}"
+    try:
+        marks = int(raw)
+    except (TypeError, ValueError):
+        return None, "Not a number"
+    if not 0 <= marks <= max_marks:
+        return None, f"Must be between 0 and {max_marks}"
+    return marks, ""
+
+
+def validate_marks(exam_name, cells):
+    """
+    Check raw grid cells against the exam's maximum marks.
+
+    ``cells`` maps ``(student_id, subject)`` to the submitted text. Blank
+    cells are skipped. Returns ``(records, errors)`` where ``records`` is
+    ready for upsert_marks and ``errors`` maps the bad cells to a message.
+    """
+    records = {}
+    errors = {}
+
+    if exam_name not in EXAM_MAX_MARKS:
+        errors[None] = f"Unknown exam {exam_name}"
+        return records, errors
+
+    for (student_id, subject), raw in cells.items():
+        raw = (raw or "").strip()
+        if not raw:
+            continue
+        marks, error = clean_marks(exam_name, raw)
+        if error:
+            errors[(student_id, subject)] = error
+            continue
+        records[(student_id, exam_name, subject)] = marks
+
+    return records, errors
+
+
+def marks_grid(students, exam_name, subjects, submitted=None, errors=None):
+    """
+    Attach a row of cells (one per subject) to each student for the grid.
+
+    Loads every mark for the class and exam in one query. ``submitted`` and
+    ``errors`` (as returned by validate_marks) are shown instead of the saved
+    values when a grid is re-displayed after a failed save.
+    """
+    submitted = submitted or {}
+    errors = errors or {}
+
+    students = list(students.select_related("user"))
+    marks_map = {
+        (student_id, subject): marks
+        for student_id, subject, marks in StudentMarks.objects.filter(
+            student__in=[s.id for s in students],
+            exam_name=exam_name,
+            subject__in=subjects
+        ).values_list("student_id", "subject", "marks")
+    }
+    for student in students:
+        student.cells = []
+        for index, subject in enumerate(subjects):
+            key = (student.id, subject)
+            student.cells.append({
+                "name": f"marks_{student.id}_{index}",
+                "value": submitted.get(key, marks_map.get(key, "")),
+                "error": errors.get(key, ""),
+            })
+    return students
+
+
+def marks_cells_from_post(data, student_ids, subjects):
+    """Collect ``marks_<student id>_<subject index>`` grid fields."""
+    cells = {}
+    for student_id in student_ids:
+        for index, subject in enumerate(subjects):
+            name = f"marks_{student_id}_{index}"
+            if name in data:
+                cells[(student_id, subject)] = data[name]
+    return cells
+
+
+# ===============================
+# PAYMENTS
+# ===============================
+
+@retry_on_lock()
+def record_payment(student, amount, total_fee, payment_id=None, idempotency_key=None):
+    """
+    Add a payment of ``amount`` (capped at what is still owed) to the
+    student's running total and append it to the ledger.
+
+    With an ``idempotency_key``, repeating a call returns the transaction
+    recorded by the first one instead of paying again.
+
+    Returns the PaymentTransaction, or None when nothing was owed.
+    """
+    if idempotency_key:
+        original = PaymentTransaction.objects.filter(
+            student=student,
+            idempotency_key=idempotency_key
+        ).first()
+        if original:
+            return original
+
+    if amount <= 0:
+        return None
+
+    try:
+        return _apply_payment(student, amount, total_fee, payment_id or new_payment_id(), idempotency_key)
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        # A parallel submission with the same key committed first; the
+        # whole transaction above, balance update included, rolled back.
+        return PaymentTransaction.objects.get(student=student, idempotency_key=idempotency_key)
+
+
+def _apply_payment(student, amount, total_fee, payment_id, idempotency_key):
+    now = timezone.now()
+    with transaction.atomic():
+        # The conditional UPDATE is the transaction's first statement, so it
+        # takes SQLite's write lock: no other payment can move this balance
+        # until we commit, and the reads below see the final value.
+        updated = ExamPayment.objects.filter(
+            student=student,
+            amount__lte=total_fee - amount
+        ).update(
+            amount=F("amount") + amount,
+            status=Case(
+                When(amount__gte=total_fee - amount, then=Value("Paid")),
+                default=Value("Partial")
+            ),
+            payment_id=payment_id,
+            paid_on=now,
+        )
+
+        if not updated:
+            # First payment, or one that would pay more than is owed.
+            payment = ExamPayment.objects.filter(student=student).first()
+            paid = payment.amount if payment else 0
+            amount = min(amount, total_fee - paid)
+            if amount <= 0:
+                return None
+
+            fields = {
+                "status": "Paid" if paid + amount >= total_fee else "Partial",
+                "payment_id": payment_id,
+                "paid_on": now,
+            }
+            if payment:
+                ExamPayment.objects.filter(pk=payment.pk).update(amount=F("amount") + amount, **fields)
+            else:
+                ExamPayment.objects.create(student=student, amount=amount, **fields)
+
+        balance = ExamPayment.objects.filter(student=student).values_list("amount", flat=True).first()
+
+        return PaymentTransaction.objects.create(
+            student=student,
+            amount=amount,
+            balance_after=balance,
+            payment_id=payment_id,
+            idempotency_key=idempotency_key,
+            created_at=now,
+        )
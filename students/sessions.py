@@ -0,0 +1,46 @@
+"""
+Session engine (``SESSION_ENGINE = "students.sessions"``).
+
+Sessions are stored in the database and, with ``SESSION_CACHED`` on, read
+through the default cache (Django's cached_db backend), so most requests
+never query django_session. That needs a cache every worker shares (the
+file cache): with a per-process cache a worker could keep serving a
+session that another worker has since changed.
+
+Either way a session is only written back when its data actually changed.
+SessionMiddleware saves whenever a key was assigned, even to the value it
+already held.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db, db
+
+
+class WriteAvoidingMixin:
+
+    _loaded = None
+
+    def load(self):
+        data = super().load()
+        self._loaded = self.serializer().dumps(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self._loaded is not None
+            and self.serializer().dumps(self._get_session()) == self._loaded
+        ):
+            return
+        super().save(must_create=must_create)
+        self._loaded = self.serializer().dumps(self._get_session())
+
+
+class CachedSessionStore(WriteAvoidingMixin, cached_db.SessionStore):
+    pass
+
+
+class DatabaseSessionStore(WriteAvoidingMixin, db.SessionStore):
+    pass
+
+
+SessionStore = CachedSessionStore if settings.SESSION_CACHED else DatabaseSessionStore
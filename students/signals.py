@@ -0,0 +1,203 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .class_pages import invalidate_on_commit
+from .images import delete_variant_files, schedule_variants
+from .models import (
+    AboutImage,
+    Attendance,
+    ExamFee,
+    ExamTimetable,
+    Homework,
+    ParentProfile,
+    StudentMarks,
+    StudentProfile,
+    TeacherProfile,
+)
+from .refdata import invalidate_refdata
+from .replica import refresh_replica, replica_configured
+from .roles import invalidate_roles
+from .results import refresh_exam_results
+from .rollups import refresh_daily_attendance, refresh_monthly_attendance, refresh_moved_student
+
+
+# ===============================
+# SQLITE CONNECTIONS
+# ===============================
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+# ===============================
+# ATTENDANCE ROLLUPS
+# ===============================
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    keys = {(instance.student_id, instance.date)}
+    previous = getattr(instance, "_rollup_key", None)
+    if previous and None not in previous:
+        keys.add(previous)
+
+    refresh_monthly_attendance(keys)
+    refresh_daily_attendance(keys)
+    instance._rollup_key = (instance.student_id, instance.date)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    refresh_monthly_attendance([(instance.student_id, instance.date)])
+    refresh_daily_attendance([(instance.student_id, instance.date)])
+
+
+@receiver(post_save, sender=StudentProfile)
+def student_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, "_class_key", None)
+    current = (instance.student_class, instance.section)
+    instance._class_key = current
+    # The daily rollups count a student's attendance under their class.
+    if previous and None not in previous and previous != current:
+        refresh_moved_student(instance.id, previous, current)
+
+
+# ===============================
+# EXAM RESULTS
+# ===============================
+
+def marks_keys(instance):
+    """The result the row counts towards now and the one it was loaded under."""
+    keys = {(instance.student_id, instance.exam_name)}
+    previous = getattr(instance, "_result_key", None)
+    if previous and None not in previous:
+        keys.add(previous)
+    return keys
+
+
+@receiver(post_save, sender=StudentMarks)
+def marks_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_exam_results(marks_keys(instance))
+    instance._result_key = (instance.student_id, instance.exam_name)
+
+
+@receiver(post_delete, sender=StudentMarks)
+def marks_deleted(sender, instance, **kwargs):
+    refresh_exam_results(marks_keys(instance))
+
+
+# ===============================
+# CLASS PAGE CACHE
+# ===============================
+
+@receiver(post_save, sender=Homework)
+@receiver(post_delete, sender=Homework)
+@receiver(post_save, sender=ExamTimetable)
+@receiver(post_delete, sender=ExamTimetable)
+def class_page_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    keys = {(instance.student_class, instance.section)}
+    previous = getattr(instance, "_class_key", None)
+    if previous and None not in previous:
+        keys.add(previous)
+    instance._class_key = (instance.student_class, instance.section)
+
+    invalidate_on_commit(sender.class_page_kind, keys)
+
+
+
+# ===============================
+# REFERENCE DATA
+# ===============================
+
+@receiver(post_save, sender=ExamFee)
+@receiver(post_delete, sender=ExamFee)
+def exam_fee_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_refdata)
+
+
+# ===============================
+# ABOUT PAGE IMAGES
+# ===============================
+
+@receiver(post_save, sender=AboutImage)
+def about_image_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if created or instance.image.name != getattr(instance, "_image_name", None):
+        schedule_variants(instance.pk)
+    instance._image_name = instance.image.name
+
+
+@receiver(post_delete, sender=AboutImage)
+def about_image_deleted(sender, instance, **kwargs):
+    variants = list(instance.variants)
+    transaction.on_commit(lambda: delete_variant_files(variants))
+
+
+# ===============================
+# ROLE CACHE
+# ===============================
+
+# After commit, like the class pages: a request that re-resolved its roles
+# before then would store the old groups under the new stamp.
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(invalidate_roles)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_roles)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=ParentProfile)
+@receiver(post_save, sender=TeacherProfile)
+def profile_saved(sender, created, raw=False, **kwargs):
+    # A parent's child is part of the cached roles, so any parent edit counts.
+    if not raw and (created or sender is ParentProfile):
+        transaction.on_commit(invalidate_roles)
+
+
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=ParentProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def profile_deleted(sender, **kwargs):
+    transaction.on_commit(invalidate_roles)
+
+
+# ===============================
+# REPLICA
+# ===============================
+
+@receiver(post_migrate)
+def migrated(sender, using=DEFAULT_DB_ALIAS, plan=None, **kwargs):
+    # A snapshot taken before a migration lacks its tables and columns.
+    # Test databases never get here: the replica mirrors them, so
+    # replica_configured() is False.
+    if sender.label != "students" or using != DEFAULT_DB_ALIAS or not plan:
+        return
+    if replica_configured():
+        refresh_replica()
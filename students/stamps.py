@@ -0,0 +1,39 @@
+"""
+Cross-process version stamps.
+
+A stamp is the modification time of a small file under
+``settings.VERSION_STAMP_DIR``. Bumping it is how one gunicorn worker tells
+the others that something they hold in memory or in a session is stale;
+reading it is a single ``stat()`` call, with no database or cache round trip.
+"""
+import os
+import time
+
+from django.conf import settings
+
+
+def _path(name):
+    return os.path.join(settings.VERSION_STAMP_DIR, name)
+
+
+def current(name):
+    """Current stamp for ``name`` (0 if it was never bumped)."""
+    try:
+        return os.stat(_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name, at=None):
+    """
+    Move the stamp for ``name`` forward (to ``at``, in ns, when given and
+    later than the current stamp) and return the new value.
+    """
+    path = _path(name)
+    os.makedirs(settings.VERSION_STAMP_DIR, exist_ok=True)
+
+    stamp = max(at or time.time_ns(), current(name) + 1)
+    with open(path, "a"):
+        pass
+    os.utime(path, ns=(stamp, stamp))
+    return stamp
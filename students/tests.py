@@ -1,3 +1,1764 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models.signals import post_migrate
+from django.test import Client, AsyncClient, RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import include, path, resolve
+from PIL import Image
+
+from .models import (
+    CLASS_CHOICES,
+    SUBJECTS,
+    AboutImage,
+    Attendance,
+    DailyAttendanceRollup,
+    ExamFee,
+    ExamPayment,
+    ExamResult,
+    ExamTimetable,
+    Homework,
+    MonthlyAttendance,
+    ParentProfile,
+    StudentMarks,
+    StudentProfile,
+    TeacherProfile,
+)
+from . import async_views, metrics, stamps, urls as student_urls
+from .ids import new_payment_id
+from .images import FORMATS, VARIANT_DIR, generate_variants, variant_widths
+from .log import (
+    BackgroundHandler,
+    ContextFilter,
+    GzipRotatingFileHandler,
+    JsonFormatter,
+    build_logging_config,
+    current_request,
+)
+from .registers import monthly_register
+from .replica import (
+    STAMP_NAME as REPLICA_STAMP,
+    ReplicaRouter,
+    refresh_replica,
+    replica_configured,
+    reporting_alias,
+)
+from .roles import STAMP_NAME as ROLES_STAMP
+from .results import rebuild_exam_results
+from .rollups import rebuild_daily_attendance, rebuild_monthly_attendance, term_start
+from .services import record_payment, save_attendance_register, upsert_attendance, upsert_marks
+from .trends import attendance_trends
+from .sessions import SessionStore
+
+
+# Tables that grow with the school; a full scan of any of them on a page
+# view is a regression.
+HOT_TABLES = {
+    "students_studentprofile",
+    "students_attendance",
+    "students_dailyattendancerollup",
+    "students_monthlyattendance",
+    "students_studentmarks",
+    "students_examresult",
+    "students_homework",
+    "students_examtimetable",
+    "students_exampayment",
+    "students_paymenttransaction",
+}
+
+# "SCAN students_homework" (SQLite >= 3.36) or "SCAN TABLE students_homework",
+# with or without "USING [COVERING] INDEX": walking a whole index is still
+# proportional to the table.
+FULL_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)")
+
+
+class ScratchDirsMixin:
+    """
+    Point the on-disk stores (stamps, metrics, stored receipts) at a
+    temporary directory and turn the replica off, so test rows never reach
+    files a running server would read. Every test class that makes
+    requests or writes rows uses it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.TemporaryDirectory()
+        cls.scratch_settings = override_settings(
+            # Whatever the profile; tests that need the replica enable it.
+            REPLICA_ENABLED=False,
+            **{
+                name: os.path.join(cls.scratch.name, name.lower())
+                for name in ("VERSION_STAMP_DIR", "METRICS_DIR", "RECEIPT_DIR")
+            }
+        )
+        cls.scratch_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # The counts belong to the scratch directory; kept, the flush at
+        # exit would write them to the real METRICS_DIR.
+        metrics.registry.reset()
+        cls.scratch_settings.disable()
+        cls.scratch.cleanup()
+
+
+def seed_school():
+    """A few class-sections with enough rows for the planner to choose."""
+    groups = {
+        name: Group.objects.create(name=name)
+        for name in ("Teacher", "Parent", "Student")
+    }
+
+    students = []
+    for student_class in ("6", "7", "8"):
+        for section in ("A", "B"):
+            for roll in range(1, 11):
+                user = User.objects.create_user(
+                    f"s{student_class}{section}{roll}", password="pw"
+                )
+                user.groups.add(groups["Student"])
+                students.append(StudentProfile.objects.create(
+                    user=user,
+                    roll_number=str(roll),
+                    student_class=student_class,
+                    section=section,
+                ))
+
+            Homework.objects.bulk_create(
+                Homework(
+                    date=date(2026, 1, 1) + timedelta(days=day),
+                    student_class=student_class,
+                    section=section,
+                    subject="Maths",
+                    details="Exercise",
+                )
+                for day in range(10)
+            )
+            ExamTimetable.objects.bulk_create(
+                ExamTimetable(
+                    exam_name="SA-1",
+                    student_class=student_class,
+                    section=section,
+                    subject=subject,
+                    exam_date=date(2026, 3, 1) + timedelta(days=day),
+                    day="Monday",
+                    time="10:00",
+                )
+                for day, subject in enumerate(SUBJECTS)
+            )
+
+    upsert_attendance({
+        (student.id, date(2026, 1, 1) + timedelta(days=day)): "Present" if day % 5 else "Absent"
+        for student in students
+        for day in range(20)
+    })
+    upsert_marks({
+        (student.id, exam_name, subject): 15
+        for student in students
+        for exam_name in ("FA-1", "FA-2", "SA-1")
+        for subject in SUBJECTS
+    })
+
+    student = students[15]
+
+    teacher = User.objects.create_user("teacher", password="pw")
+    teacher.groups.add(groups["Teacher"])
+    TeacherProfile.objects.create(user=teacher)
+
+    parent = User.objects.create_user("parent", password="pw")
+    parent.groups.add(groups["Parent"])
+    ParentProfile.objects.create(user=parent, student=student)
+
+    ExamFee.objects.create(class_name=student.student_class, amount=2000)
+    payment = record_payment(student, 500, 2000, payment_id="DUMMY-1")
+
+    return {
+        "student": student,
+        "teacher": teacher,
+        "parent": parent,
+        "payment": payment,
+    }
+
+
+def attendance_rollups():
+    """Every monthly and daily attendance rollup, in a comparable form."""
+    monthly = MonthlyAttendance.objects.order_by("student_id", "month").values_list(
+        "student_id", "month", "total_days", "present_days"
+    )
+    daily = DailyAttendanceRollup.objects.order_by("date", "student_class", "section").values_list(
+        "date", "student_class", "section", "present", "absent", "total"
+    )
+    return list(monthly), list(daily)
+
+
+def rebuilt_attendance_rollups():
+    """The rollups a full rebuild makes from the attendance rows."""
+    MonthlyAttendance.objects.all().delete()
+    DailyAttendanceRollup.objects.all().delete()
+    rebuild_monthly_attendance()
+    rebuild_daily_attendance()
+    return attendance_rollups()
+
+
+def exam_results():
+    """Every stored exam result, in a comparable form."""
+    return list(ExamResult.objects.order_by("student_id", "exam_name").values_list(
+        "student_id", "exam_name", "subjects", "total", "max_marks", "percentage", "grade"
+    ))
+
+
+def rebuilt_exam_results():
+    """The results a full rebuild makes from the marks."""
+    ExamResult.objects.all().delete()
+    rebuild_exam_results()
+    return exam_results()
+
+
+class QueryPlanTests(ScratchDirsMixin, TestCase):
+    """
+    Run every hot page, EXPLAIN each query it made and fail if SQLite
+    plans a full table scan over a table that grows with the school.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+
+    def assert_no_full_scans(self, user, url, method="get", data=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertIn(response.status_code, (200, 302), url)
+
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for row in cursor.fetchall():
+                    match = FULL_SCAN.search(row[-1])
+                    if match and match.group(1) in HOT_TABLES:
+                        scans.append(f"{row[-1]}\n    {sql}")
+
+        self.assertEqual(scans, [], f"Full table scan on {url}")
+
+    def test_student_pages(self):
+        user = self.data["student"].user
+        for url in (
+            "/profile/",
+            "/attendance/",
+            "/attendance/?month=2026-01",
+            "/attendance/?before=2026-01-10",
+            "/attendance/?after=2026-01-01&month=2026-01",
+            "/homework/",
+            "/exam-timetable/",
+            "/marks/FA-1/",
+            "/marks/SA-1/",
+        ):
+            with self.subTest(url=url):
+                self.assert_no_full_scans(user, url)
+
+    def test_teacher_pages(self):
+        user = self.data["teacher"]
+        for url in (
+            "/teacher/attendance/?load=1&class=7&section=A&date=2026-01-05",
+            "/teacher/attendance/register/?load=1&class=7&section=A&month=2026-01",
+            "/teacher/attendance/trends/",
+            "/teacher/attendance/trends/?from=2026-01-01&to=2026-01-10",
+            "/teacher/marks/?load=1&class=7&section=A&subject=Maths&exam_name=FA-1",
+            "/teacher/marks/grid/?load=1&class=7&section=A&exam_name=SA-1",
+            "/teacher/results/?load=1&class=7&section=A&exam_name=SA-1",
+        ):
+            with self.subTest(url=url):
+                self.assert_no_full_scans(user, url)
+
+    def test_teacher_saves(self):
+        student = self.data["student"]
+        self.assert_no_full_scans(
+            self.data["teacher"],
+            "/teacher/attendance/",
+            method="post",
+            data={
+                "class": student.student_class,
+                "section": student.section,
+                "date": "2026-01-05",
+                f"status_{student.id}": "Absent",
+            },
+        )
+
+    def test_parent_pages(self):
+        user = self.data["parent"]
+        for url in (
+            "/parent/dashboard/",
+            "/parent/payment-history/",
+            f"/parent/receipt/{self.data['payment'].pk}/",
+        ):
+            with self.subTest(url=url):
+                self.assert_no_full_scans(user, url)
+
+
+class ReadOnlyPageTests(ScratchDirsMixin, TestCase):
+    """Loading a page again writes nothing, even when it has nothing to show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+
+    def assert_repeat_get_writes_nothing(self, user, url):
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        writes = [
+            query["sql"] for query in queries.captured_queries
+            if not query["sql"].lstrip().upper().startswith("SELECT")
+        ]
+        self.assertEqual(writes, [], url)
+
+    def test_class_results(self):
+        # A student with FA marks but no SA marks has no SA result, and
+        # must not make every load recompute (and write) it.
+        StudentMarks.objects.filter(student=self.data["student"], exam_name="SA-1").delete()
+        student = self.data["student"]
+        for exam_name in ("SA-1", "FA-1", "SA-2"):
+            url = (
+                f"/teacher/results/?load=1&class={student.student_class}"
+                f"&section={student.section}&exam_name={exam_name}"
+            )
+            with self.subTest(url=url):
+                self.assert_repeat_get_writes_nothing(self.data["teacher"], url)
+
+    def test_marks_pages(self):
+        user = self.data["student"].user
+        for url in ("/marks/FA-1/", "/marks/SA-1/", "/marks/FA-4/", "/marks/foo/"):
+            with self.subTest(url=url):
+                self.assert_repeat_get_writes_nothing(user, url)
+
+
+class MarksFormTests(ScratchDirsMixin, TestCase):
+    """
+    Both marks forms show a failed save again with what was sent, and
+    write nothing for marks that did not change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+        cls.students = list(
+            StudentProfile.objects.filter(student_class="7", section="A").order_by("roll_number")
+        )
+
+    def setUp(self):
+        self.client.force_login(self.data["teacher"])
+
+    def single_form(self, marks):
+        """POST data for the one-subject form: FA-1 Maths."""
+        data = {"class": "7", "section": "A", "subject": "Maths", "exam_name": "FA-1"}
+        for student, value in zip(self.students, marks):
+            data[f"marks_{student.id}_0"] = value
+        return "/teacher/marks/", data
+
+    def grid_form(self, marks):
+        """POST data for the grid: FA-1 Maths and Science."""
+        data = {"class": "7", "section": "A", "exam_name": "FA-1", "subjects": "Maths,Science"}
+        for student, value in zip(self.students, marks):
+            data[f"marks_{student.id}_0"] = value
+            data[f"marks_{student.id}_1"] = value
+        return "/teacher/marks/grid/", data
+
+    def saved_marks(self):
+        return sorted(StudentMarks.objects.filter(
+            student__in=self.students, exam_name="FA-1", subject__in=("Maths", "Science")
+        ).values_list("marks", flat=True).distinct())
+
+    def test_invalid_marks_are_shown_with_what_was_sent(self):
+        for form in (self.single_form, self.grid_form):
+            with self.subTest(form=form.__name__):
+                url, data = form(["999", "17"])
+                response = self.client.post(url, data)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'class="grid-error"')
+                self.assertContains(response, 'value="999"')
+                self.assertContains(response, 'value="17"')
+                self.assertContains(response, "Marks not saved")
+                self.assertEqual(self.saved_marks(), [15])
+
+    def test_unchanged_marks_are_not_written(self):
+        for form in (self.single_form, self.grid_form):
+            with self.subTest(form=form.__name__):
+                url, data = form(["15"] * len(self.students))
+                with self.assertLogs("students", "INFO") as logs:
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.post(url, data)
+
+                self.assertRedirects(response, "/teacher/dashboard/", fetch_redirect_response=False)
+                self.assertIn("created=0 | updated=0", logs.output[-1])
+                writes = [
+                    query["sql"] for query in queries.captured_queries
+                    if "students_studentmarks" in query["sql"]
+                    and not query["sql"].lstrip().upper().startswith("SELECT")
+                ]
+                self.assertEqual(writes, [])
+
+
+class ClassPageCacheTests(ScratchDirsMixin, TestCase):
+    """Every way of editing homework drops the cached class page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+        cls.student = StudentProfile.objects.filter(student_class="7", section="A").first()
+        cls.admin_user = User.objects.create_superuser("admin", password="pw")
+
+    def setUp(self):
+        cache.clear()
+
+    def homework_page(self, student=None):
+        self.client.force_login((student or self.student).user)
+        response = self.client.get("/homework/")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_form_edit(self):
+        self.assertNotIn("Poem", self.homework_page())
+
+        self.client.force_login(self.data["teacher"])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/teacher/homework/add/", {
+                "date": "2026-02-01",
+                "student_class": "7",
+                "section": "A",
+                "subject": "English",
+                "details": "Poem",
+            })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertIn("Poem", self.homework_page())
+
+    def test_admin_edit(self):
+        homework = Homework.objects.filter(student_class="7", section="A").first()
+        self.assertNotIn("Essay", self.homework_page())
+
+        self.client.force_login(self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/admin/students/homework/{homework.pk}/change/", {
+                "date": homework.date.isoformat(),
+                "student_class": "7",
+                "section": "A",
+                "subject": homework.subject,
+                "details": "Essay",
+            })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertIn("Essay", self.homework_page())
+
+    def test_bulk_edits(self):
+        other = StudentProfile.objects.filter(student_class="7", section="B").first()
+        self.assertNotIn("Chart", self.homework_page())
+        self.assertNotIn("Chart", self.homework_page(other))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Homework.objects.bulk_create([
+                Homework(date=date(2026, 2, 2), student_class="7", section="A",
+                         subject="Science", details="Chart"),
+            ])
+        self.assertIn("Chart", self.homework_page())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Homework.objects.filter(details="Chart").update(details="Model")
+        self.assertIn("Model", self.homework_page())
+
+        # Moving rows changes the page they leave and the one they join.
+        with self.captureOnCommitCallbacks(execute=True):
+            Homework.objects.filter(details="Model").update(section="B")
+        self.assertNotIn("Model", self.homework_page())
+        self.assertIn("Model", self.homework_page(other))
+
+        moved = list(Homework.objects.filter(details="Model"))
+        for homework in moved:
+            homework.section = "A"
+        with self.captureOnCommitCallbacks(execute=True):
+            Homework.objects.bulk_update(moved, ["section"])
+        self.assertIn("Model", self.homework_page())
+        self.assertNotIn("Model", self.homework_page(other))
+
+
+class RegisterTests(ScratchDirsMixin, TestCase):
+    """The monthly register is read in one query and totalled per student and day."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school()
+
+    def test_register_totals(self):
+        students = StudentProfile.objects.filter(student_class="7", section="A").order_by("roll_number")
+        with self.assertNumQueries(2):
+            register = monthly_register(students, date(2026, 1, 15))
+
+        self.assertEqual(len(register["rows"]), 10)
+        self.assertEqual(len(register["days"]), 31)
+        for row in register["rows"]:
+            self.assertEqual(row["marks"], ("APPPP" * 4) + "-" * 11)
+            self.assertEqual((row["present"], row["absent"], row["percentage"]), (16, 4, 80.0))
+        self.assertEqual(register["days"][0], {"day": 1, "weekday": "T", "present": 0, "absent": 10})
+        self.assertEqual(register["days"][1]["present"], 10)
+        self.assertEqual(register["days"][30]["present"] + register["days"][30]["absent"], 0)
+        self.assertEqual((register["present"], register["absent"]), (160, 40))
+
+
+class AttendancePageTests(ScratchDirsMixin, TestCase):
+    """The student attendance page pages by date cursors and keeps its filters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = seed_school()["student"]
+        # 70 days in all, from 2026-01-01 to 2026-03-11.
+        upsert_attendance({
+            (cls.student.id, date(2026, 1, 21) + timedelta(days=day)): "Present"
+            for day in range(50)
+        })
+
+    def setUp(self):
+        self.client.force_login(self.student.user)
+
+    def page(self, query=""):
+        response = self.client.get(f"/attendance/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def days(self, context):
+        return [row.date for row in context["attendance"]]
+
+    def test_cursors(self):
+        every_day = [date(2026, 3, 11) - timedelta(days=day) for day in range(70)]
+
+        first = self.page()
+        self.assertEqual(self.days(first), every_day[:31])
+        self.assertTrue(first["is_first_page"])
+        self.assertEqual(first["newer_query"], "")
+        self.assertEqual(first["older_query"], "before=2026-02-09")
+
+        second = self.page(first["older_query"])
+        self.assertEqual(self.days(second), every_day[31:62])
+        self.assertFalse(second["is_first_page"])
+        self.assertEqual(second["newer_query"], "after=2026-02-08")
+
+        last = self.page(second["older_query"])
+        self.assertEqual(self.days(last), every_day[62:])
+        self.assertEqual(last["older_query"], "")
+        self.assertEqual(last["newer_query"], "after=2026-01-08")
+
+        # Back again: a full page newer than the cursor, then the newest one.
+        newer = self.page(last["newer_query"])
+        self.assertEqual(self.days(newer), every_day[31:62])
+        self.assertEqual(newer["older_query"], second["older_query"])
+        newest = self.page(newer["newer_query"])
+        self.assertEqual(self.days(newest), every_day[:31])
+        self.assertTrue(newest["is_first_page"])
+
+    def test_range_filter_is_kept_across_pages(self):
+        first = self.page("from=2026-01-10&to=2026-02-28")
+        self.assertEqual(len(first["attendance"]), 31)
+        # 2026-01-10 and 2026-01-15 are the absent days in the range.
+        self.assertEqual((first["total_days"], first["present_days"], first["absent_days"]), (50, 48, 2))
+        self.assertEqual(first["older_query"], "from=2026-01-10&to=2026-02-28&before=2026-01-29")
+
+        last = self.page(first["older_query"])
+        self.assertEqual(self.days(last)[0], date(2026, 1, 28))
+        self.assertEqual(self.days(last)[-1], date(2026, 1, 10))
+        self.assertEqual(last["older_query"], "")
+        self.assertEqual(last["newer_query"], "from=2026-01-10&to=2026-02-28&after=2026-01-28")
+        self.assertEqual(last["total_days"], 50)
+
+    def test_month_replaces_the_range(self):
+        context = self.page("month=2026-01&from=2026-02-01&to=2026-02-28")
+        self.assertEqual(self.days(context)[0], date(2026, 1, 31))
+        self.assertEqual((context["total_days"], context["present_days"]), (31, 27))
+        self.assertEqual(context["older_query"], "")
+        self.assertEqual((context["date_from"], context["date_to"]), ("", ""))
+
+        # Not a month: ignored, the range applies.
+        context = self.page("month=January&from=2026-02-01&to=2026-02-28")
+        self.assertEqual(context["month"], "")
+        self.assertEqual(context["total_days"], 28)
+
+
+class MonthlyRollupTests(ScratchDirsMixin, TestCase):
+    """Monthly counters follow edits, moves and deletes as a full rebuild would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school()
+        cls.first, cls.second = StudentProfile.objects.filter(
+            student_class="7", section="A"
+        ).order_by("id")[:2]
+
+    def counters(self, student, month):
+        """``(total_days, present_days)`` of one rollup, or None."""
+        return MonthlyAttendance.objects.filter(student=student, month=month).values_list(
+            "total_days", "present_days"
+        ).first()
+
+    def assert_matches_rebuild(self):
+        maintained = attendance_rollups()
+        self.assertEqual(rebuilt_attendance_rollups(), maintained)
+
+    def test_saves(self):
+        january, february = date(2026, 1, 1), date(2026, 2, 1)
+        self.assertEqual(self.counters(self.first, january), (20, 16))
+        row = Attendance.objects.get(student=self.first, date=date(2026, 1, 1))
+
+        row.status = "Present"
+        row.save()
+        self.assertEqual(self.counters(self.first, january), (20, 17))
+        self.assert_matches_rebuild()
+
+        # To another month...
+        row.date = date(2026, 2, 3)
+        row.save()
+        self.assertEqual(self.counters(self.first, january), (19, 16))
+        self.assertEqual(self.counters(self.first, february), (1, 1))
+        self.assert_matches_rebuild()
+
+        # ...to another student...
+        row.student = self.second
+        row.save()
+        self.assertIsNone(self.counters(self.first, february))
+        self.assertEqual(self.counters(self.second, february), (1, 1))
+        self.assert_matches_rebuild()
+
+        # ...and gone.
+        row.delete()
+        self.assertIsNone(self.counters(self.second, february))
+        self.assert_matches_rebuild()
+
+    def test_upserts(self):
+        january, february = date(2026, 1, 1), date(2026, 2, 1)
+
+        written = upsert_attendance({
+            (self.first.id, date(2026, 1, 1)): "Present",
+            (self.second.id, date(2026, 1, 1)): "Absent",
+            (self.first.id, date(2026, 2, 2)): "Absent",
+        })
+        self.assertEqual(written, (1, 1))
+        self.assertEqual(self.counters(self.first, january), (20, 17))
+        self.assertEqual(self.counters(self.second, january), (20, 16))
+        self.assertEqual(self.counters(self.first, february), (1, 0))
+        self.assert_matches_rebuild()
+
+        self.assertEqual(upsert_attendance({(self.first.id, date(2026, 2, 2)): "Present"}), (0, 1))
+        self.assertEqual(self.counters(self.first, february), (1, 1))
+        self.assert_matches_rebuild()
+
+    def test_page_totals_leave_out_hand_entered_months(self):
+        MonthlyAttendance.objects.create(
+            student=self.first, month=date(2025, 12, 1), total_days=20, present_days=15
+        )
+        self.client.force_login(self.first.user)
+        response = self.client.get("/attendance/")
+
+        self.assertEqual(len(response.context["monthly_attendance"]), 2)
+        self.assertEqual((response.context["total_days"], response.context["present_days"]), (20, 16))
+
+
+class ExamResultTests(ScratchDirsMixin, TestCase):
+    """Results follow marks that move to another exam or student, as a rebuild would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school()
+        cls.first, cls.second = StudentProfile.objects.filter(
+            student_class="7", section="A"
+        ).order_by("id")[:2]
+
+    def total(self, student, exam_name):
+        return ExamResult.objects.filter(student=student, exam_name=exam_name).values_list(
+            "total", flat=True
+        ).first()
+
+    def assert_matches_rebuild(self):
+        maintained = exam_results()
+        self.assertEqual(rebuilt_exam_results(), maintained)
+
+    def test_saves_and_delete(self):
+        full = 15 * len(SUBJECTS)
+        self.assertEqual(self.total(self.first, "FA-1"), full)
+        self.assertEqual(self.total(self.first, "SA-1"), 3 * full)
+        row = StudentMarks.objects.get(student=self.first, exam_name="FA-1", subject="Maths")
+
+        # To another exam: FA-1 and the SA-1 built on it lose the marks...
+        row.exam_name = "FA-3"
+        row.save()
+        self.assertEqual(self.total(self.first, "FA-1"), full - 15)
+        self.assertEqual(self.total(self.first, "SA-1"), 3 * full - 15)
+        self.assertEqual(self.total(self.first, "FA-3"), 15)
+        self.assert_matches_rebuild()
+
+        # ...to another student...
+        row.student = self.second
+        row.save()
+        self.assertIsNone(self.total(self.first, "FA-3"))
+        self.assertEqual(self.total(self.second, "FA-3"), 15)
+        self.assert_matches_rebuild()
+
+        # ...and deleted after an unsaved edit: the stored row's result goes.
+        row.student = self.first
+        row.delete()
+        self.assertIsNone(self.total(self.second, "FA-3"))
+        self.assertIsNone(self.total(self.first, "FA-3"))
+        self.assert_matches_rebuild()
+
+
+class DailyRollupTests(ScratchDirsMixin, TestCase):
+    """Class-section day counters follow every kind of attendance write."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school()
+
+    def counters(self, day, student_class="7", section="A"):
+        return DailyAttendanceRollup.objects.filter(
+            date=day, student_class=student_class, section=section
+        ).values_list("present", "absent", "total").first()
+
+    def rollup_rows(self):
+        return list(DailyAttendanceRollup.objects.order_by(
+            "date", "student_class", "section"
+        ).values_list("date", "student_class", "section", "present", "absent", "total"))
+
+    def test_rollups_follow_writes(self):
+        day = date(2026, 1, 1)
+        self.assertEqual(self.counters(day), (0, 10, 10))
+
+        row = Attendance.objects.filter(
+            date=day, student__student_class="7", student__section="A"
+        ).first()
+        row.status = "Present"
+        row.save()
+        self.assertEqual(self.counters(day), (1, 9, 10))
+
+        row.delete()
+        self.assertEqual(self.counters(day), (0, 9, 9))
+
+        maintained = self.rollup_rows()
+        DailyAttendanceRollup.objects.all().delete()
+        rebuild_daily_attendance()
+        self.assertEqual(self.rollup_rows(), maintained)
+
+    def test_rollups_follow_a_student_to_another_class_this_term(self):
+        term = term_start()
+        last_term = term - timedelta(days=1)
+        student = StudentProfile.objects.filter(student_class="7", section="A").first()
+        upsert_attendance({
+            (student.id, last_term): "Present",
+            (student.id, term): "Present",
+        })
+        earlier = [row for row in self.rollup_rows() if row[0] < term]
+
+        student.section = "B"
+        student.save()
+
+        self.assertEqual(self.counters(term, "7", "A"), None)
+        self.assertEqual(self.counters(term, "7", "B"), (1, 0, 1))
+        # Earlier terms keep the class-section the student was in then.
+        self.assertEqual(self.counters(last_term, "7", "A"), (1, 0, 1))
+        self.assertEqual([row for row in self.rollup_rows() if row[0] < term], earlier)
+
+        maintained = self.rollup_rows()
+        DailyAttendanceRollup.objects.filter(date__gte=term).delete()
+        rebuild_daily_attendance(start=term)
+        self.assertEqual(self.rollup_rows(), maintained)
+
+    def test_term_start(self):
+        self.assertEqual(term_start(date(2026, 5, 31)), date(2025, 6, 1))
+        self.assertEqual(term_start(date(2026, 6, 1)), date(2026, 6, 1))
+        self.assertEqual(term_start(date(2026, 12, 31)), date(2026, 6, 1))
+
+    def test_rollups_are_read_only_in_the_admin(self):
+        admin_user = User.objects.create_superuser("admin", password="pw")
+        self.client.force_login(admin_user)
+        rollup = DailyAttendanceRollup.objects.first()
+
+        self.assertEqual(self.client.get("/admin/students/dailyattendancerollup/add/").status_code, 403)
+        self.client.post(
+            f"/admin/students/dailyattendancerollup/{rollup.pk}/change/",
+            {"date": "2026-01-01", "student_class": "7", "section": "A",
+             "present": 99, "absent": 0, "total": 99},
+        )
+        rollup.refresh_from_db()
+        self.assertNotEqual(rollup.present, 99)
+
+    def test_trends_read_only_the_rollups(self):
+        with self.assertNumQueries(1):
+            trends = attendance_trends(date(2026, 1, 1), date(2026, 1, 31))
+
+        self.assertEqual(len(trends["days"]), 20)
+        self.assertEqual(len(trends["sections"]), 6)
+        self.assertEqual(trends["days"][0]["percentage"], 0.0)
+        self.assertEqual(trends["percentage"], 80.0)
+        self.assertEqual(trends["sections"][0]["lowest_date"], date(2026, 1, 1))
+
+
+class SessionWriteTests(ScratchDirsMixin, TestCase):
+    """A session whose data did not change is not written back."""
+
+    def test_unchanged_session_is_not_saved(self):
+        session = SessionStore()
+        session["theme"] = "dark"
+        session.create()
+
+        session = SessionStore(session.session_key)
+        session["theme"] = "dark"
+        self.assertTrue(session.modified)
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(len(queries), 0)
+
+        session["theme"] = "light"
+        session.save()
+        self.assertEqual(SessionStore(session.session_key)["theme"], "light")
+
+
+class RoleCacheTests(ScratchDirsMixin, TestCase):
+    """Roles are resolved once per session and again after a committed change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name="Teacher")
+        cls.user = User.objects.create_user("teacher", password="pw")
+        cls.user.groups.add(cls.group)
+        TeacherProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_dashboard(self):
+        """The response and the group lookups it made."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/teacher/dashboard/")
+        lookups = [
+            query["sql"] for query in queries.captured_queries
+            if "auth_user_groups" in query["sql"]
+        ]
+        return response, lookups
+
+    def test_roles_are_kept_in_the_session(self):
+        response, lookups = self.get_dashboard()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(lookups), 1)
+
+        response, lookups = self.get_dashboard()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups, [])
+
+    def test_group_change_invalidates_after_commit(self):
+        self.assertEqual(self.get_dashboard()[0].status_code, 200)
+        before = stamps.current(ROLES_STAMP)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.groups.remove(self.group)
+            # Until the change commits other workers would only re-read
+            # the old groups.
+            self.assertEqual(stamps.current(ROLES_STAMP), before)
+            self.assertEqual(self.get_dashboard()[0].status_code, 200)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(stamps.current(ROLES_STAMP), before)
+
+        response, lookups = self.get_dashboard()
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        self.assertEqual(len(lookups), 1)
+
+
+class ExportTests(ScratchDirsMixin, TestCase):
+    """Exports stream every matching row, as CSV or as a workbook."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school()
+
+    def setUp(self):
+        self.client.force_login(self.school["teacher"])
+
+    def download(self, **params):
+        response = self.client.get("/teacher/export/", params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_has_one_row_per_record(self):
+        content = self.download(kind="attendance", format="csv", **{"class": "7", "section": "B"})
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig"))))
+
+        self.assertEqual(rows[0], ["class", "section", "roll_number", "name", "date", "status"])
+        self.assertEqual(len(rows) - 1, 10 * 20)
+        self.assertEqual({(row[0], row[1]) for row in rows[1:]}, {("7", "B")})
+
+    def test_xlsx_is_a_workbook(self):
+        content = self.download(kind="marks", format="xlsx", exam_name="SA-1")
+
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 1 + 60 * len(SUBJECTS))
+
+
+class ReceiptTests(ScratchDirsMixin, TestCase):
+    """Receipts revalidate with their ETag, and only for the parent's own child."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+        other_child = StudentProfile.objects.exclude(pk=cls.data["student"].pk).first()
+        cls.other_parent = User.objects.create_user("other-parent", password="pw")
+        cls.other_parent.groups.add(Group.objects.get(name="Parent"))
+        ParentProfile.objects.create(user=cls.other_parent, student=other_child)
+
+    def setUp(self):
+        self.client.force_login(self.data["parent"])
+        self.url = f"/parent/receipt/{self.data['payment'].pk}/"
+
+    def test_repeat_request_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        ledger = [q["sql"] for q in queries.captured_queries if "paymenttransaction" in q["sql"]]
+        self.assertEqual(ledger, [])
+
+    def test_new_payment_has_its_own_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        payment = record_payment(self.data["student"], 100, 2000)
+        url = f"/parent/receipt/{payment.pk}/"
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, payment.payment_id)
+
+    def test_other_parents_get_not_found_before_any_etag_match(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.client.force_login(self.other_parent)
+        for header in (None, etag, "*"):
+            with self.subTest(if_none_match=header):
+                extra = {"HTTP_IF_NONE_MATCH": header} if header else {}
+                response = self.client.get(self.url, **extra)
+                self.assertEqual(response.status_code, 404)
+
+
+class RefDataTests(ScratchDirsMixin, TestCase):
+    """The parent dashboard reads exam fees from memory, however many there are."""
+
+    url = "/parent/dashboard/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_school()
+
+    def setUp(self):
+        self.client.force_login(self.data["parent"])
+
+    def dashboard_queries(self):
+        """SQL run by a dashboard view once the caches are warm."""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q["sql"] for q in queries.captured_queries]
+
+    def test_query_count_does_not_grow_with_the_class_or_fees(self):
+        response, before = self.dashboard_queries()
+        self.assertContains(response, "₹ 2000")
+        self.assertFalse([sql for sql in before if "students_examfee" in sql])
+
+        student = self.data["student"]
+        for roll in range(11, 31):
+            StudentProfile.objects.create(
+                user=User.objects.create_user(f"s7A{roll}", password="pw"),
+                roll_number=str(roll),
+                student_class=student.student_class,
+                section=student.section,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            for class_name, _ in CLASS_CHOICES:
+                ExamFee.objects.update_or_create(class_name=class_name, defaults={"amount": 2500})
+
+        self.client.get(self.url)
+        with self.assertNumQueries(len(before)):
+            response = self.client.get(self.url)
+        self.assertContains(response, "₹ 2500")
+
+
+class ImportRecordsTests(ScratchDirsMixin, TestCase):
+    """
+    import_records writes the valid rows of a mixed file, lists the others
+    with a reason, and leaves the rollups as a full rebuild would.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school()
+        cls.students = {
+            student.roll_number: student
+            for student in StudentProfile.objects.filter(student_class="7", section="A")
+        }
+
+    def import_csv(self, kind, lines):
+        path = os.path.join(self.scratch.name, f"{kind}.csv")
+        with open(path, "w", newline="") as f:
+            f.write("\n".join(lines) + "\n")
+        call_command("import_records", kind, path, stdout=io.StringIO())
+        with open(f"{path}.rejects.csv", newline="") as f:
+            return [(row["line"], row["error"]) for row in csv.DictReader(f)]
+
+    def test_attendance(self):
+        rejects = self.import_csv("attendance", [
+            "class,section,roll_number,date,status",
+            "7,A,1,2026-02-02,P",
+            "7,a,2,02/02/2026,absent",
+            "7,A,3,2026-01-01,Present",
+            "7,A,99,2026-02-02,P",
+            "7,A,4,2026-02-31,P",
+            "7,A,5,2026-02-02,Late",
+        ])
+
+        self.assertEqual(rejects, [
+            ("5", "Unknown student"),
+            ("6", "Bad date"),
+            ("7", "Status must be Present or Absent"),
+        ])
+        statuses = dict(Attendance.objects.filter(
+            student__in=self.students.values(), date=date(2026, 2, 2)
+        ).values_list("student__roll_number", "status"))
+        self.assertEqual(statuses, {"1": "Present", "2": "Absent"})
+        self.assertEqual(
+            Attendance.objects.get(student=self.students["3"], date=date(2026, 1, 1)).status,
+            "Present"
+        )
+
+        self.assertEqual(
+            MonthlyAttendance.objects.filter(student=self.students["2"], month=date(2026, 2, 1))
+            .values_list("total_days", "present_days").get(),
+            (1, 0)
+        )
+        self.assertEqual(
+            DailyAttendanceRollup.objects.filter(date=date(2026, 2, 2), student_class="7", section="A")
+            .values_list("present", "absent").get(),
+            (1, 1)
+        )
+        maintained = attendance_rollups()
+        self.assertEqual(rebuilt_attendance_rollups(), maintained)
+
+    def test_marks(self):
+        rejects = self.import_csv("marks", [
+            "class,section,roll_number,exam_name,subject,marks",
+            "7,A,1,FA-1,Maths,18",
+            "7,A,1,sa-2,Maths,80",
+            "7,A,2,FA-1,Maths,25",
+            "7,A,2,FA-1,,10",
+            "7,A,3,FA-9,Maths,10",
+        ])
+
+        self.assertEqual(rejects, [
+            ("4", "Must be between 0 and 20"),
+            ("5", "Missing subject"),
+            ("6", "Unknown exam FA-9"),
+        ])
+        marks = StudentMarks.objects.filter(student__in=self.students.values(), subject="Maths")
+        self.assertEqual(marks.get(student=self.students["1"], exam_name="FA-1").marks, 18)
+        self.assertEqual(marks.get(student=self.students["1"], exam_name="SA-2").marks, 80)
+        self.assertEqual(marks.get(student=self.students["2"], exam_name="FA-1").marks, 15)
+
+        result = ExamResult.objects.get(student=self.students["1"], exam_name="FA-1")
+        self.assertEqual(result.total, 15 * (len(SUBJECTS) - 1) + 18)
+
+        maintained = exam_results()
+        self.assertEqual(rebuilt_exam_results(), maintained)
+
+
+class PaymentLedgerTests(ScratchDirsMixin, TransactionTestCase):
+    """Parallel payments must neither lose money nor overpay the fee."""
+
+    THREADS = 12
+
+    def setUp(self):
+        user = User.objects.create_user("ledger", password="pw")
+        self.student = StudentProfile.objects.create(
+            user=user,
+            roll_number="1",
+            student_class="7",
+            section="A",
+        )
+
+    def pay_in_parallel(self, amount, total_fee, idempotency_key=None):
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def pay(n):
+            try:
+                start.wait()
+                record_payment(self.student, amount, total_fee, idempotency_key=idempotency_key)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=pay, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_payments_add_up(self):
+        self.pay_in_parallel(100, total_fee=10000)
+
+        payment = ExamPayment.objects.get(student=self.student)
+        self.assertEqual(payment.amount, 100 * self.THREADS)
+
+        balances = sorted(
+            self.student.payment_transactions.values_list("balance_after", flat=True)
+        )
+        self.assertEqual(balances, [100 * n for n in range(1, self.THREADS + 1)])
+
+    def test_parallel_payments_stop_at_the_fee(self):
+        self.pay_in_parallel(300, total_fee=1000)
+
+        payment = ExamPayment.objects.get(student=self.student)
+        self.assertEqual(payment.amount, 1000)
+        self.assertEqual(payment.status, "Paid")
+
+        amounts = list(
+            self.student.payment_transactions.order_by("id").values_list("amount", "balance_after")
+        )
+        self.assertEqual(amounts, [(300, 300), (300, 600), (300, 900), (100, 1000)])
+
+    def test_parallel_resubmissions_pay_once(self):
+        self.pay_in_parallel(100, total_fee=10000, idempotency_key="a" * 32)
+
+        self.assertEqual(ExamPayment.objects.get(student=self.student).amount, 100)
+        self.assertEqual(self.student.payment_transactions.count(), 1)
+
+        replay = record_payment(self.student, 100, 10000, idempotency_key="a" * 32)
+        self.assertEqual(replay.balance_after, 100)
+        self.assertEqual(self.student.payment_transactions.count(), 1)
+
+    def test_payment_ids_are_unique_and_increasing(self):
+        self.pay_in_parallel(100, total_fee=10000)
+        ids = self.student.payment_transactions.values_list("payment_id", flat=True)
+        self.assertEqual(len(set(ids)), self.THREADS)
+
+        generated = [[] for _ in range(self.THREADS)]
+
+        def generate(n):
+            generated[n].extend(new_payment_id() for _ in range(1000))
+
+        threads = [threading.Thread(target=generate, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for ids in generated:
+            self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(len({i for ids in generated for i in ids}), 1000 * self.THREADS)
+
+    def test_transactions_are_immutable(self):
+        txn = record_payment(self.student, 100, 1000, payment_id="T-1")
+        txn.amount = 50
+        with self.assertRaises(ValueError):
+            txn.save()
+
+
+class AttendanceWriteTests(ScratchDirsMixin, TransactionTestCase):
+    """Registers saved at the same time must all land, rollups included."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.students = []
+        for roll in range(1, 6):
+            user = User.objects.create_user(f"register{roll}", password="pw")
+            self.students.append(StudentProfile.objects.create(
+                user=user,
+                roll_number=str(roll),
+                student_class="7",
+                section="A",
+            ))
+
+    def test_parallel_registers(self):
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def save(n):
+            try:
+                start.wait()
+                save_attendance_register(
+                    date(2026, 1, 1) + timedelta(days=n),
+                    {student.id: "Present" if n % 2 else "Absent" for student in self.students},
+                )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=save, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Attendance.objects.count(), self.THREADS * len(self.students))
+        self.assertEqual(MonthlyAttendance.objects.count(), len(self.students))
+        for rollup in MonthlyAttendance.objects.all():
+            self.assertEqual(rollup.total_days, self.THREADS)
+            self.assertEqual(rollup.present_days, self.THREADS // 2)
+
+
+class SchoolRegisterTests(ScratchDirsMixin, TestCase):
+    """The admin school register stays under the POST field limit at scale."""
+
+    CLASSES = ("8", "9", "10")
+    PER_SECTION = 113
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser("principal", password="pw")
+        places = {
+            f"big{student_class}{section}-{roll}": (student_class, section, str(roll))
+            for student_class in cls.CLASSES
+            for section in ("A", "B", "C")
+            for roll in range(1, cls.PER_SECTION + 1)
+        }
+        User.objects.bulk_create(User(username=name, password="!") for name in places)
+        StudentProfile.objects.bulk_create(
+            StudentProfile(
+                user_id=user_id,
+                student_class=places[username][0],
+                section=places[username][1],
+                roll_number=places[username][2],
+            )
+            for user_id, username in User.objects.filter(
+                username__in=places
+            ).values_list("id", "username")
+        )
+
+    def test_whole_school_is_saved_a_class_section_at_a_time(self):
+        total = StudentProfile.objects.count()
+        self.assertGreater(total, settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+        self.client.force_login(self.admin_user)
+
+        url = "/admin/students/attendance/school-register/?date=2026-02-02"
+        pages = 0
+        while "school-register" in url:
+            page = self.client.get(url)
+            self.assertEqual(page.status_code, 200)
+            student_class, section = page.context["current"]
+            data = {"date": "2026-02-02", "class": student_class, "section": section}
+            for student in page.context["students"]:
+                data[f"status_{student.id}"] = "Absent" if student.roll_number == "1" else "Present"
+            self.assertLess(len(data), settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+
+            response = self.client.post("/admin/students/attendance/school-register/", data)
+            self.assertEqual(response.status_code, 302)
+            url = response["Location"]
+            pages += 1
+
+        self.assertEqual(pages, len(self.CLASSES) * 3)
+        self.assertEqual(Attendance.objects.filter(date=date(2026, 2, 2)).count(), total)
+        self.assertEqual(
+            Attendance.objects.filter(date=date(2026, 2, 2), status="Absent").count(),
+            pages
+        )
+
+
+class AsyncUrls:
+    """The site with the async pages routed in, as DJANGO_ASYNC_VIEWS=True does."""
+
+    urlpatterns = [
+        path("admin/", admin.site.urls),
+        path("", include([
+            path(
+                str(pattern.pattern),
+                getattr(async_views, pattern.callback.__name__, pattern.callback),
+                name=pattern.name,
+            )
+            for pattern in student_urls.urlpatterns
+        ])),
+    ]
+
+
+class AsyncViewTests(ScratchDirsMixin, TransactionTestCase):
+    """The async pages render what the sync ones do, via the async middleware."""
+
+    def setUp(self):
+        self.data = seed_school()
+
+    def assert_same_pages(self, user, urls):
+        sync_client = Client()
+        sync_client.force_login(user)
+        async_client = AsyncClient()
+        async_client.force_login(user)
+
+        for url in urls:
+            with self.subTest(url=url):
+                expected = sync_client.get(url)
+                with override_settings(ROOT_URLCONF=AsyncUrls):
+                    response = async_to_sync(async_client.get)(url)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header("X-Request-ID"))
+                # Cached fragments rendered by the sync request are reused.
+                rendered = {t.name for t in response.templates}
+                self.assertTrue(rendered)
+                self.assertLessEqual(rendered, {t.name for t in expected.templates})
+
+    def test_student_pages(self):
+        self.assert_same_pages(self.data["student"].user, (
+            "/attendance/",
+            "/homework/",
+            "/exam-timetable/",
+            "/marks/SA-1/",
+        ))
+
+    def test_parent_dashboard(self):
+        self.assert_same_pages(self.data["parent"], ("/parent/dashboard/",))
+
+    def test_sync_view_queries_are_counted(self):
+        # Start from connections nobody has watched yet, as in a fresh
+        # ASGI worker thread.
+        for conn in connections.all():
+            while metrics.time_query in conn.execute_wrappers:
+                conn.execute_wrappers.remove(metrics.time_query)
+
+        key = ("students_db_queries_total", ("teacher_marks_grid",))
+        before = metrics.registry.counters.get(key, 0)
+
+        client = AsyncClient()
+        client.force_login(self.data["teacher"])
+        response = async_to_sync(client.get)(
+            "/teacher/marks/grid/?load=1&class=7&section=A&exam_name=SA-1"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(metrics.registry.counters.get(key, 0), before)
+
+
+def png_upload(name, size, mode="RGBA"):
+    """A small in-memory image upload."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageVariantTests(ScratchDirsMixin, TestCase):
+    """Resized copies of about page images, their markup and the backfill command."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.media = media.name
+
+    def variant_files(self):
+        directory = os.path.join(self.media, VARIANT_DIR)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def build(self, *args):
+        out = io.StringIO()
+        call_command("build_image_variants", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_variants(self):
+        self.assertEqual(variant_widths(200), [200])
+        self.assertEqual(variant_widths(1000), [320, 640, 960])
+
+        about = AboutImage.objects.create(title="Hall", image=png_upload("hall.png", (1000, 500)))
+        self.assertEqual(generate_variants(about.pk), 6)
+
+        about.refresh_from_db()
+        self.assertEqual((about.width, about.height), (1000, 500))
+        self.assertEqual(
+            sorted((v["format"], v["width"], v["height"]) for v in about.variants),
+            [(fmt, w, w // 2) for fmt in ("jpeg", "webp") for w in (320, 640, 960)]
+        )
+        for variant in about.variants:
+            with Image.open(os.path.join(self.media, variant["name"])) as copy:
+                self.assertEqual(copy.format, FORMATS[variant["format"]][0])
+                self.assertEqual(copy.size, (variant["width"], variant["height"]))
+                # Transparent PNGs are flattened: JPEG has no alpha.
+                self.assertEqual(copy.mode, "RGB")
+
+    def test_srcset_markup(self):
+        about = AboutImage.objects.create(title="Hall", image=png_upload("hall.png", (1000, 500)))
+        html = self.client.get("/about/").content.decode()
+        self.assertIn(f'src="{about.image.url}"', html)
+        self.assertNotIn("srcset", html)
+
+        generate_variants(about.pk)
+        html = self.client.get("/about/").content.decode()
+        prefix = f"/media/{VARIANT_DIR}/{about.pk}-hall"
+        self.assertIn(
+            f'<source type="image/webp" srcset="{prefix}-320.webp 320w, '
+            f'{prefix}-640.webp 640w, {prefix}-960.webp 960w"',
+            html
+        )
+        self.assertIn(f'src="{prefix}-960.jpg"', html)
+        self.assertIn(f'srcset="{prefix}-320.jpg 320w, {prefix}-640.jpg 640w, {prefix}-960.jpg 960w"', html)
+        self.assertIn('width="1000" height="500"', html)
+
+    def test_backfill_is_idempotent(self):
+        AboutImage.objects.create(title="Hall", image=png_upload("hall.png", (800, 600)))
+        AboutImage.objects.create(title="Logo", image=png_upload("logo.png", (100, 100), mode="RGB"))
+
+        self.assertIn("Built copies for 2 of 2 images", self.build())
+        variants = list(AboutImage.objects.order_by("id").values_list("variants", flat=True))
+        files = self.variant_files()
+        self.assertEqual(len(files), 2 * 2 + 2)
+
+        self.assertEqual(self.build().strip(), "Nothing to build.")
+        # --all writes the same files again instead of adding renamed ones.
+        self.assertIn("Built copies for 2 of 2 images", self.build("--all"))
+        self.assertEqual(list(AboutImage.objects.order_by("id").values_list("variants", flat=True)), variants)
+        self.assertEqual(self.variant_files(), files)
+
+
+class ListHandler(logging.Handler):
+    """Keeps the records it is given."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def log_record(msg, *args, **extra):
+    return logging.makeLogRecord({
+        "name": "students",
+        "levelname": "INFO",
+        "levelno": logging.INFO,
+        "msg": msg,
+        "args": args,
+        **extra,
+    })
+
+
+class LoggingTests(ScratchDirsMixin, TestCase):
+    """The async logging pipeline: record context, JSON lines, rotation and the queue."""
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.log_dir.cleanup)
+        self.path = os.path.join(self.log_dir.name, "school.jsonl")
+
+    def file_handler(self, **kwargs):
+        handler = GzipRotatingFileHandler(self.path, **kwargs)
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+        return handler
+
+    def lines(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            return [json.loads(line)["message"] for line in f]
+
+    def test_context_filter_copies_the_current_request(self):
+        record = log_record("Saved")
+        ContextFilter().filter(record)
+        self.assertEqual(
+            (record.request_id, record.user, record.view, record.duration_ms),
+            (None, None, None, None)
+        )
+
+        request = RequestFactory().get("/attendance/")
+        request.request_id = "abc"
+        request._cached_user = User(username="teacher")
+        request.resolver_match = resolve("/attendance/")
+        token = current_request.set(request)
+        try:
+            record = log_record("Saved", duration_ms=12.5)
+            ContextFilter().filter(record)
+        finally:
+            current_request.reset(token)
+        self.assertEqual(
+            (record.request_id, record.user, record.view, record.duration_ms),
+            ("abc", "teacher", "attendance", 12.5)
+        )
+
+    def test_json_formatter(self):
+        record = log_record("Marks saved | exam=%s", "FA-1", request_id="abc", user=None)
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data["message"], "Marks saved | exam=FA-1")
+        self.assertEqual((data["level"], data["logger"], data["request_id"]), ("INFO", "students", "abc"))
+        self.assertNotIn("user", data)
+
+        try:
+            raise ValueError("bad row")
+        except ValueError:
+            record = log_record("Import failed", exc_info=sys.exc_info())
+        data = json.loads(JsonFormatter().format(record))
+        self.assertIn("ValueError: bad row", data["exception"])
+
+    def test_rotates_by_size_into_gzip_files(self):
+        handler = self.file_handler(maxBytes=200, backupCount=2, daily=False)
+        for i in range(20):
+            handler.handle(log_record("line %s", i))
+        handler.close()
+
+        newest = self.lines(f"{self.path}.1.gz")
+        older = self.lines(f"{self.path}.2.gz")
+        current = self.lines(self.path)
+        self.assertFalse(os.path.exists(f"{self.path}.3.gz"))
+        # The newest lines survive, oldest first across the files.
+        kept = older + newest + current
+        self.assertEqual(kept, [f"line {i}" for i in range(20 - len(kept), 20)])
+
+    def test_rotates_at_midnight(self):
+        handler = self.file_handler(backupCount=2, daily=True)
+        handler.handle(log_record("yesterday"))
+        handler.rollover_at = time.time() - 1
+        handler.handle(log_record("today"))
+        handler.close()
+
+        self.assertEqual(self.lines(f"{self.path}.1.gz"), ["yesterday"])
+        self.assertEqual(self.lines(self.path), ["today"])
+        self.assertGreater(handler.rollover_at, time.time())
+
+    def test_a_file_from_an_earlier_day_rotates_first(self):
+        with open(self.path, "w") as f:
+            f.write(json.dumps({"message": "old"}) + "\n")
+        two_days_ago = time.time() - 2 * 86400
+        os.utime(self.path, (two_days_ago, two_days_ago))
+
+        handler = self.file_handler(backupCount=2, daily=True)
+        handler.handle(log_record("new"))
+        handler.close()
+        self.assertEqual(self.lines(f"{self.path}.1.gz"), ["old"])
+        self.assertEqual(self.lines(self.path), ["new"])
+
+    def test_a_worker_reopens_a_file_another_one_rotated(self):
+        first = self.file_handler(maxBytes=10_000, backupCount=3, daily=False)
+        second = self.file_handler(maxBytes=10_000, backupCount=3, daily=False)
+        first.handle(log_record("one"))
+        second.handle(log_record("two"))
+
+        first.doRollover()
+        self.assertTrue(second.rotated_elsewhere())
+        second.doRollover()
+        self.assertFalse(second.rotated_elsewhere())
+        second.handle(log_record("three"))
+        first.close()
+        second.close()
+
+        self.assertEqual(self.lines(f"{self.path}.1.gz"), ["one", "two"])
+        self.assertFalse(os.path.exists(f"{self.path}.2.gz"))
+        self.assertEqual(self.lines(self.path), ["three"])
+
+    def test_background_handler_delivers_and_counts_drops(self):
+        target = ListHandler()
+        handler = BackgroundHandler([target], queue_size=1)
+        handler.handle(log_record("Paid | amount=%s", 500))
+        handler.close()
+        self.assertEqual([r.getMessage() for r in target.records], ["Paid | amount=500"])
+
+        target = ListHandler()
+        handler = BackgroundHandler([target], queue_size=1)
+        # With the listener stopped nothing drains the queue.
+        handler.listener.stop()
+        for i in range(3):
+            handler.handle(log_record("line %s", i))
+        self.assertEqual(handler.dropped, 2)
+        handler.close()
+
+    def test_request_ids(self):
+        handler = ListHandler()
+        handler.addFilter(ContextFilter())
+        logger = logging.getLogger("students.requests")
+        level = logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        try:
+            response = self.client.get("/login/", HTTP_X_REQUEST_ID="abc-123.x_Y")
+            self.assertEqual(response["X-Request-ID"], "abc-123.x_Y")
+            for header in ("bad id!", "x" * 65, "a\nb"):
+                with self.subTest(header=header):
+                    response = self.client.get("/login/", HTTP_X_REQUEST_ID=header)
+                    self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+
+        self.assertIsNone(current_request.get())
+        record = handler.records[0]
+        self.assertEqual((record.request_id, record.view), ("abc-123.x_Y", "login"))
+        self.assertIn("status=200", record.getMessage())
+        self.assertIsInstance(record.duration_ms, float)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            build_logging_config("verbose", "school.log", "school.jsonl")
+
+
+class MetricsFileTests(ScratchDirsMixin, TestCase):
+    """Every worker's flushed counts add up, and stay added up after it exits."""
+
+    KEY = ("students_http_requests_total", ("metrics_test", "GET", "200"))
+
+    def setUp(self):
+        shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+
+    def count(self):
+        counters, histograms = metrics.merged_snapshot()
+        return counters.get(self.KEY, 0)
+
+    def run_worker(self, requests):
+        """Count ``requests`` in a forked worker that flushes and exits."""
+        def work():
+            metrics.registry.inc(*self.KEY, requests)
+            metrics.registry.flush(force=True)
+
+        worker = multiprocessing.get_context("fork").Process(target=work)
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+
+    def write_worker_file(self, pid, start, requests):
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f"metrics-{pid}-{start}.json")
+        with open(path, "w") as f:
+            json.dump({"counters": [[self.KEY[0], list(self.KEY[1]), requests]], "histograms": []}, f)
+
+    def worker_files(self):
+        return sorted(name for name in os.listdir(settings.METRICS_DIR) if name.startswith("metrics-"))
+
+    def test_exited_workers_are_folded_into_the_archive(self):
+        self.run_worker(3)
+        self.run_worker(4)
+        self.assertEqual(len(self.worker_files()), 2)
+
+        self.assertEqual(self.count(), 7)
+        self.assertEqual(self.worker_files(), [])
+        self.assertEqual(self.count(), 7)
+
+        self.run_worker(5)
+        self.assertEqual(self.count(), 12)
+        self.assertEqual(self.worker_files(), [])
+
+    def test_a_reused_pid_does_not_shrink_the_counts(self):
+        # A live process standing in for two workers that had the same pid.
+        pid = os.getppid()
+        self.write_worker_file(pid, 1, 10)
+        self.write_worker_file(pid, 2, 3)
+
+        self.assertEqual(self.count(), 13)
+        self.assertEqual(self.worker_files(), [f"metrics-{pid}-2.json"])
+
+        # The live worker's later flush replaces only its own file.
+        self.write_worker_file(pid, 2, 5)
+        self.assertEqual(self.count(), 15)
+
+
+class ReplicaTests(ScratchDirsMixin, TestCase):
+    """The reporting replica and what the test run must not do to it."""
+
+    def report_request(self, session):
+        request = RequestFactory().get("/teacher/results/")
+        request.session = session
+        return request
+
+    def test_router_keeps_the_replica_read_only(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(StudentMarks), "default")
+        self.assertTrue(router.allow_migrate("default", "students"))
+        self.assertFalse(router.allow_migrate("replica", "students"))
+
+    def test_disabled_replica_is_never_read(self):
+        stamps.bump(REPLICA_STAMP)
+        self.assertEqual(reporting_alias(self.report_request({})), "default")
+
+    @override_settings(REPLICA_ENABLED=True)
+    def test_stale_snapshot_falls_back_to_the_primary(self):
+        request = self.report_request({})
+        stamps.bump(REPLICA_STAMP)
+        self.assertEqual(reporting_alias(request), "replica")
+
+        with override_settings(REPLICA_MAX_STALENESS=-1):
+            self.assertEqual(reporting_alias(request), "default")
+
+    @override_settings(REPLICA_ENABLED=True)
+    def test_users_read_their_own_writes(self):
+        teacher = User.objects.create_user("teacher", password="pw")
+        teacher.groups.add(Group.objects.create(name="Teacher"))
+        TeacherProfile.objects.create(user=teacher)
+        self.client.force_login(teacher)
+
+        stamps.bump(REPLICA_STAMP)
+        response = self.client.post("/teacher/marks/grid/", {"class": "7", "section": "A", "exam_name": "FA-1"})
+        self.assertEqual(response.status_code, 302)
+
+        # The snapshot predates the write...
+        request = self.report_request(self.client.session)
+        self.assertEqual(reporting_alias(request), "default")
+        # ...until the next one is taken.
+        stamps.bump(REPLICA_STAMP)
+        self.assertEqual(reporting_alias(request), "replica")
+
+    @override_settings(REPLICA_ENABLED=True)
+    def test_test_database_never_reaches_the_replica(self):
+        replica = settings.DATABASES["replica"]["NAME"]
+        before = os.stat(replica).st_mtime_ns if os.path.exists(replica) else None
+
+        self.assertFalse(replica_configured())
+        self.assertFalse(refresh_replica())
+        post_migrate.send(
+            sender=apps.get_app_config("students"),
+            app_config=apps.get_app_config("students"),
+            verbosity=0,
+            interactive=False,
+            using="default",
+            apps=apps,
+            plan=[(None, False)],
+        )
+
+        after = os.stat(replica).st_mtime_ns if os.path.exists(replica) else None
+        self.assertEqual(before, after)
+        self.assertFalse(os.path.exists(settings.BASE_DIR / connection.settings_dict["NAME"]))
@@ -0,0 +1,113 @@
+"""
+School-wide attendance trends for the staff dashboard.
+
+Everything is read from DailyAttendanceRollup (one row per class-section
+per day), never from Attendance, so the cost follows days x sections and
+not the number of students. Charts are SVG polylines built here and drawn
+by the template.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+
+from .models import CLASS_CHOICES, DailyAttendanceRollup
+
+
+# Default range: this many days up to the latest day with attendance.
+DEFAULT_DAYS = 90
+
+CHART_WIDTH = 640
+CHART_HEIGHT = 200
+SPARK_WIDTH = 160
+SPARK_HEIGHT = 32
+
+CLASS_ORDER = {value: index for index, (value, _) in enumerate(CLASS_CHOICES)}
+
+
+def percentage(present, total):
+    return round(present * 100 / total, 1) if total else None
+
+
+def polyline(values, width, height):
+    """SVG ``points`` for percentages spread evenly across ``width``."""
+    if not values:
+        return ""
+    step = width / (len(values) - 1) if len(values) > 1 else 0
+    return " ".join(
+        f"{index * step:.1f},{height - value * height / 100:.1f}"
+        for index, value in enumerate(values)
+    )
+
+
+def default_range(using=DEFAULT_DB_ALIAS):
+    """``(start, end)`` of the last DEFAULT_DAYS days with any rollup, or None."""
+    end = DailyAttendanceRollup.objects.using(using).aggregate(end=Max("date"))["end"]
+    if end is None:
+        return None
+    return end - timedelta(days=DEFAULT_DAYS - 1), end
+
+
+def attendance_trends(start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Daily school-wide attendance and a summary per class-section between
+    ``start`` and ``end`` (inclusive), in one query over the rollups.
+    """
+    rows = DailyAttendanceRollup.objects.using(using).filter(
+        date__gte=start,
+        date__lte=end
+    ).order_by("date").values_list("date", "student_class", "section", "present", "total")
+
+    school = {}
+    sections = defaultdict(list)
+    for day, student_class, section, present, total in rows:
+        day_present, day_total = school.get(day, (0, 0))
+        school[day] = (day_present + present, day_total + total)
+        sections[(student_class, section)].append((day, present, total))
+
+    days = [
+        {"date": day, "present": present, "total": total, "percentage": percentage(present, total)}
+        for day, (present, total) in school.items()
+    ]
+
+    summaries = []
+    for (student_class, section), series in sorted(
+        sections.items(),
+        key=lambda item: (CLASS_ORDER.get(item[0][0], len(CLASS_ORDER)), item[0][1])
+    ):
+        present = sum(p for _, p, _ in series)
+        total = sum(t for _, _, t in series)
+        daily = [percentage(p, t) or 0 for _, p, t in series]
+        lowest = min(range(len(series)), key=daily.__getitem__)
+        summaries.append({
+            "student_class": student_class,
+            "section": section,
+            "days": len(series),
+            "percentage": percentage(present, total),
+            "latest": daily[-1],
+            "lowest": daily[lowest],
+            "lowest_date": series[lowest][0],
+            "points": polyline(daily, SPARK_WIDTH, SPARK_HEIGHT),
+        })
+
+    present = sum(day["present"] for day in days)
+    total = sum(day["total"] for day in days)
+    return {
+        "start": start,
+        "end": end,
+        "days": days,
+        "sections": summaries,
+        "percentage": percentage(present, total),
+        "points": polyline([day["percentage"] or 0 for day in days], CHART_WIDTH, CHART_HEIGHT),
+        "chart": {
+            "width": CHART_WIDTH,
+            "height": CHART_HEIGHT,
+            # Horizontal guide lines at 25% steps.
+            "guides": [
+                {"label": level, "y": CHART_HEIGHT - level * CHART_HEIGHT / 100}
+                for level in (25, 50, 75, 100)
+            ],
+        },
+        "spark": {"width": SPARK_WIDTH, "height": SPARK_HEIGHT},
+    }
@@ -1,8 +1,11 @@
 from django.urls import path
-from . import views
+from . import async_views, metrics, views
 from django.conf import settings
 from django.conf.urls.static import static
 
+# Read-only pages that have async versions, served under ASGI.
+pages = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
 
     # ---------------- PUBLIC ----------------
@@ -15,23 +18,31 @@ urlpatterns = [
     # ---------------- STUDENT ----------------
     path('profile/', views.profile, name='profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
-    path('marks/<str:exam_name>/', views.marks_by_exam, name='marks_by_exam'),
-    path('attendance/', views.attendance, name='attendance'),
-    path('homework/', views.homework_view, name='homework'),
-    path('exam-timetable/', views.exam_timetable_view, name='exam_timetable'),
+    path('marks/<str:exam_name>/', pages.marks_by_exam, name='marks_by_exam'),
+    path('attendance/', pages.attendance, name='attendance'),
+    path('homework/', pages.homework_view, name='homework'),
+    path('exam-timetable/', pages.exam_timetable_view, name='exam_timetable'),
 
     # ---------------- TEACHER ----------------
     path('teacher/login/', views.teacher_login, name='teacher_login'),
     path('teacher/dashboard/', views.teacher_dashboard, name='teacher_dashboard'),
     path('teacher/homework/add/', views.teacher_add_homework, name='teacher_add_homework'),
     path('teacher/attendance/', views.mark_attendance, name='teacher_mark_attendance'),
+    path('teacher/attendance/register/', views.teacher_attendance_register, name='teacher_attendance_register'),
+    path('teacher/attendance/trends/', views.teacher_attendance_trends, name='teacher_attendance_trends'),
     path('teacher/marks/', views.teacher_marks, name='teacher_marks'),
+    path('teacher/marks/grid/', views.teacher_marks_grid, name='teacher_marks_grid'),
+    path('teacher/results/', views.teacher_class_results, name='teacher_class_results'),
+    path('teacher/export/', views.teacher_export, name='teacher_export'),
 
     # ---------------- PARENT ----------------
-    path('parent/dashboard/', views.parent_dashboard, name='parent_dashboard'),
+    path('parent/dashboard/', pages.parent_dashboard, name='parent_dashboard'),
     path('parent/pay/', views.dummy_pay_exam_fee, name='dummy_pay_exam_fee'),
     path('parent/payment-history/', views.payment_history, name='payment_history'),
     path('parent/receipt/<int:pk>/', views.payment_receipt, name='payment_receipt'),
+
+    # ---------------- MONITORING ----------------
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
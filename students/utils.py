@@ -1,8 +1,75 @@
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import OperationalError, connection, transaction
 from django.shortcuts import redirect
 
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit.
+LOOKUP_BATCH_SIZE = 500
+
+
+def batched(items, size=LOOKUP_BATCH_SIZE):
+    """Split ``items`` into lists of at most ``size`` for IN (...) lookups."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_lock_error(error):
+    # "database is locked" (another writer) or "database table is locked"
+    # (shared-cache connections, e.g. the in-memory test database).
+    return "locked" in str(error)
+
+
+def retry_on_lock(attempts=8, delay=0.02):
+    """
+    Re-run a function that does its own ``transaction.atomic()`` when SQLite
+    refuses the write lock. SQLite gives up immediately (without waiting for
+    the busy timeout) when a transaction that has already read tries to
+    start writing while another one writes, so short retries with jittered
+    backoff are the way through contention. Inside an outer atomic block the
+    error is passed on: only the outermost transaction can be retried.
+    The call is repeated with the same arguments, so pass lists rather
+    than generators.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as error:
+                    last = attempt == attempts - 1
+                    if last or connection.in_atomic_block or not is_lock_error(error):
+                        raise
+                    time.sleep(delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def write_transaction():
+    """
+    ``transaction.atomic()`` that takes SQLite's write lock with its first
+    statement, as BEGIN IMMEDIATE would (Django 3.2 only issues BEGIN). A
+    transaction that reads first cannot wait for the lock when it starts
+    writing; one that holds it from the start just waits for the busy
+    timeout while another worker writes, instead of failing.
+    """
+    with transaction.atomic():
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                # A write that matches no rows still takes the lock.
+                cursor.execute("UPDATE django_migrations SET id = id WHERE 0")
+        yield
+
+
 def teacher_required(view_func):
     def wrapper(request, *args, **kwargs):
-        if not request.user.groups.filter(name="Teacher").exists():
+        if not request.roles.is_teacher:
             return redirect("home")
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -10,7 +77,7 @@ def teacher_required(view_func):
 
 def parent_required(view_func):
     def wrapper(request, *args, **kwargs):
-        if not request.user.groups.filter(name="Parent").exists():
+        if not request.roles.is_parent:
             return redirect("home")
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -18,7 +85,7 @@ def parent_required(view_func):
 
 def student_required(view_func):
     def wrapper(request, *args, **kwargs):
-        if not request.user.groups.filter(name="Student").exists():
+        if not request.roles.is_student:
             return redirect("home")
         return view_func(request, *args, **kwargs)
     return wrapper
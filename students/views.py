@@ -2,15 +2,20 @@
 # IMPORTS (CLEANED)
 # ===============================
 
-from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 import logging
+import re
+import uuid
 
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
+from django.db.models import Count, Min, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 
 from .models import (
     StudentProfile,
@@ -21,17 +26,50 @@ from .models import (
     MonthlyAttendance,
     Homework,
     ExamTimetable,
-    ExamFee,
     ExamPayment,
+    PaymentTransaction,
     AboutImage,
+    EXAM_MAX_MARKS,
+    SUBJECTS,
 )
 
 from .forms import StudentProfileForm, HomeworkForm
 from .utils import teacher_required, student_required, parent_required
+from .class_pages import HOMEWORK, TIMETABLE, class_fragment
+from .exports import EXPORTS, FORMATS, export_response
+from .registers import monthly_register
+from .receipts import RECEIPT_MAX_AGE, build_receipt, load_receipt, receipt_etag, receipt_stored
+from .refdata import exam_fee
+from .replica import reporting_alias
+from .rollups import month_start, next_month
+from .roles import remember_roles, resolve_roles
+from .results import SA_FA_EXAMS, class_results, get_exam_result, grade_for
+from .trends import attendance_trends, default_range
+from .services import (
+    save_attendance_register,
+    statuses_from_post,
+    upsert_marks,
+    validate_marks,
+    marks_grid,
+    marks_cells_from_post,
+    record_payment,
+)
 
 
 logger = logging.getLogger("students")
 
+ATTENDANCE_PAGE_SIZE = 31
+PAYMENT_PAGE_SIZE = 20
+IDEMPOTENCY_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def parse_date_param(value):
+    """Parse a YYYY-MM-DD query parameter; None when missing or invalid."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
 
 # ===============================
 # PUBLIC PAGES
@@ -39,9 +77,9 @@ logger = logging.getLogger("students")
 
 def home(request):
     if request.user.is_authenticated:
-        if request.user.groups.filter(name="Teacher").exists():
+        if request.roles.is_teacher:
             return redirect("teacher_dashboard")
-        if request.user.groups.filter(name="Parent").exists():
+        if request.roles.is_parent:
             return redirect("parent_dashboard")
 
     school_details = {
@@ -74,13 +112,12 @@ def login_view(request):
 
         if user:
             login(request, user)
+            roles = remember_roles(request, user)
 
-            if hasattr(user, "parentprofile"):
+            if roles.parent_id:
                 return redirect("parent_dashboard")
-            if hasattr(user, "teacherprofile"):
+            if roles.teacher_id:
                 return redirect("teacher_dashboard")
-            if hasattr(user, "studentprofile"):
-                return redirect("home")
 
             return redirect("home")
 
@@ -132,24 +169,93 @@ def edit_profile(request):
 def attendance(request):
     student_profile = get_object_or_404(StudentProfile, user=request.user)
 
-    attendance_records = Attendance.objects.filter(
+    date_from = parse_date_param(request.GET.get("from"))
+    date_to = parse_date_param(request.GET.get("to"))
+    month = request.GET.get("month", "")
+    if month:
+        try:
+            first = datetime.strptime(month, "%Y-%m").date()
+            date_from, date_to = first, next_month(first) - timedelta(days=1)
+        except ValueError:
+            month = ""
+
+    records = Attendance.objects.filter(student=student_profile)
+    if date_from:
+        records = records.filter(date__gte=date_from)
+    if date_to:
+        records = records.filter(date__lte=date_to)
+
+    monthly_attendance = list(MonthlyAttendance.objects.filter(
         student=student_profile
-    ).order_by("-date")
-
-    total_days = attendance_records.count()
-    present_days = attendance_records.filter(status="Present").count()
-    absent_days = attendance_records.filter(status="Absent").count()
+    ).order_by("-month"))
 
-    monthly_attendance = MonthlyAttendance.objects.filter(
-        student=student_profile
-    ).order_by("-month")
+    if date_from or date_to:
+        # One conditional aggregate over the selected range.
+        counts = records.aggregate(
+            total=Count("id"),
+            present=Count("id", filter=Q(status="Present")),
+        )
+        total_days = counts["total"]
+        present_days = counts["present"]
+    else:
+        # Totals come from the maintained monthly rollups, not the daily
+        # rows. Months entered by hand before daily attendance began are
+        # listed but not counted, as the daily totals never included them.
+        first_day = records.aggregate(first=Min("date"))["first"]
+        counted = [
+            m for m in monthly_attendance
+            if first_day and m.month >= month_start(first_day)
+        ]
+        total_days = sum(m.total_days for m in counted)
+        present_days = sum(m.present_days for m in counted)
+    absent_days = total_days - present_days
+
+    # Keyset pagination: "before" continues with the rows older than the
+    # last date shown, "after" goes back to the rows newer than the first.
+    before = parse_date_param(request.GET.get("before"))
+    after = None if before else parse_date_param(request.GET.get("after"))
+    page = None
+    if after:
+        newer = list(records.filter(date__gt=after).order_by("date")[:ATTENDANCE_PAGE_SIZE + 1])
+        # Less than a page newer than the cursor: that is the newest page.
+        if len(newer) > ATTENDANCE_PAGE_SIZE:
+            page = newer[:ATTENDANCE_PAGE_SIZE][::-1]
+            has_newer = has_older = True
+
+    if page is None:
+        page = records
+        if before:
+            page = page.filter(date__lt=before)
+        page = list(page.order_by("-date")[:ATTENDANCE_PAGE_SIZE + 1])
+        has_newer = before is not None
+        has_older = len(page) > ATTENDANCE_PAGE_SIZE
+        page = page[:ATTENDANCE_PAGE_SIZE]
+
+    filters = {
+        key: value
+        for key, value in (
+            ("month", month),
+            ("from", "" if month else request.GET.get("from", "")),
+            ("to", "" if month else request.GET.get("to", "")),
+        )
+        if value
+    }
+    older_query = urlencode({**filters, "before": page[-1].date.isoformat()}) if has_older else ""
+    newer_query = urlencode({**filters, "after": page[0].date.isoformat()}) if has_newer and page else ""
 
     return render(request, "students/attendance.html", {
-        "attendance": attendance_records,
+        "attendance": page,
         "total_days": total_days,
         "present_days": present_days,
         "absent_days": absent_days,
         "monthly_attendance": monthly_attendance,
+        "month": month,
+        "date_from": "" if month else request.GET.get("from", ""),
+        "date_to": "" if month else request.GET.get("to", ""),
+        "is_first_page": not has_newer,
+        "newest_query": urlencode(filters),
+        "newer_query": newer_query,
+        "older_query": older_query,
     })
 
 
@@ -158,13 +264,21 @@ def attendance(request):
 def homework_view(request):
     profile = get_object_or_404(StudentProfile, user=request.user)
 
-    homeworks = Homework.objects.filter(
-        student_class=profile.student_class,
-        section=profile.section
-    ).order_by("-date")
+    homework_list = class_fragment(
+        HOMEWORK,
+        profile.student_class,
+        profile.section,
+        "students/homework_list.html",
+        lambda: {
+            "homeworks": Homework.objects.filter(
+                student_class=profile.student_class,
+                section=profile.section
+            ).order_by("-date")
+        }
+    )
 
     return render(request, "students/homework.html", {
-        "homeworks": homeworks
+        "homework_list": homework_list
     })
 
 
@@ -173,18 +287,26 @@ def homework_view(request):
 def exam_timetable_view(request):
     profile = get_object_or_404(StudentProfile, user=request.user)
 
-    timetables = ExamTimetable.objects.filter(
-        student_class=profile.student_class,
-        section=profile.section
-    ).order_by("exam_date")
+    timetable_rows = class_fragment(
+        TIMETABLE,
+        profile.student_class,
+        profile.section,
+        "students/exam_timetable_rows.html",
+        lambda: {
+            "timetables": ExamTimetable.objects.filter(
+                student_class=profile.student_class,
+                section=profile.section
+            ).order_by("exam_date")
+        }
+    )
 
     return render(request, "students/exam_timetable.html", {
-        "timetables": timetables
+        "timetable_rows": timetable_rows
     })
 
 
 # ===============================
-# MARKS (CORE LOGIC UNCHANGED)
+# MARKS
 # ===============================
 
 @login_required
@@ -198,68 +320,26 @@ def marks_by_exam(request, exam_name):
         exam_name
     )
 
-    if exam_name in ["SA-1", "SA-2"]:
-        fa_exams = ["FA-1", "FA-2"] if exam_name == "SA-1" else ["FA-3", "FA-4"]
-
+    if exam_name in SA_FA_EXAMS:
         logger.info(
             "SA calculation | user=%s | exam=%s | FA exams=%s",
             request.user.username,
             exam_name,
-            ",".join(fa_exams)
-        )
-
-        sa_marks_qs = StudentMarks.objects.filter(
-            student=student_profile,
-            exam_name=exam_name
-        )
-
-        fa_marks_qs = StudentMarks.objects.filter(
-            student=student_profile,
-            exam_name__in=fa_exams
+            ",".join(SA_FA_EXAMS[exam_name])
         )
 
-        fa_totals = defaultdict(int)
-        for m in fa_marks_qs:
-            fa_totals[m.subject] += m.marks
+    result = get_exam_result(student_profile, exam_name)
 
+    if result:
+        marks_list = result.subjects
+        total_marks = result.total
+        percentage = result.percentage
+        grade = result.grade
+    else:
         marks_list = []
         total_marks = 0
-
-        for sa in sa_marks_qs:
-            fa_total = fa_totals.get(sa.subject, 0)
-            subject_total = fa_total + sa.marks
-
-            sa.fa_total = fa_total
-            sa.total = subject_total
-
-            total_marks += subject_total
-            marks_list.append(sa)
-
-        subject_count = len(marks_list)
-        max_marks = subject_count * 100
-        percentage = round((total_marks / max_marks) * 100, 2) if max_marks else 0
-
-    else:
-        marks_list = StudentMarks.objects.filter(
-            student=student_profile,
-            exam_name=exam_name
-        )
-
-        total_marks = sum(m.marks for m in marks_list)
-        subject_count = marks_list.count()
-        max_marks = subject_count * 20
-        percentage = round((total_marks / max_marks) * 100, 2) if max_marks else 0
-
-    if percentage >= 90:
-        grade = "A+"
-    elif percentage >= 80:
-        grade = "A"
-    elif percentage >= 70:
-        grade = "B"
-    elif percentage >= 60:
-        grade = "C"
-    else:
-        grade = "Fail"
+        percentage = 0
+        grade = grade_for(percentage)
 
     return render(request, "students/marks.html", {
         "exam_name": exam_name,
@@ -282,8 +362,9 @@ def teacher_login(request):
             password=request.POST.get("password")
         )
 
-        if user and user.groups.filter(name="Teacher").exists():
+        if user and resolve_roles(user).is_teacher:
             login(request, user)
+            remember_roles(request, user)
             return redirect("teacher_dashboard")
 
         return render(request, "teachers/teacher_login.html", {
@@ -334,14 +415,16 @@ def mark_attendance(request):
 
         attendance_date = datetime.strptime(selected_date, "%Y-%m-%d").date()
 
-        existing_records = Attendance.objects.filter(
-            student__in=students,
-            date=attendance_date
+        attendance_map = dict(
+            Attendance.objects.filter(
+                student__in=students,
+                date=attendance_date
+            ).values_list("student_id", "status")
         )
 
-        attendance_map = {
-            r.student.id: r.status for r in existing_records
-        }
+        students = list(students.select_related("user"))
+        for student in students:
+            student.current_status = attendance_map.get(student.id, "")
 
     if request.method == "POST":
         try:
@@ -356,14 +439,11 @@ def mark_attendance(request):
 
             attendance_date = datetime.strptime(selected_date, "%Y-%m-%d").date()
 
-            for student in students:
-                status = request.POST.get(f"status_{student.id}")
-                if status:
-                    Attendance.objects.update_or_create(
-                        student=student,
-                        date=attendance_date,
-                        defaults={"status": status}
-                    )
+            save_attendance_register(
+                attendance_date,
+                statuses_from_post(request.POST),
+                students=students
+            )
 
             messages.success(request, "Attendance saved")
             return redirect("teacher_dashboard")
@@ -385,67 +465,230 @@ def mark_attendance(request):
     })
 
 
+@login_required
+@teacher_required
+def teacher_attendance_register(request):
+    """A class-section's attendance for a whole month, one row per student."""
+    class_name = request.GET.get("class", "")
+    section = request.GET.get("section", "")
+    month = request.GET.get("month", "")
+    register = None
+
+    if "load" in request.GET:
+        try:
+            first = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            first = None
+        if first:
+            students = StudentProfile.objects.filter(
+                student_class=class_name,
+                section=section
+            ).order_by("roll_number")
+            register = monthly_register(students, first, using=reporting_alias(request))
+
+    return render(request, "teachers/attendance_register.html", {
+        "class_name": class_name,
+        "section": section,
+        "month": month,
+        "register": register,
+    })
+
+
+@login_required
+@teacher_required
+def teacher_attendance_trends(request):
+    """School-wide attendance per day and per class-section, from the rollups."""
+    using = reporting_alias(request)
+    start = parse_date_param(request.GET.get("from"))
+    end = parse_date_param(request.GET.get("to"))
+
+    trends = None
+    if not (start and end):
+        start, end = default_range(using) or (start, end)
+    if start and end and start <= end:
+        trends = attendance_trends(start, end, using=using)
+
+    return render(request, "teachers/attendance_trends.html", {
+        "start": start,
+        "end": end,
+        "trends": trends,
+    })
+
+
 @login_required
 @teacher_required
 def teacher_marks(request):
-    students = marks_map = None
+    """Enter one subject's marks for a class; a grid with a single column."""
+    students = None
     class_name = section = subject = exam_name = ""
+    submitted = errors = None
 
-    if request.method == "GET" and "load" in request.GET:
-        class_name = request.GET.get("class")
-        section = request.GET.get("section")
-        subject = request.GET.get("subject")
-        exam_name = request.GET.get("exam_name")
+    params = request.POST if request.method == "POST" else request.GET
+
+    if request.method == "POST" or "load" in request.GET:
+        class_name = params.get("class", "")
+        section = params.get("section", "")
+        subject = params.get("subject", "")
+        exam_name = params.get("exam_name", "")
 
         students = StudentProfile.objects.filter(
             student_class=class_name,
             section=section
-        )
+        ).order_by("roll_number")
 
-        existing_marks = StudentMarks.objects.filter(
-            student__in=students,
-            subject=subject,
-            exam_name=exam_name
-        )
+    if request.method == "POST":
+        student_ids = list(students.values_list("id", flat=True))
+        submitted = marks_cells_from_post(request.POST, student_ids, [subject])
+        records, errors = validate_marks(exam_name, submitted)
+
+        if errors:
+            messages.error(request, "Marks not saved: fix the highlighted marks.")
+        else:
+            created, updated = upsert_marks(records)
+            logger.info(
+                "Marks saved | teacher=%s | class=%s-%s | exam=%s | subject=%s | created=%s | updated=%s",
+                request.user.username,
+                class_name,
+                section,
+                exam_name,
+                subject,
+                created,
+                updated
+            )
+            messages.success(request, "Marks saved successfully")
+            return redirect("teacher_dashboard")
 
-        marks_map = {
-            m.student.id: m.marks for m in existing_marks
-        }
+    if students is not None:
+        students = marks_grid(students, exam_name, [subject], submitted, errors)
 
-    if request.method == "POST":
-        class_name = request.POST.get("class")
-        section = request.POST.get("section")
-        subject = request.POST.get("subject")
-        exam_name = request.POST.get("exam_name")
+    return render(request, "teachers/add_marks.html", {
+        "students": students,
+        "class_name": class_name,
+        "section": section,
+        "subject": subject,
+        "exam_name": exam_name,
+        "form_error": (errors or {}).get(None, ""),
+    })
+
+
+@login_required
+@teacher_required
+def teacher_marks_grid(request):
+    """Enter one exam's marks for a whole class, all subjects at once."""
+    students = None
+    class_name = section = exam_name = ""
+    subjects = SUBJECTS
+    submitted = errors = None
+
+    params = request.POST if request.method == "POST" else request.GET
+
+    if request.method == "POST" or "load" in request.GET:
+        class_name = params.get("class", "")
+        section = params.get("section", "")
+        exam_name = params.get("exam_name", "")
+        subjects = [
+            s.strip() for s in params.get("subjects", "").split(",") if s.strip()
+        ] or SUBJECTS
 
         students = StudentProfile.objects.filter(
             student_class=class_name,
             section=section
-        )
+        ).order_by("roll_number")
 
-        for student in students:
-            marks = request.POST.get(f"marks_{student.id}")
-            if marks:
-                StudentMarks.objects.update_or_create(
-                    student=student,
-                    subject=subject,
-                    exam_name=exam_name,
-                    defaults={"marks": marks}
-                )
-
-        messages.success(request, "Marks saved successfully")
-        return redirect("teacher_dashboard")
+    if request.method == "POST":
+        student_ids = list(students.values_list("id", flat=True))
+        submitted = marks_cells_from_post(request.POST, student_ids, subjects)
+        records, errors = validate_marks(exam_name, submitted)
+
+        if errors:
+            messages.error(request, "Marks not saved: fix the highlighted cells.")
+        else:
+            created, updated = upsert_marks(records)
+            logger.info(
+                "Marks grid saved | teacher=%s | class=%s-%s | exam=%s | created=%s | updated=%s",
+                request.user.username,
+                class_name,
+                section,
+                exam_name,
+                created,
+                updated
+            )
+            messages.success(request, "Marks saved successfully")
+            return redirect("teacher_dashboard")
 
-    return render(request, "teachers/add_marks.html", {
+    if students is not None:
+        students = marks_grid(students, exam_name, subjects, submitted, errors)
+
+    return render(request, "teachers/marks_grid.html", {
         "students": students,
-        "marks_map": marks_map,
         "class_name": class_name,
         "section": section,
-        "subject": subject,
-        "exam_name": exam_name
+        "exam_name": exam_name,
+        "subjects": subjects,
+        "exam_choices": list(EXAM_MAX_MARKS),
+        "max_marks": EXAM_MAX_MARKS.get(exam_name),
+        "form_error": (errors or {}).get(None, ""),
+    })
+
+
+@login_required
+@teacher_required
+def teacher_class_results(request):
+    """Whole-class results, ranks and subject statistics for one exam."""
+    class_name = request.GET.get("class", "")
+    section = request.GET.get("section", "")
+    exam_name = request.GET.get("exam_name", "")
+    report = None
+
+    if "load" in request.GET:
+        students = StudentProfile.objects.filter(
+            student_class=class_name,
+            section=section
+        )
+        report = class_results(students, exam_name, using=reporting_alias(request))
+
+    return render(request, "teachers/class_results.html", {
+        "class_name": class_name,
+        "section": section,
+        "exam_name": exam_name,
+        "exam_choices": list(EXAM_MAX_MARKS),
+        "report": report,
     })
 
 
+@login_required
+@teacher_required
+def teacher_export(request):
+    """
+    Attendance, marks or payments of a class, a section or the whole school
+    as a CSV or XLSX download, streamed while it is read.
+    """
+    kind = request.GET.get("kind", "")
+    fmt = request.GET.get("format", "csv")
+
+    if kind not in EXPORTS or fmt not in FORMATS:
+        return render(request, "teachers/exports.html", {
+            "kinds": list(EXPORTS),
+            "formats": list(FORMATS),
+            "exam_choices": list(EXAM_MAX_MARKS),
+        })
+
+    logger.info(
+        "Export started | user=%s kind=%s format=%s class=%s section=%s",
+        request.user.username, kind, fmt,
+        request.GET.get("class", ""), request.GET.get("section", "")
+    )
+    return export_response(
+        kind, fmt,
+        student_class=request.GET.get("class", "").strip(),
+        section=request.GET.get("section", "").strip(),
+        date_from=parse_date_param(request.GET.get("from")),
+        date_to=parse_date_param(request.GET.get("to")),
+        exam_name=request.GET.get("exam_name", ""),
+        using=reporting_alias(request),
+    )
+
+
 # ===============================
 # PARENT SECTION
 # ===============================
@@ -456,11 +699,7 @@ def parent_dashboard(request):
     parent = request.user.parentprofile
     student = parent.student
 
-    fee_obj = ExamFee.objects.filter(
-        class_name=student.student_class
-    ).first()
-
-    total_fee = fee_obj.amount if fee_obj else 0
+    total_fee = exam_fee(student.student_class)
 
     payment = ExamPayment.objects.filter(student=student).first()
     paid_amount = payment.amount if payment else 0
@@ -471,6 +710,8 @@ def parent_dashboard(request):
         "paid_amount": paid_amount,
         "remaining_amount": total_fee - paid_amount,
         "payment": payment,
+        # A fresh key per rendered form: resubmitting it cannot pay twice.
+        "idempotency_key": uuid.uuid4().hex,
     })
 
 
@@ -480,11 +721,7 @@ def dummy_pay_exam_fee(request):
     parent = request.user.parentprofile
     student = parent.student
 
-    fee_obj = ExamFee.objects.filter(
-        class_name=student.student_class
-    ).first()
-
-    total_fee = fee_obj.amount if fee_obj else 0
+    total_fee = exam_fee(student.student_class)
 
     if request.method == "POST":
         try:
@@ -495,32 +732,31 @@ def dummy_pay_exam_fee(request):
         
             pay_amount = int(request.POST.get("pay_amount", 0))
 
-            payment, _ = ExamPayment.objects.get_or_create(
-                student=student,
-                defaults={"amount": 0, "status": "Pending"}
+            key = request.POST.get("idempotency_key", "")
+            txn = record_payment(
+                student,
+                pay_amount,
+                total_fee,
+                idempotency_key=key if IDEMPOTENCY_KEY_PATTERN.match(key) else None
             )
-
-            remaining = total_fee - payment.amount
-            pay_amount = min(pay_amount, remaining)
-
-            payment.amount += pay_amount
-            payment.status = "Paid" if payment.amount >= total_fee else "Partial"
-            payment.payment_id = f"DUMMY-{timezone.now().strftime('%Y%m%d%H%M%S')}"
-            payment.paid_on = timezone.now()
-            payment.save()
+            if txn is None:
+                messages.info(request, "There is nothing left to pay.")
+                return redirect("parent_dashboard")
 
             logger.info(
-                "Payment success | parent=%s | student=%s | amount=%s",
+                "Payment success | parent=%s | student=%s | amount=%s | balance=%s",
                 request.user.username,
                 student.user.username,
-                pay_amount
+                txn.amount,
+                txn.balance_after
             )
 
             return render(request, "parents/payment_success.html", {
                 "student": student,
-                "paid_amount": pay_amount,
-                "payment": payment,
-                "remaining": total_fee - payment.amount
+                "paid_amount": txn.amount,
+                "payment": ExamPayment.objects.filter(student=student).first(),
+                "transaction": txn,
+                "remaining": total_fee - txn.balance_after
             })
         except Exception as e:
             logger.error(
@@ -543,20 +779,53 @@ def payment_history(request):
     parent = request.user.parentprofile
     student = parent.student
 
-    payments = ExamPayment.objects.filter(
-        student=student
-    ).order_by("-paid_on")
+    # Keyset pagination over the ledger, newest first.
+    transactions = PaymentTransaction.objects.using(reporting_alias(request)).filter(student=student)
+    before = request.GET.get("before", "")
+    if before.isdigit():
+        transactions = transactions.filter(id__lt=int(before))
+    page = list(transactions.order_by("-id")[:PAYMENT_PAGE_SIZE + 1])
+
+    has_older = len(page) > PAYMENT_PAGE_SIZE
+    page = page[:PAYMENT_PAGE_SIZE]
 
     return render(request, "parents/payment_history.html", {
         "student": student,
-        "payments": payments
+        "payments": page,
+        "is_first_page": not before.isdigit(),
+        "older_query": urlencode({"before": page[-1].id}) if has_older else "",
     })
 
 
 @login_required
 @parent_required
 def payment_receipt(request, pk):
-    payment = get_object_or_404(ExamPayment, id=pk)
-    return render(request, "parents/payment_receipt.html", {
-        "payment": payment
-    })
+    student_id = request.roles.child_id
+    layout = "print" if request.GET.get("layout") == "print" else "screen"
+
+    def owned_payment():
+        return get_object_or_404(
+            PaymentTransaction.objects.select_related("student__user"),
+            id=pk,
+            student_id=student_id
+        )
+
+    # Ownership before any 304 ("If-None-Match: *" matches every tag). A
+    # stored receipt sits under the child's own directory, so only one that
+    # was never rendered needs the lookup.
+    payment = None
+    if not receipt_stored(student_id, pk, layout):
+        payment = owned_payment()
+
+    etag = quote_etag(receipt_etag(student_id, pk, layout))
+    response = get_conditional_response(request, etag=etag)
+
+    if response is None:
+        content = load_receipt(student_id, pk, layout)
+        if content is None:
+            content = build_receipt(payment or owned_payment(), layout)
+        response = HttpResponse(content)
+
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=RECEIPT_MAX_AGE, immutable=True)
+    return response